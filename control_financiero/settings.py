@@ -42,6 +42,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para medir la petición completa (se desactiva con INSTRUMENTACION["ACTIVA"])
+    'dashboard.middleware.InstrumentacionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -49,6 +51,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'dashboard.middleware.AuditoriaMiddleware',
 ]
 
 ROOT_URLCONF = 'control_financiero.urls'
@@ -75,10 +78,25 @@ EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Perfil SQLite para varios workers (dashboard/sqlite_produccion): busy_timeout
+# espera el bloqueo en vez de fallar y las escrituras de index/historial usan
+# BEGIN IMMEDIATE. Son PRAGMAs por conexión; el modo WAL (que deja leer mientras
+# se escribe) queda guardado en el archivo y se activa una vez con
+# `python manage.py configurar_sqlite`. Comparar con `python manage.py benchmark_sqlite`.
+SQLITE_PRAGMAS = {
+    "busy_timeout": 10000,  # ms
+    "synchronous": "NORMAL",  # seguro con WAL; solo se puede perder la última transacción si se cae el equipo
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -32000,  # negativo = KiB (32 MB por conexión)
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'dashboard.sqlite_produccion',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'pragmas': SQLITE_PRAGMAS,
+        },
     }
 }
 
@@ -123,3 +141,83 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Cachés. "tablero" (dashboard/cache_tablero.py) es locmem, una por proceso; los
+# datos no quedan viejos porque la clave lleva la versión de la fila VersionDatos.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "tablero": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "tablero",
+        "TIMEOUT": 3600,
+        "OPTIONS": {"MAX_ENTRIES": 500},
+    },
+}
+
+# Reporte Excel en segundo plano (ver dashboard/trabajos.py).
+# BACKEND: "hilos" (mismo proceso), "base_datos" (worker `manage.py procesar_reportes`)
+# o "celery" (requiere celery y un broker configurados).
+REPORTES = {
+    "BACKEND": "hilos",
+    "HILOS": 2,
+    "DIRECTORIO": BASE_DIR / "reportes_generados",
+    "CADUCIDAD_HORAS": 24,
+    "ABANDONO_MINUTOS": 30,  # pendiente o "en proceso" sin avanzar este tiempo = worker caído o reinicio
+}
+
+# SystemLog: "buffer" los guarda en lote cada TAMANO entradas o INTERVALO
+# segundos; "sincrono" los guarda al momento. MovimientoLog siempre se guarda
+# en la transacción del cambio (ver dashboard/auditoria.py). Si la base falla,
+# el buffer guarda hasta MAX_PENDIENTES entradas y descarta las más antiguas.
+AUDITORIA = {
+    "MODO": "buffer",
+    "TAMANO": 100,
+    "INTERVALO": 2.0,
+    "MAX_PENDIENTES": 10000,
+}
+
+# Bandeja de salida de correos (ver dashboard/correos.py). MODO "hilo" envía
+# desde un hilo del servidor; "comando" deja el envío a `manage.py enviar_correos`.
+CORREOS = {
+    "MODO": "hilo",
+    "LOTE": 50,
+    "MAX_INTENTOS": 5,
+    "ESPERA_BASE": 30,
+}
+
+# Consultas "al día" (dashboard/historico.py): se toma una instantánea de los
+# periodos cada MOVIMIENTOS_POR_INSTANTANEA movimientos, que es lo máximo que
+# hay que repasar para reconstruir cualquier momento.
+HISTORICO = {
+    "MOVIMIENTOS_POR_INSTANTANEA": 1000,
+}
+
+# Retención de SystemLog/MovimientoLog (ver dashboard/retencion.py y el comando archivar_logs)
+RETENCION = {
+    "DIAS": 365,
+    "DIRECTORIO": BASE_DIR / "archivo_logs",
+    "LOTE": 500,
+    "PAGINAS_VACUUM": 2000,
+}
+
+# Medición por petición (dashboard/instrumentacion.py): cabecera Server-Timing,
+# una línea JSON en el log "dashboard.instrumentacion" y la página /rendimiento/.
+# Con ACTIVA = False el middleware no se carga.
+INSTRUMENTACION = {
+    "ACTIVA": True,
+    "LENTAS": 3,
+    "VENTANA": 500,
+}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "consola": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "dashboard.instrumentacion": {"handlers": ["consola"], "level": "INFO", "propagate": False},
+    },
+}
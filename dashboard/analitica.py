@@ -0,0 +1,159 @@
+"""
+Indicadores de tendencia del tablero calculados con pandas/NumPy.
+
+El rango se carga una sola vez en columnas: `values_list` con los montos
+convertidos a REAL en SQL (sin instanciar modelos ni crear Decimal por
+celda) y de ahí directo a un DataFrame. Sobre ese frame, con operaciones
+vectorizadas:
+
+- variación anual (%) por categoría y del total, sobre los mismos meses,
+- promedios móviles de 3, 6 y 12 periodos del total y de la diferencia,
+- participación de cada categoría en el total,
+- rachas de periodos consecutivos con déficit.
+
+pandas y numpy se importan dentro de las funciones: cargarlos al arrancar
+cuesta cientos de ms (ver `benchmark_arranque`).
+"""
+import math
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+from .models import CAMPOS_CAPTURADOS, CAMPOS_GRAFICA, CAMPOS_TOTAL
+
+VENTANAS_MOVILES = [3, 6, 12]
+
+
+# --- CARGA ---
+def cargar(registros):
+    """
+    DataFrame indexado por fecha_periodo con `periodo`, las columnas
+    capturadas, las derivadas y `total`. `registros` es un queryset de
+    IngresoMensual o una lista de instancias (estado histórico).
+    """
+    import numpy as np
+    import pandas as pd
+
+    if hasattr(registros, "values_list"):
+        filas = registros.order_by("fecha_periodo").values_list(
+            "fecha_periodo", "periodo", *[Cast(campo, FloatField()) for campo in CAMPOS_CAPTURADOS]
+        )
+        columnas = list(zip(*filas)) or [()] * (len(CAMPOS_CAPTURADOS) + 2)
+    else:
+        columnas = [
+            [getattr(r, campo) for r in registros]
+            for campo in ["fecha_periodo", "periodo", *CAMPOS_CAPTURADOS]
+        ]
+
+    frame = pd.DataFrame(
+        {campo: np.asarray(valores, dtype=float) for campo, valores in zip(CAMPOS_CAPTURADOS, columnas[2:])},
+        # Resolución de segundos: con nanosegundos (la de pandas por defecto) el límite es el año 2262
+        index=pd.DatetimeIndex(np.asarray(columnas[0], dtype="datetime64[s]"), name="fecha_periodo"),
+    )
+    frame.insert(0, "periodo", list(columnas[1]))
+    # Mismas fórmulas que IngresoMensual.calcular_derivados
+    frame["ingresos_netos_mantenimiento"] = frame["ingresos_mantenimiento"] - frame["dppp"]
+    frame["total"] = frame[CAMPOS_TOTAL].sum(axis=1)
+    frame["diferencia_ingresos_fac_vs_cobrados"] = frame["total"] - frame["ingresos_reales_vs_fact"]
+    return frame
+
+
+# --- INDICADORES ---
+def variacion_anual(frame):
+    """
+    Totales por año calendario y su variación (%) contra el año calendario
+    anterior. La variación suma en ambos años solo los meses que tienen los
+    dos: un año en curso se compara con los mismos meses del anterior, y sin
+    el año inmediato anterior en el rango queda sin definir.
+    Devuelve (anual, variacion, periodos por año, meses comparados por año).
+    """
+    columnas = CAMPOS_GRAFICA + ["total"]
+    anio, mes = frame.index.year.rename("anio"), frame.index.month.rename("mes")
+    anual = frame.groupby(anio)[columnas].sum()
+    mensual = frame.groupby([anio, mes])[columnas].sum()
+    # Cada mes del año anterior queda alineado con el mismo mes del siguiente
+    actual, base = mensual.align(mensual.rename(index=lambda a: a + 1, level="anio"), join="inner")
+    comparados = actual.groupby(level="anio").size().reindex(anual.index, fill_value=0)
+    actual = actual.groupby(level="anio").sum().reindex(anual.index)
+    base = base.groupby(level="anio").sum().reindex(anual.index)
+    # Sin base (año anterior en 0 o ausente) la variación no está definida
+    variacion = ((actual - base) / base * 100).where(base != 0)
+    return anual, variacion, frame.groupby(anio).size(), comparados
+
+
+def promedios_moviles(serie):
+    return {n: serie.rolling(n, min_periods=n).mean() for n in VENTANAS_MOVILES}
+
+
+def participacion(frame):
+    """Porcentaje de cada columna de CAMPOS_TOTAL sobre la suma del total."""
+    total = frame["total"].sum()
+    if not total:
+        return frame[CAMPOS_TOTAL].sum() * 0
+    return frame[CAMPOS_TOTAL].sum() / total * 100
+
+
+def rachas_deficit(diferencias):
+    """
+    Rachas de periodos consecutivos con diferencia < 0 como
+    (posiciones de inicio, longitudes), con NumPy.
+    """
+    import numpy as np
+
+    deficit = np.asarray(diferencias) < 0
+    # Bordes donde el indicador cambia; pares (inicio, fin) semiabiertos
+    bordes = np.flatnonzero(np.diff(np.concatenate(([0], deficit.astype(np.int8), [0]))))
+    inicios, fines = bordes[::2], bordes[1::2]
+    return inicios, fines - inicios
+
+
+# --- RESULTADO PARA EL TABLERO ---
+def _numero(valor):
+    return None if valor is None or math.isnan(valor) else round(float(valor), 2)
+
+
+def _lista(serie):
+    import numpy as np
+
+    valores = np.round(np.asarray(serie, dtype=float), 2)
+    return np.where(np.isnan(valores), None, valores).tolist()
+
+
+def analizar(frame):
+    """Indicadores del frame en un dict listo para JSON."""
+    periodos = frame["periodo"].tolist()
+    anual, variacion, conteo, comparados = variacion_anual(frame)
+    inicios, longitudes = rachas_deficit(frame["diferencia_ingresos_fac_vs_cobrados"].to_numpy())
+
+    def racha(i):
+        if i is None:
+            return {"periodos": 0, "desde": None, "hasta": None}
+        inicio, longitud = int(inicios[i]), int(longitudes[i])
+        return {"periodos": longitud, "desde": periodos[inicio], "hasta": periodos[inicio + longitud - 1]}
+
+    mas_larga = int(longitudes.argmax()) if len(longitudes) else None
+    # La racha actual es la que termina en el último periodo del rango
+    actual = len(longitudes) - 1 if len(longitudes) and inicios[-1] + longitudes[-1] == len(periodos) else None
+    ultimo_anio = anual.index[-1] if len(anual) and comparados.iloc[-1] else None
+
+    return {
+        "periodos": periodos,
+        "total": _lista(frame["total"]),
+        "moviles_total": {n: _lista(s) for n, s in promedios_moviles(frame["total"]).items()},
+        "moviles_diferencia": {
+            n: _lista(s) for n, s in promedios_moviles(frame["diferencia_ingresos_fac_vs_cobrados"]).items()
+        },
+        "participacion": {campo: _numero(v) for campo, v in participacion(frame).items()},
+        "anios": [int(a) for a in anual.index],
+        "periodos_por_anio": [int(n) for n in conteo],
+        "variacion_anual": {campo: _lista(variacion[campo]) for campo in variacion.columns},
+        "ultimo_anio": {
+            "anio": int(ultimo_anio),
+            "anterior": int(ultimo_anio) - 1,
+            "total": _numero(anual["total"].iloc[-1]),
+            "variacion_total": _numero(variacion["total"].iloc[-1]),
+            "periodos": int(conteo.iloc[-1]),
+            "meses_comparados": int(comparados.iloc[-1]),
+        } if ultimo_anio is not None else None,
+        "racha_actual": racha(actual),
+        "racha_mas_larga": racha(mas_larga),
+        "rachas_deficit": len(longitudes),
+    }
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class DashboardConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dashboard'
+
+    def ready(self):
+        # Conecta las señales que invalidan la caché del tablero
+        from . import cache_tablero  # noqa: F401
+        # Registra el check de los triggers de búsqueda
+        from . import busqueda  # noqa: F401
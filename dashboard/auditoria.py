@@ -0,0 +1,149 @@
+"""
+Escritura de los logs de auditoría (MovimientoLog y SystemLog).
+
+MovimientoLog es la fuente del histórico (dashboard/historico.py), del feed
+de cambios (dashboard/cambios.py) y del ETag de los datos de las gráficas:
+se guarda en la misma transacción que el cambio de datos, así nunca queda
+un cambio confirmado sin su movimiento ni un movimiento sin su cambio.
+
+SystemLog sí se acumula en memoria por proceso, en lugar de un INSERT por
+acción (y en SQLite, un bloqueo de escritura más por petición), y se guarda
+con bulk_create cuando el buffer llega a AUDITORIA["TAMANO"], cuando pasan
+AUDITORIA["INTERVALO"] segundos, al terminar el proceso, o antes de mostrar
+una vista que lee esos logs (ver `vaciar_antes`). Si guardarlas falla,
+vuelven al buffer para el siguiente intento, hasta AUDITORIA["MAX_PENDIENTES"]
+entradas: con la base caída por mucho tiempo se descartan las más antiguas
+(con un error en el log) en lugar de crecer sin límite en memoria.
+
+Con AUDITORIA["MODO"] = "sincrono" (pensado para pruebas) cada entrada se
+guarda en el momento, como antes.
+"""
+import atexit
+import logging
+import threading
+import time
+from functools import wraps
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+CONFIGURACION = {
+    "MODO": "buffer",
+    "TAMANO": 100,
+    "INTERVALO": 2.0,
+    "MAX_PENDIENTES": 10000,
+}
+
+
+def configuracion():
+    return CONFIGURACION | getattr(settings, "AUDITORIA", {})
+
+
+class BufferAuditoria:
+    def __init__(self, tamano, intervalo, max_pendientes):
+        self.tamano = tamano
+        self.intervalo = intervalo
+        self.max_pendientes = max_pendientes
+        self._pendientes = []
+        self._lock = threading.Lock()
+        self._ultimo_vaciado = time.monotonic()
+        self._hilo = None
+
+    def __len__(self):
+        return len(self._pendientes)
+
+    def agregar(self, instancia):
+        with self._lock:
+            self._pendientes.append(instancia)
+            lleno = len(self._pendientes) >= self.tamano
+        self._iniciar_hilo()
+        if lleno:
+            self.vaciar()
+
+    def vaciar_si_vencido(self):
+        if self._pendientes and time.monotonic() - self._ultimo_vaciado >= self.intervalo:
+            self.vaciar()
+
+    def vaciar(self):
+        """Guarda todo lo pendiente con un bulk_create por modelo."""
+        with self._lock:
+            pendientes, self._pendientes = self._pendientes, []
+            self._ultimo_vaciado = time.monotonic()
+        if not pendientes:
+            return 0
+
+        por_modelo = {}
+        for instancia in pendientes:
+            por_modelo.setdefault(type(instancia), []).append(instancia)
+        try:
+            with transaction.atomic():
+                for modelo, instancias in por_modelo.items():
+                    modelo.objects.bulk_create(instancias, batch_size=500)
+        except Exception:
+            # Se devuelven al buffer para el siguiente intento, sin pasar del máximo
+            logger.exception("No se pudieron guardar %s entradas de auditoría", len(pendientes))
+            with self._lock:
+                self._pendientes[:0] = pendientes
+                descartadas = max(len(self._pendientes) - self.max_pendientes, 0)
+                del self._pendientes[:descartadas]
+            if descartadas:
+                logger.error("Buffer de auditoría lleno: se descartaron %s entradas antiguas", descartadas)
+            return 0
+        return len(pendientes)
+
+    def _iniciar_hilo(self):
+        """Hilo que vacía el buffer por tiempo aunque no lleguen más peticiones."""
+        if self._hilo is not None and self._hilo.is_alive():
+            return
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._vaciar_periodicamente, daemon=True)
+                self._hilo.start()
+
+    def _vaciar_periodicamente(self):
+        while True:
+            time.sleep(self.intervalo)
+            self.vaciar_si_vencido()
+
+
+_buffer = None
+
+
+def obtener_buffer():
+    global _buffer
+    if _buffer is None:
+        conf = configuracion()
+        _buffer = BufferAuditoria(conf["TAMANO"], conf["INTERVALO"], conf["MAX_PENDIENTES"])
+        atexit.register(_buffer.vaciar)
+    return _buffer
+
+
+def registrar(instancia):
+    """
+    Registra una entrada de auditoría (MovimientoLog o SystemLog sin guardar).
+    Los MovimientoLog se guardan en el momento, dentro de la transacción del
+    cambio; los SystemLog se encolan cuando la transacción se confirma.
+    """
+    from .models import MovimientoLog
+
+    if isinstance(instancia, MovimientoLog) or configuracion()["MODO"] == "sincrono":
+        instancia.save()
+        return
+    transaction.on_commit(lambda: obtener_buffer().agregar(instancia))
+
+
+def vaciar():
+    """Guarda las entradas pendientes de este proceso."""
+    if _buffer is not None:
+        return _buffer.vaciar()
+    return 0
+
+
+def vaciar_antes(vista):
+    """Decorador para vistas que leen SystemLog: vacía el buffer antes de ejecutarlas."""
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        vaciar()
+        return vista(request, *args, **kwargs)
+    return envoltura
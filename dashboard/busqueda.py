@@ -0,0 +1,214 @@
+"""
+Búsqueda de texto en los logs con índices FTS5 de SQLite.
+
+Cada tabla de logs tiene su tabla virtual FTS5 de "contenido externo": el
+índice guarda solo los términos y apunta a la fila por id, el texto sigue en
+la tabla original. La sincronizan triggers (no señales), así que también
+cubren los `bulk_create` del buffer de auditoría y los DELETE en lote de
+`archivar_logs`. `reconstruir_busqueda` lo regenera desde cero.
+
+La consulta admite frases entre comillas ("pago de cuotas") y prefijos
+(cuot*); el resto de las palabras se buscan tal cual y todas tienen que
+aparecer. Los resultados se ordenan por bm25. El tokenizador ignora
+mayúsculas y acentos.
+
+En bases que no son SQLite (o sin FTS5) `disponible()` es False y
+`admin_logs` vuelve a filtrar con icontains.
+
+Las tablas virtuales y los triggers son SQL que Django no conoce: una
+migración posterior que reconstruya dashboard_systemlog o
+dashboard_movimientolog en SQLite (un AlterField lo hace) borra los
+triggers sin avisar y el índice deja de seguir a los logs. Hay que
+recrearlos con `reconstruir_busqueda`. Mientras falten, `disponible()` es
+False (se filtra con icontains, sin resultados viejos) y el check
+dashboard.W001 lo avisa en `migrate` y en `check --database default`.
+"""
+import logging
+import re
+from django.core import checks
+from django.db import connection
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.utils import OperationalError
+from .models import MovimientoLog, SystemLog
+
+logger = logging.getLogger(__name__)
+
+# tabla FTS -> (modelo, columnas indexadas)
+INDICES = {
+    "dashboard_movimientolog_fts": (MovimientoLog, ["observaciones", "periodo", "columna", "tipo"]),
+    "dashboard_systemlog_fts": (SystemLog, ["accion", "detalle"]),
+}
+
+TOKENIZADOR = "unicode61 remove_diacritics 2"
+# Índices de prefijos de 2 y 3 caracteres: "cu*" o "cuo*" no recorren todo el vocabulario
+PREFIJOS = "2 3"
+
+_TERMINO = re.compile(r'"([^"]*)"|(\S+)')
+
+TRIGGERS = [f"{tabla}_{sufijo}" for tabla in INDICES for sufijo in ("ai", "ad", "au")]
+
+
+# --- ESQUEMA ---
+def _sentencias_crear(tabla, modelo, columnas):
+    origen = modelo._meta.db_table
+    lista = ", ".join(columnas)
+    nuevos = ", ".join(f"new.{c}" for c in columnas)
+    viejos = ", ".join(f"old.{c}" for c in columnas)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {tabla} USING fts5({lista}, content='{origen}', "
+        f"content_rowid='id', tokenize='{TOKENIZADOR}', prefix='{PREFIJOS}')",
+        f"CREATE TRIGGER IF NOT EXISTS {tabla}_ai AFTER INSERT ON {origen} BEGIN "
+        f"INSERT INTO {tabla}(rowid, {lista}) VALUES (new.id, {nuevos}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {tabla}_ad AFTER DELETE ON {origen} BEGIN "
+        f"INSERT INTO {tabla}({tabla}, rowid, {lista}) VALUES ('delete', old.id, {viejos}); END",
+        # Solo si cambia el texto: marcar un movimiento como eliminado no toca el índice
+        f"CREATE TRIGGER IF NOT EXISTS {tabla}_au AFTER UPDATE OF {lista} ON {origen} BEGIN "
+        f"INSERT INTO {tabla}({tabla}, rowid, {lista}) VALUES ('delete', old.id, {viejos}); "
+        f"INSERT INTO {tabla}(rowid, {lista}) VALUES (new.id, {nuevos}); END",
+    ]
+
+
+def crear_indices(cursor):
+    """Crea las tablas FTS5 y sus triggers (si no existen) y las llena desde los logs."""
+    for tabla, (modelo, columnas) in INDICES.items():
+        for sentencia in _sentencias_crear(tabla, modelo, columnas):
+            cursor.execute(sentencia)
+        cursor.execute(f"INSERT INTO {tabla}({tabla}) VALUES ('rebuild')")
+
+
+def borrar_indices(cursor):
+    for tabla in INDICES:
+        for sufijo in ("ai", "ad", "au"):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {tabla}_{sufijo}")
+        cursor.execute(f"DROP TABLE IF EXISTS {tabla}")
+
+
+def faltantes():
+    """Tablas FTS y triggers que no están en la base."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existentes = {nombre for (nombre,) in cursor.fetchall()}
+    return [nombre for nombre in [*INDICES, *TRIGGERS] if nombre not in existentes]
+
+
+def disponible():
+    if connection.vendor != "sqlite":
+        return False
+    faltan = faltantes()
+    if faltan and any(tabla not in faltan for tabla in INDICES):
+        logger.warning("Faltan triggers de búsqueda (%s); ejecuta reconstruir_busqueda", ", ".join(faltan))
+    return not faltan
+
+
+@checks.register(checks.Tags.database)
+def revisar_triggers(app_configs, databases=None, **kwargs):
+    """Check de sistema: los triggers FTS5 siguen en la base (ver el docstring del módulo)."""
+    if not databases or "default" not in databases or connection.vendor != "sqlite":
+        return []
+    # Antes de aplicar 0013 (base nueva, o al empezar `migrate`) todavía no existen
+    if ("dashboard", "0013_busqueda_logs") not in MigrationRecorder(connection).applied_migrations():
+        return []
+    faltan = faltantes()
+    if not faltan:
+        return []
+    return [checks.Warning(
+        f"Faltan tablas o triggers de búsqueda: {', '.join(faltan)}. La búsqueda de logs usa icontains.",
+        hint="Ejecuta `python manage.py reconstruir_busqueda`.",
+        id="dashboard.W001",
+    )]
+
+
+def reconstruir():
+    """Regenera los índices desde las tablas de logs; devuelve {tabla: filas indexadas}."""
+    resultado = {}
+    with connection.cursor() as cursor:
+        crear_indices(cursor)
+        for tabla in INDICES:
+            cursor.execute(f"INSERT INTO {tabla}({tabla}) VALUES ('optimize')")
+            cursor.execute(f"SELECT count(*) FROM {tabla}_docsize")
+            resultado[tabla] = cursor.fetchone()[0]
+    return resultado
+
+
+def verificar():
+    """Compara cada índice con su tabla; devuelve la lista de errores en texto."""
+    errores = [f"{nombre}: no existe" for nombre in faltantes()]
+    with connection.cursor() as cursor:
+        for tabla in INDICES:
+            try:
+                cursor.execute(f"INSERT INTO {tabla}({tabla}, rank) VALUES ('integrity-check', 1)")
+            except OperationalError as error:
+                errores.append(f"{tabla}: {error}")
+    return errores
+
+
+# --- CONSULTA ---
+def consulta_fts(texto):
+    """
+    Traduce lo que escribe el usuario a una consulta FTS5 sin operadores
+    sueltos: cada palabra o frase va entre comillas y `*` al final de una
+    palabra se conserva como prefijo. Devuelve "" si no queda nada que buscar.
+    """
+    partes = []
+    for frase, palabra in _TERMINO.findall(texto or ""):
+        prefijo = bool(palabra) and palabra.endswith("*")
+        termino = (frase or palabra).rstrip("*").strip()
+        if termino:
+            partes.append('"' + termino.replace('"', '""') + '"' + ("*" if prefijo else ""))
+    return " ".join(partes)
+
+
+def _buscar_tabla(tabla, consulta, usuario, tipo, desde, hasta, limite):
+    modelo, _ = INDICES[tabla]
+    origen = modelo._meta.db_table
+    condiciones, params = [f"{tabla} MATCH %s"], [consulta]
+    if tipo:
+        condiciones.append("t.tipo = %s" if modelo is MovimientoLog else "t.accion = %s")
+        params.append(tipo)
+    if desde:
+        condiciones.append("t.fecha >= %s")
+        params.append(connection.ops.adapt_datetimefield_value(desde))
+    if hasta:
+        condiciones.append("t.fecha <= %s")
+        params.append(connection.ops.adapt_datetimefield_value(hasta))
+    if usuario:
+        condiciones.append("t.usuario_id IN (SELECT id FROM auth_user WHERE username LIKE %s ESCAPE '\\')")
+        params.append("%" + re.sub(r"([\\%_])", r"\\\1", usuario) + "%")
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT t.id, bm25({tabla}) FROM {tabla} JOIN {origen} t ON t.id = {tabla}.rowid "
+            f"WHERE {' AND '.join(condiciones)} ORDER BY bm25({tabla}) LIMIT %s",
+            [*params, limite],
+        )
+        return [(rango, modelo, pk) for pk, rango in cursor.fetchall()]
+
+
+def buscar(texto, usuario=None, tipo=None, desde=None, hasta=None, limite=50):
+    """
+    Logs (SystemLog y MovimientoLog, con `usuario` cargado) que coinciden con
+    `texto`, del más relevante al menos relevante, hasta `limite`. A cada
+    objeto se le agrega `rango` (bm25, menor es mejor). Lanza ValueError si
+    la consulta no es válida.
+    """
+    consulta = consulta_fts(texto)
+    if not consulta:
+        return []
+    try:
+        coincidencias = sorted(
+            (fila for tabla in INDICES for fila in _buscar_tabla(tabla, consulta, usuario, tipo, desde, hasta, limite)),
+            key=lambda fila: fila[0],
+        )[:limite]
+    except OperationalError as error:
+        raise ValueError(f"Búsqueda no válida: {error}")
+
+    objetos = {}
+    for modelo in (MovimientoLog, SystemLog):
+        ids = [pk for _, m, pk in coincidencias if m is modelo]
+        objetos[modelo] = modelo.objects.select_related("usuario").in_bulk(ids)
+    resultados = []
+    for rango, modelo, pk in coincidencias:
+        objeto = objetos[modelo].get(pk)
+        if objeto is not None:
+            objeto.rango = rango
+            resultados.append(objeto)
+    return resultados
@@ -0,0 +1,114 @@
+"""
+Caché del contexto de `index` por (inicio, fin, versión de los datos).
+
+La versión vive en la base (VersionDatos, una sola fila) y sube con un
+UPDATE atómico dentro de cada escritura: por señales post_save/post_delete
+de IngresoMensual y MovimientoLog, y con `invalidar()` en los caminos que
+escriben con update()/bulk_* (que no disparan señales). Como se lee de la
+base, todos los workers ven la misma versión aunque cada uno tenga su
+propia caché, y no se pierden incrementos concurrentes.
+
+El backend es el alias "tablero" de CACHES: LocMemCache por proceso, que
+descarta las entradas menos usadas al pasar de MAX_ENTRIES (o Redis con
+allkeys-lru para compartirla). Al cambiar la versión las entradas
+anteriores ya no se leen y el LRU las descarta.
+"""
+import threading
+from collections import Counter
+from django.core.cache import InvalidCacheBackendError, caches
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import IngresoMensual, MovimientoLog, ResumenAnual, VersionDatos, fecha_de_periodo
+
+ALIAS = "tablero"
+CLAVE_ACIERTOS = "aciertos"
+CLAVE_FALLOS = "fallos"
+
+# Aciertos y fallos de este proceso: contarlos en la caché era una escritura más por petición
+_contadores = Counter()
+_lock = threading.Lock()
+
+
+def obtener_cache():
+    try:
+        return caches[ALIAS]
+    except InvalidCacheBackendError:
+        return caches["default"]
+
+
+def estado_datos():
+    """(versión, fecha del último cambio) de VersionDatos en una consulta; ETag y Last-Modified de las vistas JSON."""
+    return VersionDatos.objects.filter(pk=1).values_list("version", "actualizado").first() or (0, None)
+
+
+def version_datos():
+    return estado_datos()[0]
+
+
+def invalidar():
+    """
+    Sube la versión de los datos. Es un UPDATE dentro de la transacción de la
+    escritura: se confirma o se deshace con ella y los demás workers la ven
+    en cuanto se confirma.
+    """
+    if not VersionDatos.objects.filter(pk=1).update(version=F("version") + 1, actualizado=timezone.now()):
+        VersionDatos.objects.get_or_create(pk=1, defaults={"version": 1})
+
+
+@receiver([post_save, post_delete], sender=IngresoMensual)
+@receiver([post_save, post_delete], sender=MovimientoLog)
+def _invalidar_por_senal(sender, **kwargs):
+    invalidar()
+
+
+def _contar(clave):
+    with _lock:
+        _contadores[clave] += 1
+
+
+def _normalizar(periodo):
+    if not periodo:
+        return ""
+    fecha = fecha_de_periodo(periodo)
+    return fecha.isoformat() if fecha else "invalido"
+
+
+def contexto_index(inicio, fin):
+    """Registros, periodos, resumen anual y KPIs del tablero; desde caché si la versión no cambió."""
+    cache = obtener_cache()
+    clave = f"tablero:index:{version_datos()}:{_normalizar(inicio)}:{_normalizar(fin)}"
+    contexto = cache.get(clave)
+    if contexto is not None:
+        _contar(CLAVE_ACIERTOS)
+        return contexto
+
+    _contar(CLAVE_FALLOS)
+    registros_qs = IngresoMensual.objects.entre_periodos(inicio, fin)
+    kpis = registros_qs.kpis()
+    contexto = {
+        "registros": list(registros_qs),
+        "periodos": list(
+            IngresoMensual.objects.values_list("periodo", flat=True).order_by("fecha_periodo")
+        ),
+        "resumen_anual": list(ResumenAnual.objects.all()),
+        "promedio_diferencia": kpis["promedio_diferencia"],
+        "porcentaje_deficit": kpis["porcentaje_deficit"],
+        "deficit_acumulado": kpis["deficit_acumulado"],
+    }
+    cache.set(clave, contexto)
+    return contexto
+
+
+def estadisticas():
+    """Aciertos y fallos de este proceso, la versión actual y el backend."""
+    aciertos, fallos = _contadores[CLAVE_ACIERTOS], _contadores[CLAVE_FALLOS]
+    total = aciertos + fallos
+    return {
+        "aciertos": aciertos,
+        "fallos": fallos,
+        "porcentaje_aciertos": aciertos / total * 100 if total else 0,
+        "version": version_datos(),
+        "backend": type(obtener_cache()).__name__,
+    }
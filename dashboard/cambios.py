@@ -0,0 +1,85 @@
+"""
+Feed incremental de cambios para sistemas externos (BI, contabilidad).
+
+En lugar de volver a descargar el reporte completo, el consumidor guarda el
+último cursor recibido y pide solo lo posterior. El cursor es el id de
+MovimientoLog: autoincremental e indexado (clave primaria), y en SQLite,
+con un solo escritor a la vez, los ids se confirman en orden, así que una
+página nunca deja atrás una fila que aparezca después con un id menor.
+
+La respuesta es NDJSON enviado por partes (una línea JSON por registro):
+
+- {"registro": "movimiento", ...}: cada MovimientoLog posterior al cursor,
+  de cualquier tipo ("añadir", "editar", "revertir", "eliminar"), con el
+  valor de la columna antes y después y `eliminado` si se quitó del
+  historial (su efecto sobre los montos llega como un "revertir" aparte);
+- {"registro": "periodo", ...}: los valores actuales de IngresoMensual de
+  cada periodo tocado en la página (`existe: false` si se eliminó);
+- {"registro": "fin", "cursor": N, "hay_mas": bool}: el cursor para la
+  siguiente petición; con `hay_mas` se puede pedir de inmediato.
+"""
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from .models import CAMPOS_CAPTURADOS, CAMPOS_DERIVADOS, IngresoMensual, MovimientoLog, fecha_de_periodo
+
+LIMITE_POR_DEFECTO = 500
+LIMITE_MAXIMO = 5000
+CHUNK_FILAS = 500
+
+CAMPOS_MOVIMIENTO = [
+    "id", "fecha", "usuario__username", "tipo", "periodo", "columna", "monto",
+    "valor_anterior", "valor_nuevo", "observaciones", "eliminado",
+]
+CAMPOS_PERIODO = ["periodo", "fecha_periodo", *CAMPOS_CAPTURADOS, *CAMPOS_DERIVADOS, "observaciones"]
+
+
+def interpretar_parametros(datos):
+    """(cursor, límite, tipos) de los parámetros GET; lanza ValueError si no son válidos."""
+    try:
+        cursor = int(datos.get("cursor") or 0)
+        limite = int(datos.get("limite") or LIMITE_POR_DEFECTO)
+    except ValueError:
+        raise ValueError("cursor y limite deben ser enteros.")
+    if cursor < 0 or limite < 1:
+        raise ValueError("cursor debe ser >= 0 y limite >= 1.")
+    tipos = [tipo for tipo in datos.get("tipos", "").split(",") if tipo]
+    return cursor, min(limite, LIMITE_MAXIMO), tipos
+
+
+def _linea(datos):
+    # Decimal y fechas como texto: el consumidor no pierde centavos por pasar por float
+    return json.dumps(datos, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def lineas(cursor=0, limite=LIMITE_POR_DEFECTO, tipos=None):
+    """Genera las líneas NDJSON de una página del feed posterior a `cursor`."""
+    movimientos = MovimientoLog.objects.filter(id__gt=cursor).order_by("id")
+    if tipos:
+        movimientos = movimientos.filter(tipo__in=tipos)
+
+    ultimo, enviados, periodos, hay_mas = cursor, 0, set(), False
+    # Una fila de más para saber si hay otra página sin hacer un COUNT
+    for fila in movimientos.values(*CAMPOS_MOVIMIENTO)[:limite + 1].iterator(chunk_size=CHUNK_FILAS):
+        if enviados == limite:
+            hay_mas = True
+            break
+        fila["usuario"] = fila.pop("usuario__username")
+        yield _linea({"registro": "movimiento", **fila})
+        ultimo, enviados = fila["id"], enviados + 1
+        if fila["periodo"]:
+            periodos.add(fila["periodo"])
+
+    fechas = {fecha_de_periodo(periodo): periodo for periodo in periodos}
+    fechas.pop(None, None)
+    actuales = {
+        fila["fecha_periodo"]: fila
+        for fila in IngresoMensual.objects.filter(fecha_periodo__in=list(fechas)).values(*CAMPOS_PERIODO)
+    }
+    for fecha in sorted(fechas):
+        fila = actuales.get(fecha)
+        if fila is None:
+            yield _linea({"registro": "periodo", "periodo": fechas[fecha], "fecha_periodo": fecha, "existe": False})
+        else:
+            yield _linea({"registro": "periodo", "existe": True, **fila})
+
+    yield _linea({"registro": "fin", "cursor": ultimo, "movimientos": enviados, "hay_mas": hay_mas})
@@ -0,0 +1,177 @@
+"""
+Bandeja de salida de correos.
+
+Las vistas no hablan con el servidor SMTP: `encolar_correo()` guarda el
+mensaje en CorreoPendiente dentro de la misma transacción que lo origina y
+un worker lo envía después. Cada lote usa una sola conexión de
+`get_connection()`; los fallos se reintentan con espera exponencial hasta
+CORREOS["MAX_INTENTOS"] y el resultado queda en SystemLog.
+
+Con CORREOS["MODO"] = "hilo" el envío lo hace un hilo del propio servidor
+al confirmarse la transacción; con "comando" lo hace
+`python manage.py enviar_correos`.
+"""
+import logging
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from .models import CorreoPendiente, SystemLog
+
+logger = logging.getLogger(__name__)
+
+CONFIGURACION = {
+    "MODO": "hilo",
+    "LOTE": 50,
+    "MAX_INTENTOS": 5,
+    "ESPERA_BASE": 30,  # segundos; se duplica en cada reintento
+    "RESERVA": 300,  # segundos que un worker reserva un lote antes de que otro pueda tomarlo
+}
+
+
+def configuracion():
+    return CONFIGURACION | getattr(settings, "CORREOS", {})
+
+
+def encolar_correo(asunto, mensaje, destinatario, creado_por=None):
+    """Guarda el correo como pendiente; se envía cuando la transacción se confirma."""
+    correo = CorreoPendiente.objects.create(
+        asunto=asunto, mensaje=mensaje, destinatario=destinatario, creado_por=creado_por
+    )
+    if configuracion()["MODO"] == "hilo":
+        transaction.on_commit(despertar_hilo)
+    return correo
+
+
+# --- ENVÍO ---
+def _reservar_lote(tamano, reserva):
+    """
+    Toma hasta `tamano` correos vencidos moviendo su siguiente_intento hacia
+    adelante; si el worker muere, vuelven a estar disponibles al pasar la reserva.
+    """
+    ahora = timezone.now()
+    ids = list(
+        CorreoPendiente.objects.filter(estado=CorreoPendiente.PENDIENTE, siguiente_intento__lte=ahora)
+        .order_by("siguiente_intento", "id")
+        .values_list("id", flat=True)[:tamano]
+    )
+    if not ids:
+        return []
+    reservado_hasta = ahora + timedelta(seconds=reserva)
+    CorreoPendiente.objects.filter(
+        id__in=ids, estado=CorreoPendiente.PENDIENTE, siguiente_intento__lte=ahora
+    ).update(siguiente_intento=reservado_hasta)
+    return list(CorreoPendiente.objects.filter(id__in=ids, siguiente_intento=reservado_hasta).order_by("id"))
+
+
+def _registrar_fallo(correo, error, conf):
+    correo.intentos += 1
+    correo.ultimo_error = str(error)
+    if correo.intentos >= conf["MAX_INTENTOS"]:
+        correo.estado = CorreoPendiente.FALLIDO
+    else:
+        espera = conf["ESPERA_BASE"] * 2 ** (correo.intentos - 1)
+        correo.siguiente_intento = timezone.now() + timedelta(seconds=espera)
+
+
+def enviar_pendientes():
+    """Envía un lote de correos vencidos con una sola conexión. Devuelve (enviados, fallidos)."""
+    conf = configuracion()
+    correos = _reservar_lote(conf["LOTE"], conf["RESERVA"])
+    if not correos:
+        return 0, 0
+
+    conexion = get_connection(fail_silently=False)
+    try:
+        conexion.open()
+    except Exception as e:
+        logger.warning("No se pudo conectar al servidor de correo: %s", e)
+        for correo in correos:
+            _registrar_fallo(correo, e, conf)
+    else:
+        try:
+            for correo in correos:
+                mensaje = EmailMessage(
+                    subject=correo.asunto,
+                    body=correo.mensaje,
+                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    to=[correo.destinatario],
+                    connection=conexion,
+                )
+                try:
+                    mensaje.send()
+                except Exception as e:
+                    _registrar_fallo(correo, e, conf)
+                else:
+                    correo.intentos += 1
+                    correo.estado = CorreoPendiente.ENVIADO
+                    correo.enviado = timezone.now()
+                    correo.ultimo_error = ""
+        finally:
+            conexion.close()
+
+    logs = []
+    for correo in correos:
+        if correo.estado == CorreoPendiente.ENVIADO:
+            logs.append(SystemLog(
+                usuario=correo.creado_por, accion="Correo enviado",
+                detalle=f"'{correo.asunto}' enviado a {correo.destinatario}.",
+            ))
+        elif correo.estado == CorreoPendiente.FALLIDO:
+            logs.append(SystemLog(
+                usuario=correo.creado_por, accion="Error al enviar correo",
+                detalle=f"'{correo.asunto}' a {correo.destinatario} falló tras {correo.intentos} intentos: {correo.ultimo_error}",
+            ))
+    with transaction.atomic():
+        CorreoPendiente.objects.bulk_update(
+            correos, ["estado", "intentos", "siguiente_intento", "ultimo_error", "enviado"]
+        )
+        SystemLog.objects.bulk_create(logs)
+
+    enviados = sum(c.estado == CorreoPendiente.ENVIADO for c in correos)
+    return enviados, len(correos) - enviados
+
+
+def proximo_intento():
+    """Segundos hasta el siguiente correo pendiente, o None si no hay."""
+    siguiente = (
+        CorreoPendiente.objects.filter(estado=CorreoPendiente.PENDIENTE)
+        .order_by("siguiente_intento").values_list("siguiente_intento", flat=True).first()
+    )
+    if siguiente is None:
+        return None
+    return max(0.0, (siguiente - timezone.now()).total_seconds())
+
+
+# --- HILO DE ENVÍO (MODO "hilo") ---
+_despertar = threading.Event()
+_hilo = None
+_lock = threading.Lock()
+
+
+def despertar_hilo():
+    """Avisa al hilo de envío que hay correos nuevos; lo inicia si no está corriendo."""
+    global _hilo
+    with _lock:
+        if _hilo is None or not _hilo.is_alive():
+            _hilo = threading.Thread(target=_enviar_en_segundo_plano, daemon=True, name="correos")
+            _hilo.start()
+    _despertar.set()
+
+
+def _enviar_en_segundo_plano():
+    while True:
+        _despertar.clear()
+        try:
+            while sum(enviar_pendientes()):
+                pass
+            espera = proximo_intento()
+        except Exception:
+            logger.exception("Error en el hilo de envío de correos")
+            espera = configuracion()["ESPERA_BASE"]
+        finally:
+            close_old_connections()
+        # Duerme hasta el próximo reintento o hasta que llegue un correo nuevo
+        _despertar.wait(timeout=espera)
@@ -0,0 +1,176 @@
+"""
+Datos sintéticos para pruebas de rendimiento (ver `manage.py sembrar_datos`).
+
+Genera periodos con montos plausibles (mantenimiento con estacionalidad,
+DPPP como porcentaje, ingresos reales alrededor del total facturado para que
+haya meses con y sin déficit), movimientos por periodo, logs del sistema y
+usuarios. Con la misma semilla se obtiene el mismo conjunto de datos.
+"""
+import random
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from .forms import MovimientoForm
+from .models import IngresoMensual, Instantanea, MovimientoLog, SystemLog
+from .historico import crear_instantanea
+from .resumenes import reconstruir_resumenes
+from . import cache_tablero
+
+MESES_PERIODO = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+# El formato Mes-AA solo cubre 2000-2099 (ver fecha_de_periodo)
+ANIO_MAXIMO = 2099
+PREFIJO_USUARIO = "sintetico_"
+COLUMNAS = [c for c, _ in MovimientoForm.base_fields["columna"].choices]
+ACCIONES_SISTEMA = [
+    "Inicio de sesión", "Cierre de sesión", "Creación de usuario",
+    "Importación de movimientos", "eliminar_movimiento", "Actualización de perfil",
+]
+
+
+def periodo_de_fecha(fecha):
+    return f"{MESES_PERIODO[fecha.month - 1]}-{fecha.year % 100:02d}"
+
+
+def _monto(rng, minimo, maximo):
+    return Decimal(rng.randint(int(minimo * 100), int(maximo * 100))) / 100
+
+
+def _fecha_en_mes(rng, inicio_mes):
+    desplazamiento = timedelta(days=rng.randint(0, 27), seconds=rng.randint(0, 86399))
+    return timezone.make_aware(datetime.combine(inicio_mes, time()) + desplazamiento)
+
+
+def generar_periodos(rng, anio_inicial, anios):
+    periodos = []
+    for anio in range(anio_inicial, anio_inicial + anios):
+        for mes in range(1, 13):
+            fecha = date(anio, mes, 1)
+            # Diciembre y enero cobran más mantenimiento (pagos anuales)
+            mantenimiento = _monto(rng, 800_000, 1_200_000) * (Decimal("1.15") if mes in (1, 12) else 1)
+            ingreso = IngresoMensual(
+                periodo=periodo_de_fecha(fecha),
+                fecha_periodo=fecha,
+                ingresos_mantenimiento=mantenimiento.quantize(Decimal("0.01")),
+                dppp=(mantenimiento * Decimal(rng.uniform(0.02, 0.05))).quantize(Decimal("0.01")),
+                ingresos_cuota_extraordinaria=_monto(rng, 0, 150_000) if rng.random() < 0.3 else Decimal(0),
+                cuota_ordinaria_retroactiva=_monto(rng, 0, 40_000),
+                revision_csau=_monto(rng, 0, 20_000),
+                depositos_garantia_obra=_monto(rng, 0, 60_000) if rng.random() < 0.2 else Decimal(0),
+                ingresos_intereses_cuotas=_monto(rng, 1_000, 25_000),
+                ingresos_rendimiento_inversiones=_monto(rng, 5_000, 80_000),
+                sanciones=_monto(rng, 0, 15_000),
+                recuperacion_seguro_danios=_monto(rng, 0, 30_000) if rng.random() < 0.1 else Decimal(0),
+                recuperacion_gastos_cobranza=_monto(rng, 0, 20_000),
+                depositos_no_identificados=_monto(rng, 0, 10_000),
+            )
+            ingreso.calcular_derivados()
+            # La diferencia facturado - cobrado queda entre -8% y +5% del total
+            ingreso.ingresos_reales_vs_fact = (ingreso.total * Decimal(rng.uniform(0.95, 1.08))).quantize(Decimal("0.01"))
+            ingreso.calcular_derivados()
+            periodos.append(ingreso)
+    return periodos
+
+
+def generar_usuarios(cantidad):
+    # Un solo hash para todos: hashear miles de contraseñas tardaría minutos
+    password = make_password("sintetico")
+    return [
+        User(username=f"{PREFIJO_USUARIO}{i:04d}", email=f"{PREFIJO_USUARIO}{i:04d}@example.com", password=password)
+        for i in range(1, cantidad + 1)
+    ]
+
+
+def generar_movimientos(rng, periodos, por_periodo, usuarios):
+    tipos = ["añadir"] * 8 + ["editar"] * 2
+    for ingreso in periodos:
+        for _ in range(por_periodo):
+            tipo = rng.choice(tipos)
+            columna = rng.choice(COLUMNAS)
+            monto = _monto(rng, 100, 50_000)
+            yield MovimientoLog(
+                fecha=_fecha_en_mes(rng, ingreso.fecha_periodo),
+                usuario=rng.choice(usuarios) if usuarios else None,
+                tipo=tipo,
+                periodo=ingreso.periodo,
+                columna=columna,
+                monto=monto,
+                observaciones=(
+                    f"Añadido {monto} a '{columna}' en {ingreso.periodo}" if tipo == "añadir"
+                    else f"Editado '{columna}' en {ingreso.periodo}"
+                ),
+            )
+
+
+def generar_logs(rng, cantidad, desde, hasta, usuarios):
+    segundos = int((hasta - desde).total_seconds())
+    for _ in range(cantidad):
+        usuario = rng.choice(usuarios) if usuarios else None
+        accion = rng.choice(ACCIONES_SISTEMA)
+        yield SystemLog(
+            fecha=desde + timedelta(seconds=rng.randint(0, segundos)),
+            usuario=usuario,
+            accion=accion,
+            detalle=f"{accion} ({usuario.username if usuario else 'sistema'})",
+        )
+
+
+def periodos_existentes(anio_inicial, anios):
+    return IngresoMensual.objects.filter(
+        fecha_periodo__gte=date(anio_inicial, 1, 1), fecha_periodo__lt=date(anio_inicial + anios, 1, 1)
+    ).count()
+
+
+def limpiar_datos():
+    """Borra periodos, logs, resúmenes, instantáneas y los usuarios sintéticos."""
+    with transaction.atomic():
+        IngresoMensual.objects.all().delete()
+        MovimientoLog.objects.all().delete()
+        SystemLog.objects.all().delete()
+        Instantanea.objects.all().delete()
+        User.objects.filter(username__startswith=PREFIJO_USUARIO).delete()
+        reconstruir_resumenes()
+        crear_instantanea()
+        cache_tablero.invalidar()
+
+
+def sembrar(anios, movimientos_por_periodo, logs, usuarios, anio_inicial=2000, semilla=0):
+    """
+    Inserta el conjunto de datos con bulk_create y reconstruye los resúmenes.
+    Devuelve un dict con lo que se creó.
+    """
+    if anio_inicial < 2000 or anio_inicial + anios - 1 > ANIO_MAXIMO:
+        raise ValueError(f"Los periodos deben quedar entre 2000 y {ANIO_MAXIMO}.")
+    rng = random.Random(semilla)
+
+    with transaction.atomic():
+        existentes = set(User.objects.filter(username__startswith=PREFIJO_USUARIO).values_list("username", flat=True))
+        User.objects.bulk_create([u for u in generar_usuarios(usuarios) if u.username not in existentes])
+        lista_usuarios = list(User.objects.filter(username__startswith=PREFIJO_USUARIO)[:usuarios])
+
+        periodos = generar_periodos(rng, anio_inicial, anios)
+        IngresoMensual.objects.bulk_create(periodos, batch_size=500)
+        MovimientoLog.objects.bulk_create(
+            generar_movimientos(rng, periodos, movimientos_por_periodo, lista_usuarios), batch_size=2000
+        )
+        desde = timezone.make_aware(datetime.combine(periodos[0].fecha_periodo, time()))
+        hasta = timezone.make_aware(
+            datetime.combine(periodos[-1].fecha_periodo + timedelta(days=27), time())
+        )
+        SystemLog.objects.bulk_create(generar_logs(rng, logs, desde, hasta, lista_usuarios), batch_size=2000)
+        reconstruir_resumenes()
+        # Los movimientos sintéticos no traen valores antes/después: el histórico parte de aquí
+        crear_instantanea()
+        # bulk_create no dispara las señales que invalidan la caché del tablero
+        cache_tablero.invalidar()
+
+    return {
+        "periodos": len(periodos),
+        "movimientos": len(periodos) * movimientos_por_periodo,
+        "logs": logs,
+        "usuarios": len(lista_usuarios),
+        "desde": periodos[0].periodo,
+        "hasta": periodos[-1].periodo,
+    }
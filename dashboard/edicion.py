@@ -0,0 +1,110 @@
+"""
+Edición de varias celdas de IngresoMensual en una sola petición.
+
+Recibe una lista de cambios (id, columna, nuevo_valor), los valida todos
+antes de escribir y los aplica en una transacción: un bulk_update de las
+filas que cambian (con los derivados recalculados una vez por fila), los
+resúmenes con `aplicar_cambios` y los MovimientoLog "editar" con un
+bulk_create. Si un cambio no es válido no se aplica ninguno.
+"""
+from decimal import Decimal, InvalidOperation
+from django.core.exceptions import ValidationError
+from .models import CAMPOS_CAPTURADOS, CAMPOS_DERIVADOS, IngresoMensual, MovimientoLog
+from .resumenes import aplicar_cambios, contribucion
+from .historico import programar_instantanea
+from .sqlite_produccion import transaccion_escritura
+from . import cache_tablero
+
+# Las derivadas no se editan: se recalculan a partir de estas
+COLUMNAS_EDITABLES = CAMPOS_CAPTURADOS
+MAX_CAMBIOS = 500
+MAX_ERRORES = 20
+# DecimalField(max_digits=12, decimal_places=2)
+LIMITE_VALOR = Decimal("1e10")
+
+
+def validar_cambios(datos):
+    """
+    Valida la lista de cambios del JSON y devuelve [(id, columna, Decimal)].
+    Lanza ValidationError con todos los errores encontrados (hasta MAX_ERRORES).
+    """
+    if not isinstance(datos, list) or not datos:
+        raise ValidationError("Se esperaba una lista de cambios.")
+    if len(datos) > MAX_CAMBIOS:
+        raise ValidationError(f"Demasiados cambios en una petición (máximo {MAX_CAMBIOS}).")
+
+    validos, errores = [], []
+    for num, cambio in enumerate(datos, start=1):
+        if not isinstance(cambio, dict):
+            errores.append(f"Cambio {num}: se esperaba un objeto con id, columna y nuevo_valor")
+            continue
+        id_registro, columna, bruto = cambio.get("id"), cambio.get("columna"), cambio.get("nuevo_valor")
+        if not isinstance(id_registro, int) or isinstance(id_registro, bool):
+            errores.append(f"Cambio {num}: id no válido {id_registro!r}")
+        if columna not in COLUMNAS_EDITABLES:
+            errores.append(f"Cambio {num}: columna no válida {columna!r}")
+        try:
+            # Los floats de JSON pasan por str para no arrastrar su error binario
+            valor = Decimal(str(bruto).strip())
+            if not valor.is_finite() or valor != valor.quantize(Decimal("0.01")) or abs(valor) >= LIMITE_VALOR:
+                raise InvalidOperation
+        except (InvalidOperation, ValueError):
+            errores.append(f"Cambio {num}: valor no válido {bruto!r}")
+        if len(errores) >= MAX_ERRORES:
+            break
+        if not errores:
+            # Con dos decimales, como se guarda, para que la respuesta coincida con la tabla
+            validos.append((id_registro, columna, valor.quantize(Decimal("0.01"))))
+    if errores:
+        raise ValidationError(errores)
+    return validos
+
+
+def aplicar_ediciones(cambios, usuario=None):
+    """
+    Aplica cambios validados. Devuelve las filas de IngresoMensual que
+    cambiaron (sin las que quedaron igual). Lanza ValidationError si algún
+    id no existe.
+    """
+    with transaccion_escritura():
+        ingresos = IngresoMensual.objects.select_for_update().in_bulk({pk for pk, _, _ in cambios})
+        faltantes = sorted({pk for pk, _, _ in cambios if pk not in ingresos})
+        if faltantes:
+            raise ValidationError(f"No existen los registros: {', '.join(map(str, faltantes))}")
+
+        antes = {pk: contribucion(ingreso) for pk, ingreso in ingresos.items()}
+        logs, columnas, modificados = [], set(), {}
+        # En orden: si una celda viene dos veces, cada log parte del valor anterior
+        for pk, columna, nuevo_valor in cambios:
+            ingreso = ingresos[pk]
+            anterior = getattr(ingreso, columna)
+            if nuevo_valor == anterior:
+                continue
+            setattr(ingreso, columna, nuevo_valor)
+            columnas.add(columna)
+            modificados[pk] = ingreso
+            logs.append(MovimientoLog(
+                usuario=usuario,
+                tipo="editar",
+                periodo=ingreso.periodo,
+                columna=columna,
+                monto=nuevo_valor - anterior,
+                valor_anterior=anterior,
+                valor_nuevo=nuevo_valor,
+                observaciones=f"Editado '{columna}' en {ingreso.periodo}: {anterior} → {nuevo_valor} (edición en lote)",
+            ))
+        if not modificados:
+            return []
+
+        for ingreso in modificados.values():
+            ingreso.calcular_derivados()
+        IngresoMensual.objects.bulk_update(
+            list(modificados.values()), sorted(columnas) + CAMPOS_DERIVADOS, batch_size=500
+        )
+        aplicar_cambios((antes[pk], contribucion(ingreso)) for pk, ingreso in modificados.items())
+        MovimientoLog.objects.bulk_create(logs, batch_size=1000)
+        # bulk_create/bulk_update no disparan señales
+        cache_tablero.invalidar()
+        programar_instantanea()
+
+    return sorted(modificados.values(), key=lambda ingreso: ingreso.fecha_periodo)
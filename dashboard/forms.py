@@ -1,11 +1,11 @@
 from django import forms
-from .models import IngresoMensual
+from .models import IngresoMensual, fecha_de_periodo
 from django.contrib.auth.models import User
 from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
 
 class MovimientoForm(forms.Form):
     periodo = forms.ModelChoiceField(
-        queryset=IngresoMensual.objects.all(),
+        queryset=IngresoMensual.objects.order_by("fecha_periodo"),
         required=False,
         empty_label="Seleccionar periodo existente",
         to_field_name="periodo",
@@ -29,6 +29,30 @@ class MovimientoForm(forms.Form):
     ])
     monto = forms.DecimalField(max_digits=12, decimal_places=2)
 
+    def clean_nuevo_periodo(self):
+        nuevo_periodo = self.cleaned_data["nuevo_periodo"].strip()
+        if nuevo_periodo and fecha_de_periodo(nuevo_periodo) is None:
+            raise forms.ValidationError("Periodo no válido. Usa el formato Mes-AA (año de dos dígitos), ej: Jan-25")
+        return nuevo_periodo
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get("periodo") and not cleaned_data.get("nuevo_periodo"):
+            raise forms.ValidationError("Selecciona un periodo existente o escribe uno nuevo.")
+        return cleaned_data
+
+class ImportarMovimientosForm(forms.Form):
+    archivo = forms.FileField(
+        label="Archivo CSV o XLSX",
+        help_text="Columnas: periodo, columna, monto",
+    )
+
+    def clean_archivo(self):
+        archivo = self.cleaned_data["archivo"]
+        if not archivo.name.lower().endswith((".csv", ".xlsx")):
+            raise forms.ValidationError("Solo se aceptan archivos .csv o .xlsx")
+        return archivo
+
 class CustomUserCreationForm(UserCreationForm):
     email = forms.EmailField(required=True, label="Correo electrónico")
     is_staff = forms.BooleanField(required=False, label="Es administrador?")
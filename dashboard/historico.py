@@ -0,0 +1,210 @@
+"""
+Consultas "al día": cómo se veían los periodos en un momento dado.
+
+Cada MovimientoLog guarda el valor de su columna antes y después del cambio
+(`valor_anterior`/`valor_nuevo`) y cada tanto se toma una Instantanea con
+las columnas capturadas de todos los periodos. El estado en un momento D se
+reconstruye desde la última instantánea anterior a D aplicando solo los
+movimientos entre ambas, así que el costo no depende de la antigüedad del
+log sino de HISTORICO["MOVIMIENTOS_POR_INSTANTANEA"].
+
+Al reconstruir se usa el valor posterior de cada movimiento (no su monto):
+aplicar una entrada dos veces o en un orden casi simultáneo no cambia el
+resultado. Los "eliminar" quitan el periodo; un movimiento sobre un periodo
+que no existe lo crea en ceros, como hace `aplicar_movimiento`.
+
+La historia empieza en la primera instantánea (la crea la migración 0012);
+antes de ella los movimientos no guardaban valores y no se puede reconstruir.
+`archivar_logs` la adelanta: borra las instantáneas cuyos movimientos archiva.
+"""
+from datetime import datetime
+from decimal import Decimal
+from django.conf import settings
+from django.db.models import Max, Min
+from django.db import transaction
+from django.utils import timezone
+from .models import (
+    CAMPOS_CAPTURADOS, CAMPOS_GRAFICA, IngresoMensual, Instantanea, InstantaneaPeriodo, MovimientoLog,
+    fecha_de_periodo,
+)
+from .resumenes import calcular_resumenes
+from .sqlite_produccion import transaccion_escritura
+
+CONFIGURACION = {
+    "MOVIMIENTOS_POR_INSTANTANEA": 1000,
+}
+
+
+def configuracion():
+    return CONFIGURACION | getattr(settings, "HISTORICO", {})
+
+
+class SinHistoria(ValueError):
+    """El momento pedido es anterior a la primera instantánea."""
+
+
+# --- INSTANTÁNEAS ---
+def crear_instantanea():
+    """Copia las columnas capturadas de todos los periodos; devuelve la Instantanea."""
+    # BEGIN IMMEDIATE: ninguna escritura queda a medias entre la fecha y la lectura,
+    # así todo movimiento con fecha anterior ya está incluido en la copia
+    with transaccion_escritura():
+        instantanea = Instantanea.objects.create()
+        filas = list(IngresoMensual.objects.values("periodo", "fecha_periodo", *CAMPOS_CAPTURADOS))
+        InstantaneaPeriodo.objects.bulk_create([
+            InstantaneaPeriodo(
+                instantanea=instantanea,
+                periodo=fila.pop("periodo"),
+                fecha_periodo=fila.pop("fecha_periodo"),
+                valores={campo: str(valor) for campo, valor in fila.items()},
+            )
+            for fila in filas
+        ], batch_size=500)
+        instantanea.num_periodos = len(filas)
+        instantanea.save(update_fields=["num_periodos"])
+    return instantanea
+
+
+def crear_instantanea_si_corresponde():
+    """Toma una instantánea si desde la última hay MOVIMIENTOS_POR_INSTANTANEA o más movimientos."""
+    limite = configuracion()["MOVIMIENTOS_POR_INSTANTANEA"]
+    ultima = Instantanea.objects.aggregate(fecha=Max("fecha"))["fecha"]
+    recientes = MovimientoLog.objects.all() if ultima is None else MovimientoLog.objects.filter(fecha__gt=ultima)
+    if recientes[:limite].count() >= limite:
+        return crear_instantanea()
+    return None
+
+
+def programar_instantanea():
+    """Revisa si toca una instantánea cuando la transacción actual se confirma."""
+    transaction.on_commit(crear_instantanea_si_corresponde)
+
+
+# --- RECONSTRUCCIÓN ---
+def interpretar_momento(texto):
+    """Convierte "2025-03-01T18:30" (input datetime-local) a un datetime con zona; None si viene vacío."""
+    if not texto:
+        return None
+    try:
+        momento = datetime.fromisoformat(texto)
+    except ValueError:
+        raise ValueError(f"Fecha no válida: {texto!r}")
+    return timezone.make_aware(momento) if timezone.is_naive(momento) else momento
+
+
+def inicio_historia():
+    return Instantanea.objects.aggregate(fecha=Min("fecha"))["fecha"]
+
+
+def _ingreso(periodo, fecha_periodo, valores=None):
+    ingreso = IngresoMensual(periodo=periodo, fecha_periodo=fecha_periodo)
+    for campo, valor in (valores or {}).items():
+        setattr(ingreso, campo, Decimal(valor))
+    return ingreso
+
+
+def estado_en(momento, inicio=None, fin=None):
+    """
+    Periodos (IngresoMensual sin guardar, con derivados) tal como estaban en
+    `momento`, en orden cronológico y filtrados por rango como `entre_periodos`.
+    Lanza SinHistoria si `momento` es anterior a la primera instantánea.
+    """
+    desde = fecha_de_periodo(inicio) if inicio else None
+    hasta = fecha_de_periodo(fin) if fin else None
+    if (inicio and desde is None) or (fin and hasta is None):
+        return []
+
+    instantanea = Instantanea.objects.filter(fecha__lte=momento).order_by("-fecha").first()
+    if instantanea is None:
+        primera = timezone.localtime(inicio_historia() or timezone.now())
+        raise SinHistoria(f"No hay datos históricos antes de {primera:%Y-%m-%d %H:%M}.")
+
+    def en_rango(fecha):
+        return (desde is None or fecha >= desde) and (hasta is None or fecha <= hasta)
+
+    filas = InstantaneaPeriodo.objects.filter(instantanea=instantanea)
+    if desde:
+        filas = filas.filter(fecha_periodo__gte=desde)
+    if hasta:
+        filas = filas.filter(fecha_periodo__lte=hasta)
+    periodos = {
+        fecha: _ingreso(periodo, fecha, valores)
+        for periodo, fecha, valores in filas.values_list("periodo", "fecha_periodo", "valores")
+    }
+
+    cola = MovimientoLog.objects.filter(fecha__gt=instantanea.fecha, fecha__lte=momento).order_by("fecha", "id")
+    for tipo, periodo, columna, valor_nuevo in cola.values_list("tipo", "periodo", "columna", "valor_nuevo"):
+        fecha = fecha_de_periodo(periodo)
+        if fecha is None or not en_rango(fecha):
+            continue
+        if tipo == "eliminar":
+            periodos.pop(fecha, None)
+        elif valor_nuevo is not None and columna in CAMPOS_CAPTURADOS:
+            if fecha not in periodos:
+                periodos[fecha] = _ingreso(periodo, fecha)
+            setattr(periodos[fecha], columna, valor_nuevo)
+
+    registros = [periodos[fecha] for fecha in sorted(periodos)]
+    for ingreso in registros:
+        ingreso.calcular_derivados()
+    return registros
+
+
+def kpis(registros):
+    """Lo mismo que IngresoMensualQuerySet.kpis() para una lista en memoria."""
+    num_periodos = len(registros)
+    diferencias = [r.diferencia_ingresos_fac_vs_cobrados for r in registros]
+    deficits = [d for d in diferencias if d < 0]
+    return {
+        "num_periodos": num_periodos,
+        "promedio_diferencia": sum(diferencias, Decimal(0)) / num_periodos if num_periodos else Decimal(0),
+        "porcentaje_deficit": len(deficits) / num_periodos * 100 if num_periodos else 0,
+        "deficit_acumulado": sum(deficits, Decimal(0)),
+        "totales_categoria": [sum((getattr(r, c) for r in registros), Decimal(0)) for c in CAMPOS_GRAFICA],
+    }
+
+
+def contexto_en(momento, inicio, fin):
+    """Registros, periodos, resumen anual y KPIs del tablero (como cache_tablero.contexto_index) en `momento`."""
+    todos = estado_en(momento)
+    desde = fecha_de_periodo(inicio) if inicio else None
+    hasta = fecha_de_periodo(fin) if fin else None
+    if (inicio and desde is None) or (fin and hasta is None):
+        registros = []
+    else:
+        registros = [
+            r for r in todos
+            if (desde is None or r.fecha_periodo >= desde) and (hasta is None or r.fecha_periodo <= hasta)
+        ]
+    indicadores = kpis(registros)
+    anuales, _ = calcular_resumenes(todos)
+    return {
+        "registros": registros,
+        "periodos": [r.periodo for r in todos],
+        "resumen_anual": [{"anio": anio, **metricas} for anio, metricas in sorted(anuales.items())],
+        "promedio_diferencia": indicadores["promedio_diferencia"],
+        "porcentaje_deficit": indicadores["porcentaje_deficit"],
+        "deficit_acumulado": indicadores["deficit_acumulado"],
+    }
+
+
+def diferencias_historico(momento=None):
+    """
+    Compara el estado reconstruido (última instantánea + movimientos) con
+    IngresoMensual; devuelve una lista de diferencias en texto.
+    """
+    momento = momento or timezone.now()
+    reconstruidos = {r.fecha_periodo: r for r in estado_en(momento)}
+    errores = []
+    for ingreso in IngresoMensual.objects.order_by("fecha_periodo"):
+        reconstruido = reconstruidos.pop(ingreso.fecha_periodo, None)
+        if reconstruido is None:
+            errores.append(f"{ingreso.periodo}: falta en el histórico")
+            continue
+        for campo in CAMPOS_CAPTURADOS:
+            if getattr(ingreso, campo) != getattr(reconstruido, campo):
+                errores.append(
+                    f"{ingreso.periodo}.{campo}: histórico {getattr(reconstruido, campo)} != actual {getattr(ingreso, campo)}"
+                )
+    errores += [f"{r.periodo}: está en el histórico pero ya no existe" for r in reconstruidos.values()]
+    return errores
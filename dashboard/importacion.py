@@ -0,0 +1,203 @@
+"""
+Importación masiva de movimientos desde CSV o XLSX.
+
+El archivo debe tener las columnas `periodo`, `columna` y `monto` (con
+encabezado). Todas las filas se validan antes de escribir; los montos se
+suman por (periodo, columna) y se aplican en una sola transacción con un
+bulk_update de los periodos afectados y un bulk_create de los MovimientoLog.
+"""
+import csv
+import io
+import time
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+from django.core.exceptions import ValidationError
+from .edicion import LIMITE_VALOR
+from .forms import MovimientoForm
+from .models import CAMPOS_DERIVADOS, IngresoMensual, MovimientoLog, fecha_de_periodo
+from .resumenes import aplicar_cambios, contribucion
+from .historico import programar_instantanea
+from .sqlite_produccion import transaccion_escritura
+from . import cache_tablero
+
+COLUMNAS_ARCHIVO = ["periodo", "columna", "monto"]
+COLUMNAS_VALIDAS = dict(MovimientoForm.base_fields["columna"].choices)
+MAX_ERRORES = 20
+
+
+def leer_filas(archivo, nombre):
+    """Itera (número de línea, periodo, columna, monto) de un archivo CSV o XLSX."""
+    if nombre.lower().endswith(".xlsx"):
+        yield from _leer_xlsx(archivo)
+    else:
+        yield from _leer_csv(archivo)
+
+
+def _leer_csv(archivo):
+    texto = io.TextIOWrapper(archivo, encoding="utf-8-sig", newline="")
+    try:
+        muestra = texto.read(4096)
+        texto.seek(0)
+        try:
+            dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t")
+        except csv.Error:
+            dialecto = csv.excel
+        lector = csv.reader(texto, dialecto)
+        encabezado = [c.strip().lower() for c in next(lector, [])]
+        _validar_encabezado(encabezado)
+        indices = [encabezado.index(c) for c in COLUMNAS_ARCHIVO]
+        for num_linea, fila in enumerate(lector, start=2):
+            if not any(c.strip() for c in fila):
+                continue
+            yield (num_linea, *[fila[i] if i < len(fila) else "" for i in indices])
+    except UnicodeDecodeError:
+        raise ValidationError("El archivo CSV debe estar en UTF-8.")
+    except csv.Error as e:
+        raise ValidationError(f"El archivo CSV no se pudo leer: {e}")
+
+
+def _leer_xlsx(archivo):
+    from openpyxl import load_workbook
+
+    wb = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        filas = wb.active.iter_rows(values_only=True)
+        encabezado = [str(c or "").strip().lower() for c in next(filas, ())]
+        _validar_encabezado(encabezado)
+        indices = [encabezado.index(c) for c in COLUMNAS_ARCHIVO]
+        for num_linea, fila in enumerate(filas, start=2):
+            if not any(c not in (None, "") for c in fila):
+                continue
+            yield (num_linea, *["" if fila[i] is None else str(fila[i]) for i in indices])
+    finally:
+        wb.close()
+
+
+def _validar_encabezado(encabezado):
+    faltantes = [c for c in COLUMNAS_ARCHIVO if c not in encabezado]
+    if faltantes:
+        raise ValidationError(f"Faltan columnas en el encabezado: {', '.join(faltantes)}")
+
+
+def validar_filas(filas):
+    """
+    Valida las filas leídas y devuelve una lista de
+    (periodo, fecha_periodo, columna, monto). Lanza ValidationError con
+    todos los errores encontrados (hasta MAX_ERRORES).
+    """
+    validas, errores = [], []
+    for num_linea, periodo, columna, monto in filas:
+        periodo, columna = periodo.strip(), columna.strip()
+        fecha = fecha_de_periodo(periodo)
+        if fecha is None:
+            errores.append(f"Línea {num_linea}: periodo no válido '{periodo}'")
+        if columna not in COLUMNAS_VALIDAS:
+            errores.append(f"Línea {num_linea}: columna no válida '{columna}'")
+        try:
+            monto = Decimal(monto.strip())
+            if not monto.is_finite() or monto != monto.quantize(Decimal("0.01")) or abs(monto) >= LIMITE_VALOR:
+                raise InvalidOperation
+        except InvalidOperation:
+            errores.append(f"Línea {num_linea}: monto no válido '{monto}'")
+        if len(errores) >= MAX_ERRORES:
+            break
+        if not errores:
+            validas.append((periodo, fecha, columna, monto))
+    if errores:
+        raise ValidationError(errores)
+    return validas
+
+
+def aplicar_movimientos(movimientos, usuario=None, origen="importación"):
+    """
+    Aplica movimientos validados en una sola transacción. Devuelve
+    (periodos afectados, periodos creados). Lanza ValidationError, sin
+    aplicar nada, si alguna celda o total queda fuera de LIMITE_VALOR.
+    """
+    deltas = defaultdict(lambda: defaultdict(Decimal))
+    nombres = {}
+    for periodo, fecha, columna, monto in movimientos:
+        deltas[fecha][columna] += monto
+        nombres.setdefault(fecha, periodo)
+
+    # BEGIN IMMEDIATE: en SQLite select_for_update no bloquea; así nadie escribe entre la lectura y el bulk_update
+    with transaccion_escritura():
+        ingresos = {
+            i.fecha_periodo: i
+            for i in IngresoMensual.objects.select_for_update().filter(fecha_periodo__in=deltas)
+        }
+        cambios = {fecha: contribucion(i) for fecha, i in ingresos.items()}
+
+        nuevos = [
+            IngresoMensual(periodo=nombres[fecha], fecha_periodo=fecha)
+            for fecha in deltas if fecha not in ingresos
+        ]
+        IngresoMensual.objects.bulk_create(nuevos)
+        for ingreso in nuevos:
+            ingresos[ingreso.fecha_periodo] = ingreso
+            cambios[ingreso.fecha_periodo] = None
+
+        # Valores antes/después de cada fila del archivo, en el orden en que vienen
+        logs = []
+        for periodo, fecha, columna, monto in movimientos:
+            ingreso = ingresos[fecha]
+            anterior = getattr(ingreso, columna) or Decimal(0)
+            setattr(ingreso, columna, anterior + monto)
+            logs.append(MovimientoLog(
+                usuario=usuario,
+                tipo="añadir",
+                periodo=ingreso.periodo,
+                columna=columna,
+                monto=monto,
+                valor_anterior=anterior,
+                valor_nuevo=anterior + monto,
+                observaciones=f"Añadido {monto} a '{columna}' en {ingreso.periodo} ({origen})",
+            ))
+
+        columnas_afectadas, fuera_de_rango = set(), []
+        for fecha, por_columna in deltas.items():
+            columnas_afectadas.update(por_columna)
+            ingreso = ingresos[fecha]
+            ingreso.calcular_derivados()
+            fuera_de_rango += [
+                f"{ingreso.periodo}: '{campo}' quedaría en {getattr(ingreso, campo)}"
+                for campo in [*por_columna, *CAMPOS_DERIVADOS]
+                if abs(getattr(ingreso, campo)) >= LIMITE_VALOR
+            ]
+        if fuera_de_rango:
+            # Sale de la transacción: los periodos creados arriba también se deshacen
+            raise ValidationError(fuera_de_rango[:MAX_ERRORES])
+
+        IngresoMensual.objects.bulk_update(
+            list(ingresos.values()), sorted(columnas_afectadas) + CAMPOS_DERIVADOS, batch_size=500
+        )
+        aplicar_cambios(
+            (antes, contribucion(ingresos[fecha])) for fecha, antes in cambios.items()
+        )
+
+        MovimientoLog.objects.bulk_create(logs, batch_size=1000)
+        # bulk_create/bulk_update no disparan señales
+        cache_tablero.invalidar()
+        programar_instantanea()
+
+    return len(ingresos), len(nuevos)
+
+
+def importar_movimientos(archivo, nombre, usuario=None):
+    """
+    Lee, valida y aplica un archivo de movimientos. Devuelve un dict con
+    filas, periodos, periodos_creados, segundos y filas_por_segundo.
+    """
+    inicio = time.perf_counter()
+    movimientos = validar_filas(leer_filas(archivo, nombre))
+    if not movimientos:
+        raise ValidationError("El archivo no contiene movimientos.")
+    periodos, creados = aplicar_movimientos(movimientos, usuario, origen=f"importado de {nombre}")
+    segundos = time.perf_counter() - inicio
+    return {
+        "filas": len(movimientos),
+        "periodos": periodos,
+        "periodos_creados": creados,
+        "segundos": segundos,
+        "filas_por_segundo": len(movimientos) / segundos if segundos else 0,
+    }
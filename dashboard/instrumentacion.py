@@ -0,0 +1,173 @@
+"""
+Medición por petición: consultas SQL, tiempo en SQL, consultas más lentas y
+tiempo de render de plantillas (ver InstrumentacionMiddleware).
+
+Las consultas se cuentan con `connection.execute_wrapper`; el render se mide
+envolviendo `Template._render` (solo la plantilla exterior, así que incluye
+las consultas que se hagan al recorrer querysets desde la plantilla). Cada
+proceso guarda además una ventana de las últimas duraciones por vista para
+la página de rendimiento.
+
+Con INSTRUMENTACION["ACTIVA"] = False el middleware se desactiva al arrancar
+(MiddlewareNotUsed) y no se instala nada.
+"""
+import contextvars
+import heapq
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from statistics import median, quantiles
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CONFIGURACION = {
+    "ACTIVA": False,
+    "LENTAS": 3,  # consultas más lentas que se reportan por petición
+    "VENTANA": 500,  # peticiones recientes por vista para el histograma
+}
+
+# Límites superiores (ms) de las barras del histograma
+LIMITES_HISTOGRAMA = [10, 25, 50, 100, 250, 500, 1000, 2500]
+
+medicion_actual = contextvars.ContextVar("medicion", default=None)
+
+
+def configuracion():
+    return CONFIGURACION | getattr(settings, "INSTRUMENTACION", {})
+
+
+class Medicion:
+    def __init__(self, lentas):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.tiempo_sql = 0.0
+        self.tiempo_plantillas = 0.0
+        self.renderizando = False
+        self._lentas = []  # min-heap de (segundos, sql)
+        self._num_lentas = lentas
+
+    def envoltura(self, execute, sql, params, many, context):
+        """Para connection.execute_wrapper: cuenta y cronometra cada consulta."""
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracion = time.perf_counter() - inicio
+            self.consultas += 1
+            self.tiempo_sql += duracion
+            if len(self._lentas) < self._num_lentas:
+                heapq.heappush(self._lentas, (duracion, sql))
+            elif duracion > self._lentas[0][0]:
+                heapq.heapreplace(self._lentas, (duracion, sql))
+
+    def lentas(self):
+        return [
+            {"ms": round(duracion * 1000, 2), "sql": sql[:300]}
+            for duracion, sql in sorted(self._lentas, reverse=True)
+        ]
+
+    def server_timing(self, total):
+        return ", ".join([
+            f'sql;desc="{self.consultas} consultas";dur={self.tiempo_sql * 1000:.1f}',
+            f"tpl;dur={self.tiempo_plantillas * 1000:.1f}",
+            f"total;dur={total * 1000:.1f}",
+        ])
+
+
+# --- RENDER DE PLANTILLAS ---
+_plantillas_instaladas = False
+
+
+def instalar_medicion_plantillas():
+    """Envuelve Template._render una sola vez; sin medición activa solo delega."""
+    global _plantillas_instaladas
+    if _plantillas_instaladas:
+        return
+    from django.template.base import Template
+
+    original = Template._render
+
+    def _render(self, context):
+        medicion = medicion_actual.get()
+        if medicion is None or medicion.renderizando:
+            return original(self, context)
+        medicion.renderizando = True
+        inicio = time.perf_counter()
+        try:
+            return original(self, context)
+        finally:
+            medicion.tiempo_plantillas += time.perf_counter() - inicio
+            medicion.renderizando = False
+
+    Template._render = _render
+    _plantillas_instaladas = True
+
+
+# --- HISTOGRAMA POR VISTA (por proceso) ---
+class Estadisticas:
+    def __init__(self, ventana):
+        self._lock = threading.Lock()
+        self._duraciones = defaultdict(lambda: deque(maxlen=ventana))
+        self._consultas = defaultdict(lambda: deque(maxlen=ventana))
+        self._total = defaultdict(int)
+
+    def registrar(self, vista, ms, consultas):
+        with self._lock:
+            self._duraciones[vista].append(ms)
+            self._consultas[vista].append(consultas)
+            self._total[vista] += 1
+
+    def resumen(self):
+        """Una fila por vista con percentiles y conteos por barra del histograma."""
+        with self._lock:
+            datos = {v: (list(d), list(self._consultas[v]), self._total[v]) for v, d in self._duraciones.items()}
+        filas = []
+        for vista, (duraciones, consultas, total) in sorted(datos.items()):
+            barras = [0] * (len(LIMITES_HISTOGRAMA) + 1)
+            for ms in duraciones:
+                barras[next((i for i, limite in enumerate(LIMITES_HISTOGRAMA) if ms <= limite), -1)] += 1
+            percentiles = quantiles(duraciones, n=100, method="inclusive") if len(duraciones) > 1 else duraciones * 99
+            filas.append({
+                "vista": vista,
+                "peticiones": total,
+                "muestras": len(duraciones),
+                "p50": median(duraciones),
+                "p95": percentiles[94],
+                "p99": percentiles[98],
+                "maximo": max(duraciones),
+                "consultas_promedio": sum(consultas) / len(consultas),
+                "barras": barras,
+            })
+        return filas
+
+
+_estadisticas = None
+
+
+def obtener_estadisticas():
+    global _estadisticas
+    if _estadisticas is None:
+        _estadisticas = Estadisticas(configuracion()["VENTANA"])
+    return _estadisticas
+
+
+def registrar_peticion(request, response, medicion, total):
+    """Agrega la petición al histograma de su vista y escribe la línea de log."""
+    coincidencia = getattr(request, "resolver_match", None)
+    # Sin vista resuelta (404) se agrupa todo junto para no crear una entrada por URL
+    vista = coincidencia.view_name if coincidencia else "(sin vista)"
+    obtener_estadisticas().registrar(vista, total * 1000, medicion.consultas)
+    logger.info(json.dumps({
+        "vista": vista,
+        "metodo": request.method,
+        "ruta": request.path,
+        "estado": response.status_code,
+        "ms": round(total * 1000, 2),
+        "consultas": medicion.consultas,
+        "sql_ms": round(medicion.tiempo_sql * 1000, 2),
+        "plantillas_ms": round(medicion.tiempo_plantillas * 1000, 2),
+        "lentas": medicion.lentas(),
+    }, ensure_ascii=False))
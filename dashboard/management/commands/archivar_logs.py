@@ -0,0 +1,50 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.retencion import (
+    activar_vacuum_incremental, archivar, configuracion, directorio, limite_caliente, modo_vacuum, verificar_todo,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve los SystemLog y MovimientoLog con más de RETENCION['DIAS'] días a archivos "
+        "JSONL comprimidos por mes (verificados con sha256 antes de borrar), los borra de la "
+        "base en lotes y devuelve el espacio con vacuum incremental."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dias", type=int, help="Antigüedad mínima en días (por defecto RETENCION['DIAS']).")
+        parser.add_argument("--simular", action="store_true", help="Solo cuenta las filas que se archivarían.")
+        parser.add_argument("--verificar", action="store_true",
+                            help="Solo comprueba los archivos existentes contra el manifiesto.")
+        parser.add_argument("--activar-vacuum", action="store_true",
+                            help="Pasa la base a auto_vacuum=INCREMENTAL (VACUUM completo, bloquea la base).")
+
+    def handle(self, *args, **options):
+        if options["verificar"]:
+            errores = verificar_todo()
+            for error in errores:
+                self.stderr.write(error)
+            if errores:
+                raise CommandError(f"{len(errores)} archivos con problemas en {directorio()}")
+            self.stdout.write(self.style.SUCCESS("Todos los archivos coinciden con el manifiesto."))
+            return
+
+        if options["activar_vacuum"] and modo_vacuum() not in (None, "incremental"):
+            inicio = time.perf_counter()
+            activar_vacuum_incremental()
+            self.stdout.write(f"auto_vacuum=INCREMENTAL activado ({time.perf_counter() - inicio:.1f} s)")
+        elif modo_vacuum() == "none" and not options["simular"]:
+            self.stdout.write(
+                "Aviso: auto_vacuum desactivado; las páginas liberadas se reutilizan pero el archivo "
+                "no se achica (usa --activar-vacuum una vez)."
+            )
+
+        dias = options["dias"] if options["dias"] is not None else configuracion()["DIAS"]
+        self.stdout.write(f"Archivando lo anterior a {limite_caliente(dias):%Y-%m-%d %H:%M} en {directorio()}")
+        inicio = time.perf_counter()
+        resultado = archivar(dias, simular=options["simular"], informar=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(
+            f"SystemLog: {resultado['systemlog']} | MovimientoLog: {resultado['movimientolog']} "
+            f"({time.perf_counter() - inicio:.1f} s)"
+        ))
@@ -0,0 +1,124 @@
+import math
+import random
+import time
+from collections import defaultdict
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from dashboard.analitica import VENTANAS_MOVILES, analizar, cargar
+from dashboard.datos_sinteticos import generar_periodos
+from dashboard.models import CAMPOS_GRAFICA, CAMPOS_TOTAL, IngresoMensual
+
+# Los periodos sintéticos van desde el año 2100 para no mezclarse con los reales
+ANIO_INICIAL = 2100
+
+
+def analizar_en_python(registros):
+    """Los mismos indicadores con bucles sobre instancias, como se hacía antes."""
+    mensual = defaultdict(lambda: defaultdict(int))
+    for r in registros:
+        clave = (r.fecha_periodo.year, r.fecha_periodo.month)
+        for campo in CAMPOS_GRAFICA:
+            mensual[clave][campo] += getattr(r, campo)
+        mensual[clave]["total"] += r.total
+    anios = sorted({anio for anio, _ in mensual})
+
+    def variacion_de(anio, campo):
+        # Solo los meses que también tiene el año calendario anterior
+        meses = [mes for a, mes in mensual if a == anio and (anio - 1, mes) in mensual]
+        actual = sum(mensual[(anio, mes)][campo] for mes in meses)
+        base = sum(mensual[(anio - 1, mes)][campo] for mes in meses)
+        return (actual - base) / base * 100 if base else None
+
+    variacion = {
+        campo: [variacion_de(anio, campo) for anio in anios] for campo in CAMPOS_GRAFICA + ["total"]
+    }
+
+    totales = [r.total for r in registros]
+    moviles = {
+        n: [None] * (n - 1) + [sum(totales[i - n + 1:i + 1]) / n for i in range(n - 1, len(totales))]
+        for n in VENTANAS_MOVILES
+    }
+    suma_total = sum(totales)
+    participacion = {
+        campo: sum(getattr(r, campo) for r in registros) / suma_total * 100 for campo in CAMPOS_TOTAL
+    }
+
+    mas_larga = actual = 0
+    for r in registros:
+        actual = actual + 1 if r.diferencia_ingresos_fac_vs_cobrados < 0 else 0
+        mas_larga = max(mas_larga, actual)
+    return {"variacion": variacion, "moviles": moviles, "participacion": participacion,
+            "racha_mas_larga": mas_larga, "racha_actual": actual}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide los indicadores de dashboard/analitica.py (carga columnar + pandas) sobre N "
+        "periodos sintéticos contra el cálculo con bucles sobre instancias, y verifica que "
+        "ambos coinciden. Los periodos se crean en una transacción que se deshace."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--periodos", type=int, default=12000)
+        parser.add_argument("--repeticiones", type=int, default=3)
+
+    def handle(self, *args, **options):
+        n = options["periodos"]
+        with transaction.atomic():
+            periodos = generar_periodos(random.Random(0), ANIO_INICIAL, math.ceil(n / 12))[:n]
+            IngresoMensual.objects.bulk_create(periodos, batch_size=500)
+            qs = IngresoMensual.objects.filter(fecha_periodo__gte=date(ANIO_INICIAL, 1, 1))
+            self.stdout.write(f"{qs.count()} periodos sintéticos")
+
+            tiempos = defaultdict(list)
+            for _ in range(options["repeticiones"]):
+                inicio = time.perf_counter()
+                frame = cargar(qs)
+                tiempos["pandas: carga"].append(time.perf_counter() - inicio)
+                inicio = time.perf_counter()
+                resultado = analizar(frame)
+                tiempos["pandas: indicadores"].append(time.perf_counter() - inicio)
+
+                inicio = time.perf_counter()
+                registros = list(qs.order_by("fecha_periodo"))
+                tiempos["python: carga"].append(time.perf_counter() - inicio)
+                inicio = time.perf_counter()
+                referencia = analizar_en_python(registros)
+                tiempos["python: indicadores"].append(time.perf_counter() - inicio)
+            transaction.set_rollback(True)
+
+        for nombre, valores in tiempos.items():
+            self.stdout.write(f"{nombre:<22}{min(valores) * 1000:10.1f} ms")
+        pandas_total = min(tiempos["pandas: carga"]) + min(tiempos["pandas: indicadores"])
+        python_total = min(tiempos["python: carga"]) + min(tiempos["python: indicadores"])
+        self.stdout.write(self.style.SUCCESS(
+            f"pandas {pandas_total * 1000:.1f} ms vs python {python_total * 1000:.1f} ms "
+            f"({python_total / pandas_total:.1f}x)"
+        ))
+        self._verificar(resultado, referencia)
+
+    def _verificar(self, resultado, referencia):
+        def distintos(a, b):
+            if a is None or b is None:
+                return (a is None) != (b is None)
+            return abs(float(a) - float(b)) > 0.01 + abs(float(b)) * 1e-9
+
+        errores = [
+            f"variación {campo}" for campo, valores in referencia["variacion"].items()
+            if any(distintos(a, b) for a, b in zip(resultado["variacion_anual"][campo], valores))
+        ]
+        errores += [
+            f"promedio móvil {n}" for n, valores in referencia["moviles"].items()
+            if any(distintos(a, b) for a, b in zip(resultado["moviles_total"][n], valores))
+        ]
+        errores += [
+            f"participación {campo}" for campo, valor in referencia["participacion"].items()
+            if distintos(resultado["participacion"][campo], valor)
+        ]
+        for clave in ("racha_mas_larga", "racha_actual"):
+            if resultado[clave]["periodos"] != referencia[clave]:
+                errores.append(clave)
+        if errores:
+            raise CommandError("pandas y el cálculo en Python no coinciden: " + ", ".join(errores))
+        self.stdout.write("Resultados iguales en ambos caminos.")
@@ -0,0 +1,89 @@
+import os
+import subprocess
+import sys
+import time
+from statistics import median
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Se ejecuta en un intérprete nuevo: carga la aplicación WSGI y resuelve las
+# URLs (lo mismo que hace la primera petición, que es cuando se importan las vistas).
+SCRIPT_ARRANQUE = """
+import sys, time
+inicio = time.perf_counter()
+import control_financiero.wsgi
+wsgi = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+urls = time.perf_counter()
+pesados = [m for m in ("pandas", "numpy", "openpyxl") if m in sys.modules]
+print(f"{wsgi - inicio:.6f} {urls - inicio:.6f} {','.join(pesados) or '-'}")
+"""
+
+# Módulos que no deben cargarse al arrancar; se cargan al usar una exportación
+MODULOS_PESADOS = {"pandas", "numpy", "openpyxl"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el arranque en frío de control_financiero.wsgi en procesos nuevos "
+        "e imprime los imports más lentos según python -X importtime."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeticiones", type=int, default=5)
+        parser.add_argument("--top", type=int, default=15, help="Imports más lentos a mostrar.")
+        parser.add_argument("--max-ms", type=float, default=None,
+                            help="Falla si la mediana del arranque supera este tiempo.")
+
+    def _ejecutar(self, importtime=False):
+        comando = [sys.executable]
+        if importtime:
+            comando += ["-X", "importtime"]
+        comando += ["-c", SCRIPT_ARRANQUE]
+        env = os.environ | {"DJANGO_SETTINGS_MODULE": os.environ.get(
+            "DJANGO_SETTINGS_MODULE", "control_financiero.settings")}
+        proceso = subprocess.run(
+            comando, capture_output=True, text=True, cwd=settings.BASE_DIR, env=env
+        )
+        if proceso.returncode != 0:
+            raise CommandError(proceso.stderr.strip().splitlines()[-1])
+        return proceso
+
+    def handle(self, *args, **options):
+        tiempos_wsgi, tiempos_urls, procesos = [], [], []
+        for _ in range(options["repeticiones"]):
+            inicio = time.perf_counter()
+            salida = self._ejecutar().stdout.split()
+            procesos.append(time.perf_counter() - inicio)
+            tiempos_wsgi.append(float(salida[0]))
+            tiempos_urls.append(float(salida[1]))
+            cargados = set(salida[2].split(",")) & MODULOS_PESADOS
+
+        self.stdout.write(f"Repeticiones: {options['repeticiones']} (mediana)")
+        self.stdout.write(f"  import control_financiero.wsgi: {median(tiempos_wsgi) * 1000:8.1f} ms")
+        self.stdout.write(f"  + resolver URLs / vistas:       {median(tiempos_urls) * 1000:8.1f} ms")
+        self.stdout.write(f"  proceso completo:               {median(procesos) * 1000:8.1f} ms")
+        if cargados:
+            self.stdout.write(self.style.WARNING(
+                f"  Módulos pesados cargados al arrancar: {', '.join(sorted(cargados))}"
+            ))
+
+        self.stdout.write("\nImports más lentos (acumulado, -X importtime):")
+        for acumulado, modulo in self._imports_lentos(self._ejecutar(importtime=True).stderr)[:options["top"]]:
+            self.stdout.write(f"  {acumulado / 1000:8.1f} ms  {modulo}")
+
+        if options["max_ms"] is not None and median(tiempos_urls) * 1000 > options["max_ms"]:
+            raise CommandError(
+                f"Arranque de {median(tiempos_urls) * 1000:.1f} ms supera el límite de {options['max_ms']} ms."
+            )
+
+    def _imports_lentos(self, stderr):
+        """Interpreta las líneas 'import time: self | cumulative | módulo' de importtime."""
+        imports = []
+        for linea in stderr.splitlines():
+            if not linea.startswith("import time:") or "cumulative" in linea:
+                continue
+            _, acumulado, modulo = linea[len("import time:"):].split("|")
+            imports.append((int(acumulado), modulo.strip()))
+        return sorted(imports, reverse=True)
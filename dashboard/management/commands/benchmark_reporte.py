@@ -0,0 +1,108 @@
+import resource
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+from decimal import Decimal
+from io import BytesIO
+from django.db import transaction
+from django.core.management.base import BaseCommand
+from dashboard.models import IngresoMensual
+from dashboard.reportes import ENCABEZADOS, escribir_reporte, fila_reporte, fila_totales
+
+
+def reporte_en_memoria(data):
+    """El reporte como se generaba antes: libro completo en memoria, estilos celda por celda."""
+    from openpyxl import Workbook
+    from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Reporte Financiero"
+    ws.append(ENCABEZADOS)
+    for col in range(1, len(ENCABEZADOS) + 1):
+        cell = ws.cell(row=1, column=col)
+        cell.fill = PatternFill("solid", fgColor="1e3a8a")
+        cell.font = Font(color="FFFFFF", bold=True)
+        cell.alignment = Alignment(horizontal="center", vertical="center")
+    for r in data:
+        ws.append(fila_reporte(r))
+    ws.append(fila_totales(len(data)))
+    for cell in ws[ws.max_row]:
+        cell.font = Font(bold=True)
+        cell.fill = PatternFill("solid", fgColor="eab308")
+    lado = Side(style="thin", color="CCCCCC")
+    borde = Border(left=lado, right=lado, top=lado, bottom=lado)
+    for row in ws.iter_rows():
+        for cell in row:
+            cell.border = borde
+    salida = BytesIO()
+    wb.save(salida)
+    return salida.getbuffer().nbytes
+
+
+def reporte_write_only(data):
+    """El camino de los reportes en segundo plano (dashboard/trabajos.py): libro write-only a un archivo."""
+    with tempfile.TemporaryFile() as archivo:
+        escribir_reporte(data, archivo)
+        return archivo.tell()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el reporte Excel que usan los trabajos en segundo plano (libro write-only "
+        "escrito a archivo) contra el libro completo en memoria: tiempo total y pico de memoria."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--periodos", type=int, default=5000,
+                            help="Periodos sintéticos a generar (se descartan al terminar).")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self._crear_periodos(options["periodos"])
+            data = IngresoMensual.objects.all().order_by("id")
+            # El modo write-only va primero porque ru_maxrss solo crece
+            for nombre, generar in (("write-only", reporte_write_only), ("memoria", reporte_en_memoria)):
+                self._medir(nombre, data, generar)
+            transaction.set_rollback(True)
+
+    def _crear_periodos(self, n):
+        monto = Decimal("1234.56")
+        IngresoMensual.objects.bulk_create(
+            [
+                IngresoMensual(
+                    periodo=f"B{i:07d}",
+                    # Fechas fuera del rango de los periodos reales (2000-2099) para no chocar
+                    fecha_periodo=date(2100 + i // 12, i % 12 + 1, 1),
+                    ingresos_mantenimiento=monto,
+                    dppp=monto / 10,
+                    ingresos_netos_mantenimiento=monto - monto / 10,
+                    sanciones=monto,
+                    ingresos_reales_vs_fact=monto,
+                )
+                for i in range(n)
+            ],
+            batch_size=500,
+        )
+        self.stdout.write(f"Periodos en la tabla: {IngresoMensual.objects.count()}")
+
+    def _medir(self, nombre, data, generar):
+        # Tiempos sin tracemalloc, que los distorsiona
+        rss_antes = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        inicio = time.perf_counter()
+        tamano = generar(data.all())
+        total = time.perf_counter() - inicio
+        rss_despues = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        tracemalloc.start()
+        generar(data.all())
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        self.stdout.write(
+            f"{nombre:<10} total: {total * 1000:8.1f} ms | "
+            f"pico Python: {pico / 1024 / 1024:7.2f} MiB | "
+            f"incremento RSS máx.: {(rss_despues - rss_antes) / 1024:7.2f} MiB | "
+            f"archivo: {tamano / 1024:.1f} KiB"
+        )
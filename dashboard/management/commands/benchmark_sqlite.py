@@ -0,0 +1,172 @@
+import random
+import sqlite3
+import tempfile
+import multiprocessing
+import time
+from pathlib import Path
+from statistics import median, quantiles
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.test import Client, override_settings
+from django.urls import reverse
+from dashboard import auditoria
+from dashboard.models import IngresoMensual
+
+# "antes": backend sqlite3 de Django con sus valores por defecto (journal DELETE,
+# BEGIN diferido). "despues": el perfil de settings.DATABASES (WAL, pragmas, BEGIN IMMEDIATE).
+PERFILES = ["antes", "despues"]
+
+
+def percentil(valores, p):
+    if len(valores) < 2:
+        return valores[0] if valores else 0
+    return quantiles(valores, n=100, method="inclusive")[p - 1]
+
+
+def _peticion(client, tipo, periodos):
+    if tipo == "escritura":
+        return client.post(reverse("index"), {
+            "añadir": "1", "periodo": random.choice(periodos), "columna": "sanciones", "monto": "1.00",
+        })
+    vista = random.choice(["index", "datos_graficas", "historial_movimientos"])
+    if vista == "index":
+        inicio, fin = sorted(random.choices(range(len(periodos)), k=2))
+        return client.get(reverse(vista), {"inicio": periodos[inicio], "fin": periodos[fin]})
+    return client.get(reverse(vista))
+
+
+def _trabajador(tipo, usuario_id, periodos, segundos, barrera, cola):
+    """Proceso hijo: repite peticiones de un tipo durante `segundos` y envía sus mediciones."""
+    latencias, bloqueos, otros = [], 0, 0
+    try:
+        client = Client(raise_request_exception=True)
+        client.force_login(User.objects.get(pk=usuario_id))
+        barrera.wait()
+        fin = time.perf_counter() + segundos
+        while time.perf_counter() < fin:
+            inicio = time.perf_counter()
+            try:
+                respuesta = _peticion(client, tipo, periodos)
+            except OperationalError as e:
+                if "locked" in str(e) or "busy" in str(e):
+                    bloqueos += 1
+                else:
+                    otros += 1
+                continue
+            if respuesta.status_code >= 500:
+                otros += 1
+                continue
+            latencias.append((time.perf_counter() - inicio) * 1000)
+        auditoria.vaciar()
+    finally:
+        connections.close_all()
+        cola.put((tipo, latencias, bloqueos, otros))
+
+
+class Command(BaseCommand):
+    help = (
+        "Lanza N procesos que registran movimientos y M que leen el tablero, historial "
+        "y datos de gráficas sobre una copia de la base, con el SQLite por defecto y "
+        "con el perfil de producción; reporta latencias p50/p99 y errores de bloqueo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--escritores", type=int, default=4)
+        parser.add_argument("--lectores", type=int, default=4)
+        parser.add_argument("--segundos", type=float, default=10.0, help="Duración por perfil.")
+        parser.add_argument("--perfil", choices=PERFILES + ["ambos"], default="ambos")
+
+    def handle(self, *args, **options):
+        original = connections.settings["default"]
+        if "sqlite" not in original["ENGINE"]:
+            raise CommandError("Este benchmark es solo para SQLite.")
+        perfiles = PERFILES if options["perfil"] == "ambos" else [options["perfil"]]
+
+        with tempfile.TemporaryDirectory() as directorio, override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            # Caché propia para no mezclar datos de la copia con los de la base real
+            CACHES=settings.CACHES | {"tablero": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "LOCATION": directorio,
+            }},
+        ):
+            for perfil in perfiles:
+                copia = Path(directorio) / f"{perfil}.sqlite3"
+                self._copiar_base(original["NAME"], copia, wal=perfil == "despues")
+                self._usar_base(self._configuracion(original, perfil, copia))
+                try:
+                    resultados = self._ejecutar(options["escritores"], options["lectores"], options["segundos"])
+                finally:
+                    auditoria.vaciar()
+                    self._usar_base(original)
+                self._imprimir(perfil, resultados, options["segundos"])
+
+    # --- PREPARACIÓN ---
+    @staticmethod
+    def _copiar_base(origen, destino, wal):
+        fuente, copia = sqlite3.connect(origen), sqlite3.connect(destino)
+        try:
+            fuente.backup(copia)
+            copia.execute(f"PRAGMA journal_mode = {'WAL' if wal else 'DELETE'}")
+        finally:
+            fuente.close()
+            copia.close()
+
+    @staticmethod
+    def _configuracion(original, perfil, copia):
+        configuracion = dict(original, NAME=str(copia))
+        if perfil == "antes":
+            configuracion.update(ENGINE="django.db.backends.sqlite3", OPTIONS={})
+        return configuracion
+
+    @staticmethod
+    def _usar_base(configuracion):
+        """Las conexiones que se abran desde aquí (y en los procesos hijos) usan esta configuración."""
+        connections["default"].close()
+        connections.settings["default"] = configuracion
+        connections["default"] = connections.create_connection("default")
+
+    # --- EJECUCIÓN ---
+    def _ejecutar(self, escritores, lectores, segundos):
+        usuario = User.objects.filter(is_staff=True).first()
+        if usuario is None:
+            usuario = User.objects.create_user("benchmark_sqlite", is_staff=True)
+        periodos = list(IngresoMensual.objects.values_list("periodo", flat=True))
+        if not periodos:
+            raise CommandError("La base no tiene periodos; ejecuta antes un seed o una importación.")
+
+        # Procesos y no hilos, como los workers de gunicorn: así el GIL no serializa las peticiones
+        contexto = multiprocessing.get_context("fork")
+        cola = contexto.Queue()
+        barrera = contexto.Barrier(escritores + lectores)
+        connections.close_all()
+        procesos = [
+            contexto.Process(target=_trabajador, args=(tipo, usuario.pk, periodos, segundos, barrera, cola))
+            for tipo in ["escritura"] * escritores + ["lectura"] * lectores
+        ]
+        for proceso in procesos:
+            proceso.start()
+
+        latencias = {"escritura": [], "lectura": []}
+        errores = {"escritura": {"bloqueo": 0, "otros": 0}, "lectura": {"bloqueo": 0, "otros": 0}}
+        for _ in procesos:
+            tipo, valores, bloqueos, otros = cola.get()
+            latencias[tipo].extend(valores)
+            errores[tipo]["bloqueo"] += bloqueos
+            errores[tipo]["otros"] += otros
+        for proceso in procesos:
+            proceso.join()
+        return latencias, errores
+
+    def _imprimir(self, perfil, resultados, segundos):
+        latencias, errores = resultados
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Perfil {perfil}"))
+        for tipo in ("escritura", "lectura"):
+            valores = latencias[tipo]
+            self.stdout.write(
+                f"  {tipo:<10} {len(valores):>6} ok ({len(valores) / segundos:,.1f}/s)  "
+                f"p50 {median(valores) if valores else 0:8.1f} ms  p99 {percentil(valores, 99):8.1f} ms  "
+                f"bloqueos {errores[tipo]['bloqueo']}  otros errores {errores[tipo]['otros']}"
+            )
@@ -0,0 +1,184 @@
+import itertools
+import json
+import tempfile
+import time
+import tracemalloc
+from statistics import median
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from dashboard.models import IngresoMensual, TrabajoReporte
+from dashboard.trabajos import ejecutar_trabajo
+
+# Presupuesto por escenario: milisegundos (mediana), consultas SQL y MiB de
+# pico de memoria de Python. Pensados para `sembrar_datos` con sus valores
+# por defecto; se pueden reemplazar con --presupuestos archivo.json.
+PRESUPUESTOS = {
+    "index": {"ms": 400, "consultas": 10, "mib": 20},
+    "index (caché)": {"ms": 200, "consultas": 4, "mib": 10},
+    "index filtrado": {"ms": 300, "consultas": 10, "mib": 15},
+    "index histórico": {"ms": 400, "consultas": 10, "mib": 20},
+    "index añadir": {"ms": 500, "consultas": 40, "mib": 20},
+    "index editar": {"ms": 500, "consultas": 40, "mib": 20},
+    "editar en lote": {"ms": 300, "consultas": 40, "mib": 10},
+    "datos_analitica": {"ms": 300, "consultas": 6, "mib": 20},
+    "ranking_totales": {"ms": 150, "consultas": 6, "mib": 5},
+    "generar_reporte": {"ms": 100, "consultas": 10, "mib": 5},
+    "reporte (trabajo)": {"ms": 1000, "consultas": 15, "mib": 10},
+    "historial_movimientos": {"ms": 200, "consultas": 10, "mib": 10},
+    "feed_cambios": {"ms": 300, "consultas": 6, "mib": 10},
+    "admin_logs": {"ms": 200, "consultas": 10, "mib": 10},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide las vistas principales con el cliente de pruebas (tiempo, consultas SQL "
+        "y pico de memoria) y falla si algún escenario supera su presupuesto. Todo "
+        "corre dentro de una transacción que se deshace al terminar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeticiones", type=int, default=5)
+        parser.add_argument("--presupuestos", help="JSON con {escenario: {ms, consultas, mib}} que reemplaza los valores por defecto.")
+        parser.add_argument("--escenario", action="append", help="Solo estos escenarios (se puede repetir).")
+
+    def handle(self, *args, **options):
+        presupuestos = {nombre: dict(valores) for nombre, valores in PRESUPUESTOS.items()}
+        if options["presupuestos"]:
+            with open(options["presupuestos"]) as archivo:
+                for nombre, valores in json.load(archivo).items():
+                    presupuestos.setdefault(nombre, {}).update(valores)
+
+        periodos = list(IngresoMensual.objects.order_by("fecha_periodo").values_list("periodo", flat=True))
+        if len(periodos) < 2:
+            raise CommandError("Se necesitan al menos 2 periodos; ejecuta antes `sembrar_datos`.")
+        escenarios = self._escenarios(periodos)
+        if options["escenario"]:
+            desconocidos = set(options["escenario"]) - set(escenarios)
+            if desconocidos:
+                raise CommandError(f"Escenarios desconocidos: {', '.join(sorted(desconocidos))}")
+            escenarios = {n: e for n, e in escenarios.items() if n in options["escenario"]}
+
+        excedidos = []
+        # Caché y directorio de reportes propios: lo generado dentro de la
+        # transacción deshecha no debe quedar guardado
+        with tempfile.TemporaryDirectory() as directorio, override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            CACHES=settings.CACHES | {"tablero": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+            REPORTES=getattr(settings, "REPORTES", {}) | {"DIRECTORIO": directorio},
+        ), transaction.atomic():
+            client = Client(raise_request_exception=True)
+            client.force_login(self._usuario())
+            self.stdout.write(f"{'escenario':<24}{'ms (mediana)':>14}{'consultas':>11}{'pico MiB':>10}")
+            for nombre, (funcion, limpiar_cache) in escenarios.items():
+                resultado = self._medir(client, funcion, limpiar_cache, options["repeticiones"])
+                fuera = {
+                    clave: (resultado[clave], limite)
+                    for clave, limite in presupuestos.get(nombre, {}).items()
+                    if resultado[clave] > limite
+                }
+                estilo = self.style.ERROR if fuera else self.style.SUCCESS
+                self.stdout.write(estilo(
+                    f"{nombre:<24}{resultado['ms']:>14.1f}{resultado['consultas']:>11}{resultado['mib']:>10.2f}"
+                ))
+                excedidos += [
+                    f"{nombre}: {clave} {valor:.1f} > {limite}" for clave, (valor, limite) in fuera.items()
+                ]
+            transaction.set_rollback(True)
+
+        if excedidos:
+            raise CommandError("Presupuesto excedido:\n" + "\n".join(excedidos))
+
+    @staticmethod
+    def _usuario():
+        usuario = User.objects.filter(is_staff=True).first()
+        if usuario is None:
+            usuario = User.objects.create_user("benchmark_vistas", is_staff=True)
+        return usuario
+
+    @staticmethod
+    def _escenarios(periodos):
+        """{nombre: (función(client), limpiar la caché del tablero antes)}"""
+        index = reverse("index")
+        inicio, fin = periodos[len(periodos) // 4], periodos[len(periodos) // 2]
+        ultimo = IngresoMensual.objects.order_by("-fecha_periodo").first()
+        ultimos = list(IngresoMensual.objects.order_by("-fecha_periodo").values_list("id", flat=True)[:12])
+        valores = itertools.count(1)
+
+        def editar_en_lote(client):
+            # 12 periodos x 3 columnas; el valor cambia en cada repetición para que no sea un no-op
+            valor = f"{next(valores)}.00"
+            cambios = [
+                {"id": pk, "columna": columna, "nuevo_valor": valor}
+                for pk in ultimos for columna in ("dppp", "sanciones", "revision_csau")
+            ]
+            return client.post(reverse("editar_celdas"), json.dumps({"cambios": cambios}),
+                               content_type="application/json")
+
+        def reporte_trabajo(client):
+            trabajo = TrabajoReporte.objects.create(
+                usuario=User.objects.filter(is_staff=True).first(), inicio=periodos[0], fin=periodos[-1]
+            )
+            ejecutar_trabajo(trabajo.id)
+
+        def feed_cambios(client):
+            # La respuesta va por partes: las consultas corren mientras se consume
+            respuesta = client.get(reverse("feed_cambios"), {"limite": 2000})
+            b"".join(respuesta.streaming_content)
+            return respuesta
+
+        return {
+            "index": (lambda c: c.get(index), True),
+            "index (caché)": (lambda c: c.get(index), False),
+            "index filtrado": (lambda c: c.get(index, {"inicio": inicio, "fin": fin}), True),
+            # Última instantánea + movimientos posteriores (ver dashboard/historico.py)
+            "index histórico": (lambda c: c.get(index, {"al": timezone.localtime().isoformat()}), True),
+            "index añadir": (lambda c: c.post(index, {
+                "añadir": "1", "periodo": ultimo.periodo, "columna": "sanciones", "monto": "1.00",
+            }), True),
+            "index editar": (lambda c: c.post(index, {
+                "editar": "1", "id_registro": ultimo.id, "columna": "revision_csau", "nuevo_valor": "123.45",
+            }), True),
+            "editar en lote": (editar_en_lote, True),
+            "datos_analitica": (lambda c: c.get(reverse("datos_analitica")), True),
+            "ranking_totales": (lambda c: c.get(reverse("ranking_totales"), {"n": 20}), True),
+            "generar_reporte": (lambda c: c.post(index, {
+                "generar_reporte": "1", "inicio": periodos[0], "fin": periodos[-1],
+            }), True),
+            "reporte (trabajo)": (reporte_trabajo, True),
+            "historial_movimientos": (lambda c: c.get(reverse("historial_movimientos")), True),
+            "feed_cambios": (feed_cambios, True),
+            "admin_logs": (lambda c: c.get(reverse("admin_logs")), True),
+        }
+
+    @staticmethod
+    def _medir(client, funcion, limpiar_cache, repeticiones):
+        def ejecutar():
+            if limpiar_cache:
+                caches["tablero"].clear()
+            respuesta = funcion(client)
+            if respuesta is not None and respuesta.status_code >= 400:
+                raise CommandError(f"La vista respondió {respuesta.status_code}")
+
+        ejecutar()  # calentamiento (plantillas, caché del tablero en el escenario con caché)
+        tiempos, consultas = [], 0
+        for _ in range(repeticiones):
+            with CaptureQueriesContext(connection) as capturadas:
+                inicio = time.perf_counter()
+                ejecutar()
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            consultas = max(consultas, len(capturadas))
+
+        # La memoria se mide aparte: tracemalloc distorsiona los tiempos
+        tracemalloc.start()
+        ejecutar()
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {"ms": median(tiempos), "consultas": consultas, "mib": pico / 1024 / 1024}
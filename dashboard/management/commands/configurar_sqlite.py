@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+MODOS = ["WAL", "DELETE"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Cambia el journal_mode de la base SQLite (WAL por defecto). El modo queda guardado "
+        "en el archivo, así que basta ejecutarlo una vez al preparar la base de producción."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--modo", choices=MODOS, default="WAL")
+        parser.add_argument("--solo-verificar", action="store_true",
+                            help="No cambia nada; solo muestra el modo actual.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("Este comando es solo para SQLite.")
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            actual = cursor.fetchone()[0].upper()
+            self.stdout.write(f"journal_mode actual: {actual}")
+            if options["solo_verificar"] or actual == options["modo"]:
+                return
+            cursor.execute(f"PRAGMA journal_mode = {options['modo']}")
+            nuevo = cursor.fetchone()[0].upper()
+        if nuevo != options["modo"]:
+            raise CommandError(f"SQLite dejó el modo en {nuevo} (¿hay otra conexión abierta?).")
+        self.stdout.write(self.style.SUCCESS(f"journal_mode: {actual} → {nuevo}"))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.historico import crear_instantanea, diferencias_historico
+
+
+class Command(BaseCommand):
+    help = (
+        "Verifica que la última instantánea más los movimientos posteriores reproducen "
+        "IngresoMensual y toma una instantánea nueva para las consultas históricas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--solo-verificar", action="store_true",
+                            help="No crea la instantánea; solo reporta diferencias.")
+
+    def handle(self, *args, **options):
+        errores = diferencias_historico()
+        for error in errores:
+            self.stderr.write(error)
+        if errores:
+            self.stderr.write(self.style.WARNING(
+                f"{len(errores)} diferencias entre el histórico y IngresoMensual "
+                "(movimientos sin valores antes/después o cambios fuera de la aplicación)."
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS("El histórico reproduce IngresoMensual."))
+
+        if options["solo_verificar"]:
+            if errores:
+                raise CommandError("El histórico no coincide con IngresoMensual.")
+            return
+        instantanea = crear_instantanea()
+        self.stdout.write(f"Instantánea {instantanea.id}: {instantanea.num_periodos} periodos.")
@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+from dashboard.correos import configuracion, enviar_pendientes, proximo_intento
+
+
+class Command(BaseCommand):
+    help = (
+        "Envía los correos pendientes de la bandeja de salida en lotes, con una "
+        'conexión por lote y reintentos con espera exponencial (CORREOS["MODO"] = "comando").'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--una-vez", action="store_true", help="Envía lo que esté vencido y termina.")
+        parser.add_argument("--intervalo", type=float, default=5.0, help="Máximo de segundos entre consultas.")
+
+    def handle(self, *args, **options):
+        while True:
+            enviados, fallidos = enviar_pendientes()
+            if enviados or fallidos:
+                self.stdout.write(f"{enviados} enviados, {fallidos} con error en el lote.")
+                continue  # puede haber más lotes vencidos
+
+            if options["una_vez"]:
+                break
+            espera = proximo_intento()
+            time.sleep(options["intervalo"] if espera is None else min(espera, options["intervalo"]))
@@ -0,0 +1,112 @@
+import threading
+import time
+from decimal import Decimal
+from django.db import OperationalError, connections, transaction
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.models import IngresoMensual, ResumenAnual, ResumenAnualCategoria, fecha_de_periodo
+from dashboard.movimientos import aplicar_movimiento
+from dashboard.resumenes import actualizar_resumenes
+
+PERIODO_PRUEBA = "Dec-99"
+COLUMNA = "sanciones"
+MONTO = Decimal("1.00")
+
+
+def sumar_leyendo_y_guardando(periodo, columna, monto):
+    """Camino anterior de "añadir": lee la columna, suma en Python y guarda la fila completa."""
+    with transaction.atomic():
+        ingreso, creado = IngresoMensual.objects.get_or_create(
+            fecha_periodo=fecha_de_periodo(periodo), defaults={"periodo": periodo}
+        )
+        with actualizar_resumenes(ingreso, nuevo=creado):
+            setattr(ingreso, columna, (getattr(ingreso, columna) or 0) + monto)
+            ingreso.save()
+
+
+def sumar_con_f(periodo, columna, monto):
+    aplicar_movimiento(periodo, columna, monto)
+
+
+MODOS = {
+    "anterior": sumar_leyendo_y_guardando,
+    "atomico": sumar_con_f,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de estrés: varios hilos suman al mismo periodo a la vez y se "
+        f"verifica que no se pierdan actualizaciones. Usa el periodo {PERIODO_PRUEBA} "
+        "y lo elimina al terminar; ejecútalo sobre una base de pruebas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hilos", type=int, default=8)
+        parser.add_argument("--operaciones", type=int, default=50, help="Sumas por hilo.")
+        parser.add_argument("--modo", choices=list(MODOS) + ["ambos"], default="ambos")
+
+    def handle(self, *args, **options):
+        if IngresoMensual.objects.filter(fecha_periodo=fecha_de_periodo(PERIODO_PRUEBA)).exists():
+            raise CommandError(f"El periodo {PERIODO_PRUEBA} ya existe; no se ejecuta la prueba.")
+
+        modos = list(MODOS) if options["modo"] == "ambos" else [options["modo"]]
+        perdidas_atomico = 0
+        for modo in modos:
+            try:
+                perdidas = self._ejecutar(modo, options["hilos"], options["operaciones"])
+            finally:
+                self._limpiar()
+            if modo == "atomico":
+                perdidas_atomico = perdidas
+
+        if perdidas_atomico:
+            raise CommandError(f"El modo atómico perdió {perdidas_atomico} actualizaciones.")
+
+    def _ejecutar(self, modo, hilos, operaciones):
+        funcion = MODOS[modo]
+        # El periodo se crea antes para que todos los hilos compitan por la misma fila
+        funcion(PERIODO_PRUEBA, COLUMNA, Decimal(0))
+
+        exitosas, errores = [0] * hilos, [0] * hilos
+        barrera = threading.Barrier(hilos)
+
+        def trabajador(indice):
+            try:
+                barrera.wait()
+                for _ in range(operaciones):
+                    try:
+                        funcion(PERIODO_PRUEBA, COLUMNA, MONTO)
+                        exitosas[indice] += 1
+                    except OperationalError:
+                        errores[indice] += 1  # ej. "database is locked" en SQLite
+            finally:
+                connections.close_all()
+
+        inicio = time.perf_counter()
+        threads = [threading.Thread(target=trabajador, args=(i,)) for i in range(hilos)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        segundos = time.perf_counter() - inicio
+
+        esperado = sum(exitosas) * MONTO
+        final = getattr(IngresoMensual.objects.get(fecha_periodo=fecha_de_periodo(PERIODO_PRUEBA)), COLUMNA)
+        perdidas = int((esperado - final) / MONTO)
+        estilo = self.style.SUCCESS if perdidas == 0 else self.style.ERROR
+        self.stdout.write(estilo(
+            f"{modo:<9} {hilos} hilos x {operaciones}: exitosas {sum(exitosas)}, errores {sum(errores)}, "
+            f"esperado {esperado}, final {final}, perdidas {perdidas}, "
+            f"{sum(exitosas) / segundos:,.0f} escrituras/s"
+        ))
+        return perdidas
+
+    def _limpiar(self):
+        fecha = fecha_de_periodo(PERIODO_PRUEBA)
+        with transaction.atomic():
+            for ingreso in IngresoMensual.objects.filter(fecha_periodo=fecha):
+                with actualizar_resumenes(ingreso):
+                    ingreso.delete()
+            if not ResumenAnual.objects.filter(anio=fecha.year, num_periodos__gt=0).exists():
+                ResumenAnual.objects.filter(anio=fecha.year).delete()
+                ResumenAnualCategoria.objects.filter(anio=fecha.year).delete()
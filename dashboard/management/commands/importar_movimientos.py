@@ -0,0 +1,41 @@
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.auditoria import registrar as registrar_auditoria
+from dashboard.importacion import importar_movimientos
+from dashboard.models import SystemLog
+
+
+class Command(BaseCommand):
+    help = "Importa movimientos (periodo, columna, monto) desde un archivo CSV o XLSX."
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo", help="Ruta al archivo .csv o .xlsx")
+        parser.add_argument("--usuario", help="Usuario al que se atribuyen los movimientos.")
+
+    def handle(self, *args, **options):
+        usuario = None
+        if options["usuario"]:
+            try:
+                usuario = User.objects.get(username=options["usuario"])
+            except User.DoesNotExist:
+                raise CommandError(f"No existe el usuario '{options['usuario']}'.")
+
+        try:
+            with open(options["archivo"], "rb") as archivo:
+                resultado = importar_movimientos(archivo, options["archivo"], usuario=usuario)
+        except OSError as e:
+            raise CommandError(str(e))
+        except ValidationError as e:
+            raise CommandError("\n".join(e.messages))
+
+        registrar_auditoria(SystemLog(
+            usuario=usuario,
+            accion="Importación de movimientos",
+            detalle=f"{resultado['filas']} movimientos de '{options['archivo']}' en {resultado['periodos']} periodos.",
+        ))
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['filas']} filas en {resultado['periodos']} periodos "
+            f"({resultado['periodos_creados']} nuevos) en {resultado['segundos']:.3f} s "
+            f"= {resultado['filas_por_segundo']:,.0f} filas/s"
+        ))
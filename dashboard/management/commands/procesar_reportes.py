@@ -0,0 +1,34 @@
+import time
+from django.core.management.base import BaseCommand
+from dashboard.models import TrabajoReporte
+from dashboard.trabajos import ejecutar_trabajo, limpiar_expirados
+
+
+class Command(BaseCommand):
+    help = (
+        'Worker del backend "base_datos": ejecuta los reportes pendientes en orden '
+        "de llegada y borra los archivos vencidos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--una-vez", action="store_true", help="Procesa lo pendiente y termina.")
+        parser.add_argument("--intervalo", type=float, default=2.0, help="Segundos entre consultas.")
+
+    def handle(self, *args, **options):
+        while True:
+            borrados = limpiar_expirados()
+            if borrados:
+                self.stdout.write(f"{borrados} reportes vencidos eliminados.")
+
+            pendientes = TrabajoReporte.objects.filter(
+                estado=TrabajoReporte.PENDIENTE
+            ).order_by("creado").values_list("id", flat=True)
+            for trabajo_id in pendientes:
+                ejecutar_trabajo(trabajo_id)
+                trabajo = TrabajoReporte.objects.filter(id=trabajo_id).first()
+                if trabajo:
+                    self.stdout.write(f"Reporte {trabajo_id}: {trabajo.estado}")
+
+            if options["una_vez"]:
+                break
+            time.sleep(options["intervalo"])
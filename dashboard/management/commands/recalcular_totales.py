@@ -0,0 +1,36 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.models import IngresoMensual
+from dashboard.resumenes import reconstruir_resumenes
+from dashboard.sqlite_produccion import transaccion_escritura
+from dashboard import cache_tablero
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula con un solo UPDATE los campos derivados guardados de IngresoMensual "
+        "(total, ingresos netos de mantenimiento y diferencia), regenera los resúmenes anuales "
+        "en la misma transacción y verifica que coinciden con los montos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--solo-verificar", action="store_true",
+                            help="No recalcula; solo reporta los periodos desfasados.")
+
+    def handle(self, *args, **options):
+        if not options["solo_verificar"]:
+            inicio = time.perf_counter()
+            with transaccion_escritura():
+                filas = IngresoMensual.objects.recalcular_derivados()
+                # La diferencia y los netos corregidos cambian los resúmenes de su año
+                reconstruir_resumenes()
+                # update() no dispara señales
+                cache_tablero.invalidar()
+            self.stdout.write(f"Recalculados {filas} periodos en {time.perf_counter() - inicio:.2f} s")
+
+        desfasados = list(IngresoMensual.objects.derivados_desfasados().values_list("periodo", flat=True))
+        for periodo in desfasados:
+            self.stderr.write(f"{periodo}: total o derivados no coinciden con los montos")
+        if desfasados:
+            raise CommandError(f"{len(desfasados)} periodos desfasados; ejecuta el comando sin --solo-verificar.")
+        self.stdout.write(self.style.SUCCESS("Totales y derivados consistentes con los montos."))
@@ -0,0 +1,37 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from dashboard.busqueda import buscar, reconstruir, verificar
+
+
+class Command(BaseCommand):
+    help = (
+        "Regenera los índices FTS5 de búsqueda de SystemLog y MovimientoLog (crea tablas y "
+        "triggers si faltan) y verifica que coinciden con los logs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--solo-verificar", action="store_true", help="Solo compara los índices con los logs.")
+        parser.add_argument("--probar", metavar="TEXTO", help="Mide una búsqueda después de reconstruir.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("La búsqueda de texto con FTS5 solo está disponible en SQLite.")
+
+        if not options["solo_verificar"]:
+            inicio = time.perf_counter()
+            for tabla, filas in reconstruir().items():
+                self.stdout.write(f"{tabla}: {filas} filas indexadas")
+            self.stdout.write(f"Reconstruido en {time.perf_counter() - inicio:.2f} s")
+
+        errores = verificar()
+        for error in errores:
+            self.stderr.write(error)
+        if errores:
+            raise CommandError("Los índices no coinciden con los logs; ejecuta el comando sin --solo-verificar.")
+        self.stdout.write(self.style.SUCCESS("Índices de búsqueda al día."))
+
+        if options["probar"]:
+            inicio = time.perf_counter()
+            resultados = buscar(options["probar"])
+            self.stdout.write(f"{len(resultados)} resultados en {(time.perf_counter() - inicio) * 1000:.1f} ms")
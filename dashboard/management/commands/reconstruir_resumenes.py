@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.resumenes import diferencias_resumenes, reconstruir_resumenes
+
+
+class Command(BaseCommand):
+    help = "Reconstruye los resúmenes anuales desde IngresoMensual y los verifica contra los datos base."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--solo-verificar", action="store_true",
+                            help="No reconstruye; solo reporta diferencias.")
+
+    def handle(self, *args, **options):
+        if not options["solo_verificar"]:
+            anios, categorias = reconstruir_resumenes()
+            self.stdout.write(f"Reconstruidos {anios} años y {categorias} totales por categoría.")
+
+        errores = diferencias_resumenes()
+        for error in errores:
+            self.stderr.write(error)
+        if errores:
+            raise CommandError(f"{len(errores)} diferencias entre los resúmenes y IngresoMensual.")
+        self.stdout.write(self.style.SUCCESS("Resúmenes consistentes con IngresoMensual."))
@@ -0,0 +1,43 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.datos_sinteticos import limpiar_datos, periodos_existentes, sembrar
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera un conjunto de datos sintético para pruebas de rendimiento: N años de "
+        "periodos, M movimientos por periodo, K logs del sistema y usuarios. "
+        "Ejecútalo sobre una base de pruebas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--anios", type=int, default=10)
+        parser.add_argument("--desde", type=int, default=2000, help="Primer año (2000-2099).")
+        parser.add_argument("--movimientos", type=int, default=20, help="MovimientoLog por periodo.")
+        parser.add_argument("--logs", type=int, default=2000, help="Entradas de SystemLog.")
+        parser.add_argument("--usuarios", type=int, default=20)
+        parser.add_argument("--semilla", type=int, default=0)
+        parser.add_argument(
+            "--limpiar", action="store_true",
+            help="Borra antes todos los periodos, logs, resúmenes y usuarios sintéticos.",
+        )
+
+    def handle(self, *args, **options):
+        if options["limpiar"]:
+            limpiar_datos()
+        elif periodos_existentes(options["desde"], options["anios"]):
+            raise CommandError("Ya hay periodos en ese rango de años; usa --limpiar o cambia --desde.")
+
+        inicio = time.perf_counter()
+        try:
+            creado = sembrar(
+                options["anios"], options["movimientos"], options["logs"], options["usuarios"],
+                anio_inicial=options["desde"], semilla=options["semilla"],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"{creado['periodos']} periodos ({creado['desde']} a {creado['hasta']}), "
+            f"{creado['movimientos']} movimientos, {creado['logs']} logs y {creado['usuarios']} usuarios "
+            f"en {time.perf_counter() - inicio:.2f} s"
+        ))
@@ -0,0 +1,50 @@
+import time
+from contextlib import ExitStack
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from . import instrumentacion
+from .auditoria import obtener_buffer
+
+
+class AuditoriaMiddleware:
+    """Al terminar cada petición guarda los logs de auditoría pendientes si ya venció el intervalo."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        obtener_buffer().vaciar_si_vencido()
+        return response
+
+
+class InstrumentacionMiddleware:
+    """
+    Mide consultas SQL, tiempo en SQL y render de plantillas de cada petición
+    (dashboard/instrumentacion.py) y los publica en la cabecera Server-Timing
+    y en una línea de log. Va primero en MIDDLEWARE para medir la petición completa.
+    """
+
+    def __init__(self, get_response):
+        conf = instrumentacion.configuracion()
+        if not conf["ACTIVA"]:
+            raise MiddlewareNotUsed
+        instrumentacion.instalar_medicion_plantillas()
+        self.get_response = get_response
+        self.lentas = conf["LENTAS"]
+
+    def __call__(self, request):
+        medicion = instrumentacion.Medicion(self.lentas)
+        token = instrumentacion.medicion_actual.set(medicion)
+        try:
+            with ExitStack() as pila:
+                for conexion in connections.all():
+                    pila.enter_context(conexion.execute_wrapper(medicion.envoltura))
+                response = self.get_response(request)
+        finally:
+            instrumentacion.medicion_actual.reset(token)
+
+        total = time.perf_counter() - medicion.inicio
+        response["Server-Timing"] = medicion.server_timing(total)
+        instrumentacion.registrar_peticion(request, response, medicion, total)
+        return response
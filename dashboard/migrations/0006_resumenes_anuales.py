@@ -0,0 +1,108 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:43
+
+import re
+from collections import defaultdict
+from decimal import Decimal
+from django.db import migrations, models
+
+# Copias fijas del código de la aplicación al escribir esta migración: las
+# migraciones no importan módulos de dashboard, que pueden cambiar después.
+MESES = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+    "ene": 1, "abr": 4, "ago": 8, "dic": 12,
+}
+COLUMNAS_RESUMEN = [
+    "ingresos_mantenimiento", "dppp", "ingresos_netos_mantenimiento",
+    "ingresos_cuota_extraordinaria", "cuota_ordinaria_retroactiva", "revision_csau",
+    "depositos_garantia_obra", "ingresos_intereses_cuotas", "ingresos_rendimiento_inversiones",
+    "sanciones", "recuperacion_seguro_danios", "recuperacion_gastos_cobranza",
+    "depositos_no_identificados", "ingresos_reales_vs_fact",
+]
+
+
+def anio_de_periodo(periodo):
+    coincidencia = re.fullmatch(r"([A-Za-z]{3})-([0-9]{2})", (periodo or "").strip())
+    if coincidencia is None or coincidencia.group(1).lower() not in MESES:
+        return None
+    return 2000 + int(coincidencia.group(2))
+
+
+def construir_resumenes(apps, schema_editor):
+    IngresoMensual = apps.get_model("dashboard", "IngresoMensual")
+    ResumenAnual = apps.get_model("dashboard", "ResumenAnual")
+    ResumenAnualCategoria = apps.get_model("dashboard", "ResumenAnualCategoria")
+
+    anuales = defaultdict(lambda: defaultdict(int))
+    categorias = defaultdict(int)
+    for ingreso in IngresoMensual.objects.all().iterator(chunk_size=2000):
+        anio = anio_de_periodo(ingreso.periodo)
+        if anio is None:
+            continue
+        diferencia = ingreso.diferencia_ingresos_fac_vs_cobrados or Decimal(0)
+        metricas = anuales[anio]
+        metricas["num_periodos"] += 1
+        metricas["periodos_con_deficit"] += int(diferencia < 0)
+        metricas["total_diferencia"] += diferencia
+        metricas["deficit_acumulado"] += min(diferencia, Decimal(0))
+        for columna in COLUMNAS_RESUMEN:
+            categorias[(anio, columna)] += getattr(ingreso, columna) or Decimal(0)
+
+    diferencia_historica = deficit_historico = 0
+    resumenes = []
+    for anio in sorted(anuales):
+        metricas = anuales[anio]
+        diferencia_historica += metricas["total_diferencia"]
+        deficit_historico += metricas["deficit_acumulado"]
+        resumenes.append(ResumenAnual(
+            anio=anio, diferencia_historica=diferencia_historica, deficit_historico=deficit_historico,
+            **metricas,
+        ))
+    ResumenAnual.objects.bulk_create(resumenes)
+    ResumenAnualCategoria.objects.bulk_create([
+        ResumenAnualCategoria(anio=anio, columna=columna, total=total)
+        for (anio, columna), total in categorias.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0005_alter_movimientolog_monto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenAnual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('anio', models.PositiveIntegerField(unique=True)),
+                ('num_periodos', models.IntegerField(default=0)),
+                ('periodos_con_deficit', models.IntegerField(default=0)),
+                ('total_diferencia', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('deficit_acumulado', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('diferencia_historica', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('deficit_historico', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+            ],
+            options={
+                'ordering': ['anio'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenAnualCategoria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('anio', models.PositiveIntegerField()),
+                ('columna', models.CharField(max_length=50)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'ordering': ['anio', 'columna'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='resumenanualcategoria',
+            constraint=models.UniqueConstraint(fields=('anio', 'columna'), name='resumen_anio_columna_unico'),
+        ),
+        migrations.RunPython(construir_resumenes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:05
+
+import re
+from collections import defaultdict
+from datetime import date
+from django.db import migrations, models
+
+# Copia fija de dashboard.models.fecha_de_periodo: las migraciones no
+# importan módulos de dashboard, que pueden cambiar después.
+MESES = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+    "ene": 1, "abr": 4, "ago": 8, "dic": 12,
+}
+
+
+def fecha_de_periodo(periodo):
+    coincidencia = re.fullmatch(r"([A-Za-z]{3})-([0-9]{2})", (periodo or "").strip())
+    if coincidencia is None or coincidencia.group(1).lower() not in MESES:
+        return None
+    return date(2000 + int(coincidencia.group(2)), MESES[coincidencia.group(1).lower()], 1)
+
+
+def rellenar_fecha_periodo(apps, schema_editor):
+    """
+    Antes de escribir nada revisa todos los periodos: los que no se reconocen
+    y los que caen en el mismo mes ("Oct-25", "oct-25", "Oct-25 ") impedirían
+    el índice único. Si hay alguno, falla con la lista de ids para corregirlos
+    o fusionarlos a mano.
+    """
+    IngresoMensual = apps.get_model("dashboard", "IngresoMensual")
+    por_fecha = defaultdict(list)
+    errores = []
+    for ingreso in IngresoMensual.objects.only("id", "periodo").order_by("id").iterator(chunk_size=2000):
+        ingreso.fecha_periodo = fecha_de_periodo(ingreso.periodo)
+        if ingreso.fecha_periodo is None:
+            errores.append(f"IngresoMensual {ingreso.id}: periodo no válido {ingreso.periodo!r}")
+        else:
+            por_fecha[ingreso.fecha_periodo].append(ingreso)
+    for fecha, ingresos in sorted(por_fecha.items()):
+        if len(ingresos) > 1:
+            lista = ", ".join(f"{ingreso.id} ({ingreso.periodo!r})" for ingreso in ingresos)
+            errores.append(f"{fecha:%b-%y}: varios IngresoMensual del mismo mes: {lista}")
+    if errores:
+        raise ValueError(
+            "No se puede rellenar fecha_periodo; corrige estos periodos (formato Jan-25, "
+            "uno por mes) y vuelve a migrar:\n" + "\n".join(errores)
+        )
+    pendientes = [ingreso for ingresos in por_fecha.values() for ingreso in ingresos]
+    IngresoMensual.objects.bulk_update(pendientes, ["fecha_periodo"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0006_resumenes_anuales'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingresomensual',
+            name='fecha_periodo',
+            field=models.DateField(null=True),
+        ),
+        migrations.RunPython(rellenar_fecha_periodo, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='ingresomensual',
+            name='fecha_periodo',
+            field=models.DateField(unique=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0007_ingresomensual_fecha_periodo'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movimientolog',
+            index=models.Index(fields=['fecha', 'id'], name='movlog_fecha_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='systemlog',
+            index=models.Index(fields=['fecha', 'id'], name='systemlog_fecha_id_idx'),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+# Copia fija de dashboard.models.CAMPOS_CAPTURADOS al escribir esta migración
+CAMPOS_CAPTURADOS = [
+    "ingresos_mantenimiento", "dppp", "ingresos_cuota_extraordinaria",
+    "cuota_ordinaria_retroactiva", "revision_csau", "depositos_garantia_obra",
+    "ingresos_intereses_cuotas", "ingresos_rendimiento_inversiones", "sanciones",
+    "recuperacion_seguro_danios", "recuperacion_gastos_cobranza",
+    "depositos_no_identificados", "ingresos_reales_vs_fact",
+]
+
+
+def instantanea_inicial(apps, schema_editor):
+    """Punto de partida del histórico: los movimientos anteriores no guardan valores antes/después."""
+    IngresoMensual = apps.get_model("dashboard", "IngresoMensual")
+    Instantanea = apps.get_model("dashboard", "Instantanea")
+    InstantaneaPeriodo = apps.get_model("dashboard", "InstantaneaPeriodo")
+    filas = list(IngresoMensual.objects.values("periodo", "fecha_periodo", *CAMPOS_CAPTURADOS))
+    instantanea = Instantanea.objects.create(num_periodos=len(filas))
+    InstantaneaPeriodo.objects.bulk_create([
+        InstantaneaPeriodo(
+            instantanea=instantanea,
+            periodo=fila.pop("periodo"),
+            fecha_periodo=fila.pop("fecha_periodo"),
+            valores={campo: str(valor) for campo, valor in fila.items()},
+        )
+        for fila in filas
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0011_bandeja_correos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Instantanea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('num_periodos', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.AddField(
+            model_name='movimientolog',
+            name='valor_anterior',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='movimientolog',
+            name='valor_nuevo',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='movimientolog',
+            name='eliminado',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='trabajoreporte',
+            name='al',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='InstantaneaPeriodo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.CharField(max_length=10)),
+                ('fecha_periodo', models.DateField()),
+                ('valores', models.JSONField()),
+                ('instantanea', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='periodos', to='dashboard.instantanea')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='instantaneaperiodo',
+            constraint=models.UniqueConstraint(fields=('instantanea', 'fecha_periodo'), name='instantanea_periodo_unico'),
+        ),
+        migrations.RunPython(instantanea_inicial, migrations.RunPython.noop),
+    ]
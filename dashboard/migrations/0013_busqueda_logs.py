@@ -0,0 +1,57 @@
+from django.db import migrations
+
+# Copia fija del esquema de dashboard/busqueda.py al escribir esta migración:
+# tabla FTS -> (tabla de origen, columnas indexadas)
+INDICES = {
+    "dashboard_movimientolog_fts": ("dashboard_movimientolog", ["observaciones", "periodo", "columna", "tipo"]),
+    "dashboard_systemlog_fts": ("dashboard_systemlog", ["accion", "detalle"]),
+}
+
+
+def sentencias_crear(tabla, origen, columnas):
+    lista = ", ".join(columnas)
+    nuevos = ", ".join(f"new.{c}" for c in columnas)
+    viejos = ", ".join(f"old.{c}" for c in columnas)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {tabla} USING fts5({lista}, content='{origen}', "
+        f"content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {tabla}_ai AFTER INSERT ON {origen} BEGIN "
+        f"INSERT INTO {tabla}(rowid, {lista}) VALUES (new.id, {nuevos}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {tabla}_ad AFTER DELETE ON {origen} BEGIN "
+        f"INSERT INTO {tabla}({tabla}, rowid, {lista}) VALUES ('delete', old.id, {viejos}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {tabla}_au AFTER UPDATE OF {lista} ON {origen} BEGIN "
+        f"INSERT INTO {tabla}({tabla}, rowid, {lista}) VALUES ('delete', old.id, {viejos}); "
+        f"INSERT INTO {tabla}(rowid, {lista}) VALUES (new.id, {nuevos}); END",
+    ]
+
+
+def crear(apps, schema_editor):
+    """Índices FTS5 de los logs (solo en SQLite; ver dashboard/busqueda.py)."""
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for tabla, (origen, columnas) in INDICES.items():
+            for sentencia in sentencias_crear(tabla, origen, columnas):
+                cursor.execute(sentencia)
+            cursor.execute(f"INSERT INTO {tabla}({tabla}) VALUES ('rebuild')")
+
+
+def borrar(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for tabla in INDICES:
+            for sufijo in ("ai", "ad", "au"):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {tabla}_{sufijo}")
+            cursor.execute(f"DROP TABLE IF EXISTS {tabla}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0012_historico'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear, borrar),
+    ]
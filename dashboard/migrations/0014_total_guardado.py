@@ -0,0 +1,99 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:35
+
+from collections import defaultdict
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import ExpressionWrapper, F
+
+# Copia fija de dashboard.models.CAMPOS_TOTAL al escribir esta migración
+CAMPOS_TOTAL = [
+    "ingresos_netos_mantenimiento",
+    "ingresos_cuota_extraordinaria", "cuota_ordinaria_retroactiva",
+    "revision_csau", "depositos_garantia_obra",
+    "ingresos_intereses_cuotas", "ingresos_rendimiento_inversiones",
+    "sanciones", "recuperacion_seguro_danios",
+    "recuperacion_gastos_cobranza", "depositos_no_identificados",
+]
+# Copia fija de dashboard.models.CAMPOS_RESUMEN
+CAMPOS_RESUMEN = [
+    "ingresos_mantenimiento", "dppp", "ingresos_netos_mantenimiento",
+    "ingresos_cuota_extraordinaria", "cuota_ordinaria_retroactiva", "revision_csau",
+    "depositos_garantia_obra", "ingresos_intereses_cuotas", "ingresos_rendimiento_inversiones",
+    "sanciones", "recuperacion_seguro_danios", "recuperacion_gastos_cobranza",
+    "depositos_no_identificados", "ingresos_reales_vs_fact",
+]
+
+
+def reconstruir_resumenes(apps):
+    """Copia fija de dashboard.resumenes.reconstruir_resumenes al escribir esta migración."""
+    IngresoMensual = apps.get_model("dashboard", "IngresoMensual")
+    ResumenAnual = apps.get_model("dashboard", "ResumenAnual")
+    ResumenAnualCategoria = apps.get_model("dashboard", "ResumenAnualCategoria")
+
+    anuales = defaultdict(lambda: defaultdict(int))
+    categorias = defaultdict(int)
+    for ingreso in IngresoMensual.objects.all().iterator(chunk_size=2000):
+        anio = ingreso.fecha_periodo.year
+        diferencia = ingreso.diferencia_ingresos_fac_vs_cobrados or Decimal(0)
+        metricas = anuales[anio]
+        metricas["num_periodos"] += 1
+        metricas["periodos_con_deficit"] += int(diferencia < 0)
+        metricas["total_diferencia"] += diferencia
+        metricas["deficit_acumulado"] += min(diferencia, Decimal(0))
+        for columna in CAMPOS_RESUMEN:
+            categorias[(anio, columna)] += getattr(ingreso, columna) or Decimal(0)
+
+    diferencia_historica = deficit_historico = 0
+    resumenes = []
+    for anio in sorted(anuales):
+        metricas = anuales[anio]
+        diferencia_historica += metricas["total_diferencia"]
+        deficit_historico += metricas["deficit_acumulado"]
+        resumenes.append(ResumenAnual(
+            anio=anio, diferencia_historica=diferencia_historica, deficit_historico=deficit_historico,
+            **metricas,
+        ))
+    ResumenAnual.objects.all().delete()
+    ResumenAnualCategoria.objects.all().delete()
+    ResumenAnual.objects.bulk_create(resumenes)
+    ResumenAnualCategoria.objects.bulk_create([
+        ResumenAnualCategoria(anio=anio, columna=columna, total=total)
+        for (anio, columna), total in categorias.items()
+    ])
+
+
+def rellenar_total(apps, schema_editor):
+    """
+    Mismas fórmulas que IngresoMensual.calcular_derivados, en un solo UPDATE.
+    Las filas desfasadas cambian su diferencia y sus netos, así que los
+    resúmenes anuales se regeneran en la misma transacción.
+    """
+    decimal = models.DecimalField(max_digits=12, decimal_places=2)
+    netos = F("ingresos_mantenimiento") - F("dppp")
+    total = netos
+    for campo in CAMPOS_TOTAL[1:]:
+        total = total + F(campo)
+    apps.get_model("dashboard", "IngresoMensual").objects.update(
+        ingresos_netos_mantenimiento=ExpressionWrapper(netos, output_field=decimal),
+        total=ExpressionWrapper(total, output_field=decimal),
+        diferencia_ingresos_fac_vs_cobrados=ExpressionWrapper(
+            total - F("ingresos_reales_vs_fact"), output_field=decimal
+        ),
+    )
+    reconstruir_resumenes(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0013_busqueda_logs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingresomensual',
+            name='total',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.RunPython(rellenar_total, migrations.RunPython.noop),
+    ]
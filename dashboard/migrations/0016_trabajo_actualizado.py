@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0015_version_datos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trabajoreporte',
+            name='actualizado',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
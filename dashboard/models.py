@@ -1,9 +1,159 @@
+import re
+from datetime import date
+from decimal import Decimal
 from django.db import models
 from django.utils import timezone
 from django.contrib.auth.models import User
+from django.db.models import Case, Count, DecimalField, ExpressionWrapper, F, Sum, Value, When
+from django.db.models.functions import Abs
+
+# Columnas que se grafican como "Totales por Categoría" (mismo orden que en index.html)
+CAMPOS_GRAFICA = [
+    "ingresos_mantenimiento",
+    "dppp",
+    "ingresos_netos_mantenimiento",
+    "ingresos_cuota_extraordinaria",
+    "cuota_ordinaria_retroactiva",
+    "revision_csau",
+    "depositos_garantia_obra",
+    "ingresos_intereses_cuotas",
+    "ingresos_rendimiento_inversiones",
+    "sanciones",
+    "recuperacion_seguro_danios",
+    "recuperacion_gastos_cobranza",
+    "depositos_no_identificados",
+]
+
+# Columnas cuyo total por año se guarda en ResumenAnualCategoria
+CAMPOS_RESUMEN = CAMPOS_GRAFICA + ["ingresos_reales_vs_fact"]
+
+MESES = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+    # Abreviaturas en español que difieren de las inglesas
+    "ene": 1, "abr": 4, "ago": 8, "dic": 12,
+}
+
+# Mes abreviado y año de exactamente dos dígitos: "Jan-2025" no es "Jan-25" del año 4025
+PATRON_PERIODO = re.compile(r"([A-Za-z]{3})-([0-9]{2})")
+
+def fecha_de_periodo(periodo):
+    """Convierte un periodo como "Jan-25" al primer día del mes; None si no se reconoce."""
+    coincidencia = PATRON_PERIODO.fullmatch((periodo or "").strip())
+    if coincidencia is None:
+        return None
+    mes, anio = coincidencia.groups()
+    if mes.lower() not in MESES:
+        return None
+    return date(2000 + int(anio), MESES[mes.lower()], 1)
+
+class IngresoMensualQuerySet(models.QuerySet):
+    def entre_periodos(self, inicio=None, fin=None):
+        """
+        Filtra por rango de periodos (ej. "Jan-25") usando el índice de
+        `fecha_periodo`, en orden cronológico. Si alguno de los extremos no
+        se reconoce como periodo devuelve un queryset vacío.
+        """
+        qs = self
+        for periodo, lookup in ((inicio, "fecha_periodo__gte"), (fin, "fecha_periodo__lte")):
+            if periodo:
+                fecha = fecha_de_periodo(periodo)
+                if fecha is None:
+                    return self.none()
+                qs = qs.filter(**{lookup: fecha})
+        return qs.order_by("fecha_periodo")
+
+    def kpis(self):
+        """
+        Calcula las tarjetas KPI y los totales por categoría en una sola
+        consulta aggregate(), sin cargar los registros en Python.
+        """
+        cero = Value(Decimal(0), output_field=DecimalField(max_digits=12, decimal_places=2))
+        en_deficit = models.Q(diferencia_ingresos_fac_vs_cobrados__lt=0)
+        agregados = self.aggregate(
+            num_periodos=Count("id"),
+            total_diferencia=Sum("diferencia_ingresos_fac_vs_cobrados", default=cero),
+            periodos_con_deficit=Count(Case(When(en_deficit, then=Value(1)))),
+            deficit_acumulado=Sum(
+                Case(When(en_deficit, then=F("diferencia_ingresos_fac_vs_cobrados")), default=cero),
+                default=cero,
+            ),
+            **{f"total_{campo}": Sum(campo, default=cero) for campo in CAMPOS_GRAFICA},
+        )
+
+        num_periodos = agregados["num_periodos"]
+        return {
+            "num_periodos": num_periodos,
+            "promedio_diferencia": (
+                agregados["total_diferencia"] / num_periodos if num_periodos else Decimal(0)
+            ),
+            "porcentaje_deficit": (
+                agregados["periodos_con_deficit"] / num_periodos * 100 if num_periodos else 0
+            ),
+            "deficit_acumulado": agregados["deficit_acumulado"],
+            "totales_categoria": [agregados[f"total_{campo}"] for campo in CAMPOS_GRAFICA],
+        }
+
+    def recalcular_derivados(self):
+        """
+        Recalcula en un solo UPDATE los campos derivados (incluido `total`);
+        devuelve las filas. No toca los resúmenes anuales: el llamador los
+        regenera en la misma transacción (ver `recalcular_totales`).
+        """
+        return self.order_by().update(**expresiones_derivadas())
+
+    def derivados_desfasados(self):
+        """
+        Filas cuyos derivados guardados no coinciden con sus montos (p. ej.
+        escritas fuera de la aplicación). Tolera medio centavo: SQLite guarda
+        los decimales como REAL.
+        """
+        tolerancia = Decimal("0.005")
+        desfases = {f"desfase_{campo}": Abs(F(campo) - expresion) for campo, expresion in expresiones_derivadas().items()}
+        condicion = models.Q()
+        for alias in desfases:
+            condicion |= models.Q(**{f"{alias}__gt": tolerancia})
+        return self.alias(**desfases).filter(condicion)
+
+# Campos que se calculan a partir de los demás (ver IngresoMensual.calcular_derivados)
+CAMPOS_DERIVADOS = ["ingresos_netos_mantenimiento", "total", "diferencia_ingresos_fac_vs_cobrados"]
+
+# Columnas que se capturan (no derivadas): las que guardan las instantáneas del histórico
+CAMPOS_CAPTURADOS = [campo for campo in CAMPOS_RESUMEN if campo not in CAMPOS_DERIVADOS]
+
+# Campos que suman el total de un periodo
+CAMPOS_TOTAL = [
+    "ingresos_netos_mantenimiento",
+    "ingresos_cuota_extraordinaria", "cuota_ordinaria_retroactiva",
+    "revision_csau", "depositos_garantia_obra",
+    "ingresos_intereses_cuotas", "ingresos_rendimiento_inversiones",
+    "sanciones", "recuperacion_seguro_danios",
+    "recuperacion_gastos_cobranza", "depositos_no_identificados",
+]
+
+def expresiones_derivadas(valor=F):
+    """
+    Equivalente en SQL de IngresoMensual.calcular_derivados, para usar en
+    update(). `valor(campo)` devuelve la expresión del nuevo valor de cada
+    campo (por defecto F(campo)); así un mismo UPDATE puede modificar una
+    columna y recalcular los derivados con el valor ya modificado.
+    """
+    decimal = DecimalField(max_digits=12, decimal_places=2)
+    netos = valor("ingresos_mantenimiento") - valor("dppp")
+    total = netos
+    for campo in CAMPOS_TOTAL[1:]:
+        total = total + valor(campo)
+    return {
+        "ingresos_netos_mantenimiento": ExpressionWrapper(netos, output_field=decimal),
+        "total": ExpressionWrapper(total, output_field=decimal),
+        "diferencia_ingresos_fac_vs_cobrados": ExpressionWrapper(
+            total - valor("ingresos_reales_vs_fact"), output_field=decimal
+        ),
+    }
 
 class IngresoMensual(models.Model):
     periodo = models.CharField(max_length=10)  # Ej: "Jan-25"
+    fecha_periodo = models.DateField(unique=True)  # Primer día del mes de `periodo`
     ingresos_mantenimiento = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     dppp = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     ingresos_netos_mantenimiento = models.DecimalField(max_digits=12, decimal_places=2, default=0)
@@ -18,24 +168,28 @@ class IngresoMensual(models.Model):
     recuperacion_gastos_cobranza = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     depositos_no_identificados = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     ingresos_reales_vs_fact = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Suma de CAMPOS_TOTAL; se guarda (e indexa) para ordenar y filtrar por total en SQL
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0, db_index=True)
     diferencia_ingresos_fac_vs_cobrados = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     observaciones = models.TextField(blank=True, null=True)
-    
-    @property
-    def total(self):
-        campos = [
-            self.ingresos_netos_mantenimiento,
-            self.ingresos_cuota_extraordinaria, self.cuota_ordinaria_retroactiva,
-            self.revision_csau, self.depositos_garantia_obra,
-            self.ingresos_intereses_cuotas, self.ingresos_rendimiento_inversiones,
-            self.sanciones, self.recuperacion_seguro_danios,
-            self.recuperacion_gastos_cobranza, self.depositos_no_identificados
-        ]
-        return sum(campos)
 
-    def save(self, *args, **kwargs):
+    objects = IngresoMensualQuerySet.as_manager()
+
+    def calcular_derivados(self):
+        """
+        Recalcula los campos derivados; save() lo hace siempre, bulk_update no
+        (hay que incluir CAMPOS_DERIVADOS en sus campos) y update() los
+        recalcula con expresiones_derivadas.
+        """
         self.ingresos_netos_mantenimiento = (self.ingresos_mantenimiento or 0) - (self.dppp or 0)
+        self.total = sum(getattr(self, campo) for campo in CAMPOS_TOTAL)
         self.diferencia_ingresos_fac_vs_cobrados = self.total - self.ingresos_reales_vs_fact
+
+    def save(self, *args, **kwargs):
+        self.fecha_periodo = fecha_de_periodo(self.periodo)
+        if self.fecha_periodo is None:
+            raise ValueError(f"Periodo no válido: {self.periodo!r} (formato esperado: Jan-25)")
+        self.calcular_derivados()
         super().save(*args, **kwargs)
 
 
@@ -49,19 +203,176 @@ class MovimientoLog(models.Model):
     periodo = models.CharField(max_length=20, null=True, blank=True)
     columna = models.CharField(max_length=50, null=True, blank=True)
     monto = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    # Valor de la columna antes y después del movimiento (ver dashboard/historico.py);
+    # vacíos en "eliminar" y en los movimientos anteriores al histórico
+    valor_anterior = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    valor_nuevo = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
     observaciones = models.TextField(blank=True, null=True)
+    # Al eliminarlo del historial se oculta en vez de borrarse: el histórico lo sigue necesitando
+    eliminado = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Paginación por cursor en historial y logs (ver dashboard/paginacion.py)
+            models.Index(fields=["fecha", "id"], name="movlog_fecha_id_idx"),
+        ]
 
     def __str__(self):
         return f"{self.fecha:%Y-%m-%d %H:%M} - {self.tipo} ({self.columna})"
 
 class SystemLog(models.Model):
-    fecha = models.DateTimeField(auto_now_add=True)
+    # default en vez de auto_now_add: las entradas se guardan en lote (dashboard/auditoria.py)
+    # y deben conservar la hora de la acción, no la del bulk_create
+    fecha = models.DateTimeField(default=timezone.now)
     usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     accion = models.CharField(max_length=200)
     detalle = models.TextField(blank=True)
 
     class Meta:
         ordering = ["-fecha"]
+        indexes = [
+            models.Index(fields=["fecha", "id"], name="systemlog_fecha_id_idx"),
+        ]
+
+    def __str__(self):
+        return f"[{self.fecha:%Y-%m-%d %H:%M}] {self.usuario} - {self.accion}"
+
+
+# --- RESÚMENES INCREMENTALES (ver dashboard/resumenes.py) ---
+class ResumenAnual(models.Model):
+    anio = models.PositiveIntegerField(unique=True)
+    num_periodos = models.IntegerField(default=0)
+    periodos_con_deficit = models.IntegerField(default=0)
+    total_diferencia = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    deficit_acumulado = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Totales corridos desde el primer año hasta este (inclusive)
+    diferencia_historica = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    deficit_historico = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ["anio"]
+
+    def __str__(self):
+        return str(self.anio)
+
+class ResumenAnualCategoria(models.Model):
+    anio = models.PositiveIntegerField()
+    columna = models.CharField(max_length=50)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ["anio", "columna"]
+        constraints = [
+            models.UniqueConstraint(fields=["anio", "columna"], name="resumen_anio_columna_unico"),
+        ]
+
+    def __str__(self):
+        return f"{self.anio} - {self.columna}"
+
+
+# --- INSTANTÁNEAS PARA CONSULTAS HISTÓRICAS (ver dashboard/historico.py) ---
+class Instantanea(models.Model):
+    fecha = models.DateTimeField(default=timezone.now, db_index=True)
+    num_periodos = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["-fecha"]
+
+    def __str__(self):
+        return f"Instantánea {self.fecha:%Y-%m-%d %H:%M} ({self.num_periodos} periodos)"
+
+class InstantaneaPeriodo(models.Model):
+    instantanea = models.ForeignKey(Instantanea, on_delete=models.CASCADE, related_name="periodos")
+    periodo = models.CharField(max_length=10)
+    fecha_periodo = models.DateField()
+    valores = models.JSONField()  # {columna de CAMPOS_CAPTURADOS: "monto"}
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["instantanea", "fecha_periodo"], name="instantanea_periodo_unico"),
+        ]
+
+    def __str__(self):
+        return f"{self.periodo} ({self.instantanea_id})"
+
+
+# --- REPORTES EN SEGUNDO PLANO (ver dashboard/trabajos.py) ---
+class TrabajoReporte(models.Model):
+    PENDIENTE = "pendiente"
+    EN_PROCESO = "en_proceso"
+    TERMINADO = "terminado"
+    ERROR = "error"
+    ESTADOS = [
+        (PENDIENTE, "Pendiente"),
+        (EN_PROCESO, "En proceso"),
+        (TERMINADO, "Terminado"),
+        (ERROR, "Error"),
+    ]
+
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE)
+    inicio = models.CharField(max_length=10)
+    fin = models.CharField(max_length=10)
+    al = models.DateTimeField(null=True, blank=True)  # estado histórico; vacío = datos actuales
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE)
+    progreso = models.PositiveSmallIntegerField(default=0)  # 0-100
+    total_registros = models.PositiveIntegerField(default=0)
+    archivo = models.CharField(max_length=255, blank=True)  # relativo a REPORTES["DIRECTORIO"]
+    error = models.TextField(blank=True)
+    creado = models.DateTimeField(default=timezone.now)
+    terminado = models.DateTimeField(null=True, blank=True)
+    expira = models.DateTimeField(null=True, blank=True)
+    # Se renueva con cada avance; si deja de cambiar, el worker que lo generaba se detuvo
+    actualizado = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-creado"]
+        indexes = [
+            models.Index(fields=["estado", "creado"], name="trabajo_estado_creado_idx"),
+            models.Index(fields=["expira"], name="trabajo_expira_idx"),
+        ]
+
+    def __str__(self):
+        return f"Reporte {self.inicio} - {self.fin} ({self.estado})"
+
+
+# --- BANDEJA DE SALIDA DE CORREOS (ver dashboard/correos.py) ---
+class CorreoPendiente(models.Model):
+    PENDIENTE = "pendiente"
+    ENVIADO = "enviado"
+    FALLIDO = "fallido"
+    ESTADOS = [
+        (PENDIENTE, "Pendiente"),
+        (ENVIADO, "Enviado"),
+        (FALLIDO, "Fallido"),
+    ]
+
+    creado_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    destinatario = models.EmailField()
+    asunto = models.CharField(max_length=200)
+    mensaje = models.TextField()
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    siguiente_intento = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True)
+    creado = models.DateTimeField(default=timezone.now)
+    enviado = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-creado"]
+        indexes = [
+            models.Index(fields=["estado", "siguiente_intento"], name="correo_estado_intento_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.asunto} -> {self.destinatario} ({self.estado})"
+
+
+
+# --- VERSIÓN DE LOS DATOS (ver dashboard/cache_tablero.py) ---
+class VersionDatos(models.Model):
+    """Fila única (pk=1) cuyo contador sube con cada escritura, en la misma transacción."""
+    version = models.BigIntegerField(default=0)
+    actualizado = models.DateTimeField(default=timezone.now)  # Last-Modified de /index/datos
 
     def __str__(self):
-        return f"[{self.fecha:%Y-%m-%d %H:%M}] {self.usuario} - {self.accion}"
\ No newline at end of file
+        return f"versión {self.version}"
@@ -0,0 +1,102 @@
+"""
+Aplicación de movimientos sobre IngresoMensual sin condiciones de carrera.
+
+En lugar de leer la columna en Python, sumarle el monto y guardar toda la
+fila (lo que pierde actualizaciones cuando dos workers tocan el mismo
+periodo), se emite un único UPDATE con F() que modifica solo la columna del
+movimiento y recalcula los campos derivados en la base de datos. Las
+ediciones de un valor (`fijar_valor`) siguen la misma regla.
+"""
+import copy
+from django.db import transaction
+from django.db.models import F, Value
+from .forms import MovimientoForm
+from .models import IngresoMensual, expresiones_derivadas, fecha_de_periodo
+from .resumenes import aplicar_cambio, contribucion
+from .historico import programar_instantanea
+from . import cache_tablero
+
+COLUMNAS_MOVIMIENTO = {c for c, _ in MovimientoForm.base_fields["columna"].choices}
+
+
+def _sumar(fecha, columna, monto):
+    """UPDATE atómico de una columna más sus derivados; devuelve las filas afectadas."""
+    def valor(campo):
+        return F(campo) + monto if campo == columna else F(campo)
+
+    return IngresoMensual.objects.filter(fecha_periodo=fecha).update(
+        **{columna: valor(columna)}, **expresiones_derivadas(valor)
+    )
+
+
+def _estado_anterior(ingreso, columna, aplicado):
+    anterior = copy.copy(ingreso)
+    setattr(anterior, columna, getattr(ingreso, columna) - aplicado)
+    anterior.calcular_derivados()
+    return anterior
+
+
+def aplicar_movimiento(periodo, columna, monto, crear=True, no_negativo=False):
+    """
+    Suma `monto` a `columna` del periodo y actualiza los resúmenes.
+
+    - crear: si el periodo no existe se crea; con False no se hace nada.
+    - no_negativo: la columna no queda por debajo de 0 (reversiones).
+
+    Devuelve (ingreso actualizado, monto realmente aplicado), o (None, 0)
+    si el periodo no existe y `crear` es False.
+    """
+    if columna not in COLUMNAS_MOVIMIENTO:
+        raise ValueError(f"Columna no válida para un movimiento: {columna!r}")
+    fecha = fecha_de_periodo(periodo)
+    if fecha is None:
+        raise ValueError(f"Periodo no válido: {periodo!r}")
+
+    with transaction.atomic():
+        # El UPDATE va primero: toma el bloqueo de escritura antes de leer
+        creado = False
+        if not _sumar(fecha, columna, monto):
+            if not crear:
+                return None, 0
+            _, creado = IngresoMensual.objects.get_or_create(fecha_periodo=fecha, defaults={"periodo": periodo})
+            _sumar(fecha, columna, monto)
+
+        ingreso = IngresoMensual.objects.get(fecha_periodo=fecha)
+        aplicado = monto
+        valor_final = getattr(ingreso, columna)
+        if no_negativo and valor_final < 0:
+            _sumar(fecha, columna, -valor_final)
+            aplicado -= valor_final
+            ingreso.refresh_from_db()
+
+        antes = None if creado else contribucion(_estado_anterior(ingreso, columna, aplicado))
+        aplicar_cambio(antes, contribucion(ingreso))
+        # update() no dispara señales
+        cache_tablero.invalidar()
+        programar_instantanea()
+    return ingreso, aplicado
+
+
+def fijar_valor(ingreso_id, columna, valor):
+    """
+    Reemplaza el valor de `columna` con un UPDATE de esa columna y sus
+    derivados, sin reescribir la fila: un "añadir" concurrente sobre otra
+    columna no se pierde. La fila se lee dentro de la transacción, así que el
+    cambio en los resúmenes parte del valor vigente. Una columna derivada
+    queda con el valor recalculado, como al guardar.
+
+    Devuelve (ingreso actualizado, valor anterior de la columna). Lanza
+    IngresoMensual.DoesNotExist si el id no existe.
+    """
+    def nuevo(campo):
+        return Value(valor) if campo == columna else F(campo)
+
+    with transaction.atomic():
+        antes = IngresoMensual.objects.select_for_update().get(pk=ingreso_id)
+        IngresoMensual.objects.filter(pk=ingreso_id).update(**{columna: valor, **expresiones_derivadas(nuevo)})
+        ingreso = IngresoMensual.objects.get(pk=ingreso_id)
+        aplicar_cambio(contribucion(antes), contribucion(ingreso))
+        # update() no dispara señales
+        cache_tablero.invalidar()
+        programar_instantanea()
+    return ingreso, getattr(antes, columna)
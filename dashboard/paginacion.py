@@ -0,0 +1,53 @@
+"""
+Paginación por cursor (keyset) sobre (fecha, id) para las tablas de logs.
+
+En lugar de OFFSET, cada página continúa desde la última fila mostrada, así
+que el costo de pedir una página no depende de cuántas filas hay antes.
+"""
+import base64
+from datetime import datetime
+from django.db.models import Q
+
+TAMANO_PAGINA = 50
+TAMANO_MAXIMO = 200
+
+
+def codificar_cursor(fila):
+    texto = f"{fila.fecha.isoformat()}|{fila.pk}"
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor):
+    """Devuelve (fecha, id) o None si el cursor no es válido."""
+    try:
+        texto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        fecha, pk = texto.split("|")
+        return datetime.fromisoformat(fecha), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def tamano_pagina(valor, por_defecto=TAMANO_PAGINA):
+    """Tamaño de página pedido por el cliente, limitado a TAMANO_MAXIMO."""
+    try:
+        return max(1, min(int(valor), TAMANO_MAXIMO))
+    except (TypeError, ValueError):
+        return por_defecto
+
+
+def paginar_por_cursor(queryset, cursor=None, tamano=TAMANO_PAGINA):
+    """
+    Devuelve (filas, siguiente_cursor) en orden descendente por (fecha, id).
+    `siguiente_cursor` es None cuando no hay más filas.
+    """
+    queryset = queryset.order_by("-fecha", "-id")
+    posicion = decodificar_cursor(cursor) if cursor else None
+    if posicion:
+        fecha, pk = posicion
+        queryset = queryset.filter(Q(fecha__lt=fecha) | Q(fecha=fecha, id__lt=pk))
+
+    filas = list(queryset[:tamano + 1])
+    if len(filas) > tamano:
+        filas = filas[:tamano]
+        return filas, codificar_cursor(filas[-1])
+    return filas, None
@@ -0,0 +1,105 @@
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
+
+CONTENT_TYPE_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+NOMBRE_ARCHIVO = "reporte_finanzas.xlsx"
+
+# Tamaño de lote al leer IngresoMensual
+CHUNK_REGISTROS = 500
+
+ENCABEZADOS = [
+    "Periodo", "Ingresos x  Mantenimiento", "DPPP", "Ingresos Netos por Mantenimiento", "Ingreso x Cuota Extraordinaria",
+    "Cuota ordinaria retroactiva", "Revision CSAU", "Depósitos en garantia de obra", "Ingresos x Intereses de Cuotas",
+    "Ingresos por Rendimiento de Inversiones", "Sanciones", "Recuperación de Seguro/daños", "Recuperación de gastos por Cobranza via legal", "Depositos no identificados",
+    "Total", "Ingresos reales vs fact", "Diferencia de ingresos fac vs cobrados", "Observaciones"
+]
+
+
+def fila_reporte(r):
+    """Valores de una fila del reporte para un IngresoMensual."""
+    return [
+        r.periodo, r.ingresos_mantenimiento, r.dppp, r.ingresos_netos_mantenimiento,
+        r.ingresos_cuota_extraordinaria, r.cuota_ordinaria_retroactiva,
+        r.revision_csau, r.depositos_garantia_obra,
+        r.ingresos_intereses_cuotas, r.ingresos_rendimiento_inversiones,
+        r.sanciones, r.recuperacion_seguro_danios,
+        r.recuperacion_gastos_cobranza, r.depositos_no_identificados,
+        r.total, r.ingresos_reales_vs_fact, r.diferencia_ingresos_fac_vs_cobrados
+    ]
+
+
+def fila_totales(num_registros):
+    """Fila final con fórmulas SUM para cada columna numérica."""
+    from openpyxl.utils import get_column_letter
+
+    total_row = ["TOTAL"]
+    for col in range(2, len(ENCABEZADOS) + 1):
+        col_letter = get_column_letter(col)
+        total_row.append(f"=SUM({col_letter}2:{col_letter}{num_registros + 1})")
+    return total_row
+
+
+def _borde():
+    lado = Side(style="thin", color="CCCCCC")
+    return Border(left=lado, right=lado, top=lado, bottom=lado)
+
+
+def _estilos_reporte():
+    """Estilos con nombre del reporte; se registran una sola vez por libro."""
+    borde = _borde()
+    encabezado = NamedStyle(name="reporte_encabezado")
+    encabezado.fill = PatternFill("solid", fgColor="1e3a8a")
+    encabezado.font = Font(color="FFFFFF", bold=True)
+    encabezado.alignment = Alignment(horizontal="center", vertical="center")
+    encabezado.border = borde
+
+    dato = NamedStyle(name="reporte_dato")
+    dato.border = borde
+
+    total = NamedStyle(name="reporte_total")
+    total.font = Font(bold=True)
+    total.fill = PatternFill("solid", fgColor="eab308")
+    total.border = borde
+    return encabezado, dato, total
+
+
+# --- REPORTE (libro write-only) ---
+def escribir_reporte(data, destino, chunk_size=CHUNK_REGISTROS, al_avanzar=None):
+    """
+    Escribe el reporte en `destino` con un libro write-only.
+
+    Las filas se leen del queryset por lotes con `iterator()` y openpyxl las
+    vuelca a disco conforme llegan, así que la memoria no crece con el rango.
+    `data` también puede ser una lista (reportes históricos, ya en memoria).
+    Si se pasa `al_avanzar`, se llama con los registros escritos tras cada lote.
+    Devuelve el número de registros escritos.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Reporte Financiero")
+    encabezado, dato, total = _estilos_reporte()
+    for estilo in (encabezado, dato, total):
+        wb.add_named_style(estilo)
+
+    def celdas(valores, estilo):
+        fila = []
+        for valor in valores:
+            cell = WriteOnlyCell(ws, value=valor)
+            cell.style = estilo.name
+            fila.append(cell)
+        return fila
+
+    ws.append(celdas(ENCABEZADOS, encabezado))
+    num_registros = 0
+    registros = data.iterator(chunk_size=chunk_size) if hasattr(data, "iterator") else data
+    for r in registros:
+        # Se deja la columna de observaciones vacía pero con borde
+        ws.append(celdas(fila_reporte(r) + [None], dato))
+        num_registros += 1
+        if al_avanzar and num_registros % chunk_size == 0:
+            al_avanzar(num_registros)
+    ws.append(celdas(fila_totales(num_registros), total))
+
+    wb.save(destino)
+    return num_registros
+
@@ -0,0 +1,179 @@
+"""
+Resúmenes por año de IngresoMensual mantenidos de forma incremental.
+
+Cada escritura sobre un IngresoMensual se envuelve en `actualizar_resumenes()`
+dentro de la misma transacción: se resta el aporte que tenía el periodo antes
+del cambio y se suma el que tiene después, así que leer los totales de un año
+(o los acumulados históricos) cuesta una fila sin importar cuántos periodos hay.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import F
+from .models import CAMPOS_RESUMEN, IngresoMensual, ResumenAnual, ResumenAnualCategoria, fecha_de_periodo
+
+METRICAS_ANUALES = ["num_periodos", "periodos_con_deficit", "total_diferencia", "deficit_acumulado"]
+
+# Métrica anual -> campo con su total corrido
+HISTORICOS = {
+    "total_diferencia": "diferencia_historica",
+    "deficit_acumulado": "deficit_historico",
+}
+
+
+def contribucion(ingreso):
+    """
+    Aporte de un periodo a los resúmenes: (año, métricas anuales, totales por columna).
+    Devuelve None si el periodo no tiene un año reconocible.
+    """
+    fecha = fecha_de_periodo(ingreso.periodo)
+    if fecha is None:
+        return None
+    diferencia = ingreso.diferencia_ingresos_fac_vs_cobrados or Decimal(0)
+    deficit = diferencia < 0
+    metricas = {
+        "num_periodos": 1,
+        "periodos_con_deficit": int(deficit),
+        "total_diferencia": diferencia,
+        "deficit_acumulado": diferencia if deficit else Decimal(0),
+    }
+    columnas = {campo: getattr(ingreso, campo) or Decimal(0) for campo in CAMPOS_RESUMEN}
+    return fecha.year, metricas, columnas
+
+
+def _acumular(anuales, categorias, aporte, signo=1):
+    anio, metricas, columnas = aporte
+    for metrica, valor in metricas.items():
+        anuales[anio][metrica] += signo * valor
+    for columna, valor in columnas.items():
+        categorias[(anio, columna)] += signo * valor
+
+
+def calcular_resumenes(ingresos):
+    """
+    Calcula desde cero los resúmenes de un iterable de periodos.
+    Devuelve ({año: métricas con históricos}, {(año, columna): total}).
+    """
+    anuales = defaultdict(lambda: defaultdict(int))
+    categorias = defaultdict(int)
+    for ingreso in ingresos:
+        aporte = contribucion(ingreso)
+        if aporte:
+            _acumular(anuales, categorias, aporte)
+
+    corridos = defaultdict(int)
+    resultado = {}
+    for anio in sorted(anuales):
+        metricas = {m: anuales[anio][m] for m in METRICAS_ANUALES}
+        for metrica, historico in HISTORICOS.items():
+            corridos[historico] += metricas[metrica]
+            metricas[historico] = corridos[historico]
+        resultado[anio] = metricas
+    return resultado, dict(categorias)
+
+
+# --- ACTUALIZACIÓN INCREMENTAL ---
+def _asegurar_anio(anio):
+    """Crea la fila del año si no existe, heredando los históricos del año anterior."""
+    previo = ResumenAnual.objects.filter(anio__lt=anio).order_by("-anio").first()
+    ResumenAnual.objects.get_or_create(anio=anio, defaults={
+        historico: getattr(previo, historico) if previo else 0
+        for historico in HISTORICOS.values()
+    })
+
+
+def aplicar_cambio(antes, despues):
+    """Aplica a las tablas de resumen la diferencia entre dos aportes (o None)."""
+    aplicar_cambios([(antes, despues)])
+
+
+def aplicar_cambios(cambios):
+    """
+    Igual que `aplicar_cambio` para varios pares (antes, después) a la vez:
+    las diferencias se suman primero y cada fila de resumen se actualiza una vez.
+    """
+    anuales = defaultdict(lambda: defaultdict(int))
+    categorias = defaultdict(int)
+    for antes, despues in cambios:
+        if antes:
+            _acumular(anuales, categorias, antes, signo=-1)
+        if despues:
+            _acumular(anuales, categorias, despues)
+
+    for anio, metricas in sorted(anuales.items()):
+        deltas = {m: v for m, v in metricas.items() if v}
+        if not deltas:
+            continue
+        _asegurar_anio(anio)
+        ResumenAnual.objects.filter(anio=anio).update(
+            **{m: F(m) + v for m, v in deltas.items()}
+        )
+        historicos = {
+            historico: F(historico) + deltas[metrica]
+            for metrica, historico in HISTORICOS.items() if metrica in deltas
+        }
+        if historicos:
+            ResumenAnual.objects.filter(anio__gte=anio).update(**historicos)
+
+    for (anio, columna), delta in categorias.items():
+        if not delta:
+            continue
+        categoria, _ = ResumenAnualCategoria.objects.get_or_create(anio=anio, columna=columna)
+        ResumenAnualCategoria.objects.filter(pk=categoria.pk).update(total=F("total") + delta)
+
+
+@contextmanager
+def actualizar_resumenes(ingreso, nuevo=False):
+    """
+    Envuelve una modificación de `ingreso` (guardar o eliminar) y actualiza
+    los resúmenes con su efecto. Debe usarse dentro de `transaction.atomic()`.
+    Con `nuevo=True` el periodo no aportaba nada antes del cambio.
+    """
+    antes = None if nuevo else contribucion(ingreso)
+    yield
+    despues = contribucion(ingreso) if ingreso.pk is not None else None
+    aplicar_cambio(antes, despues)
+
+
+# --- RECONSTRUCCIÓN Y VERIFICACIÓN ---
+def reconstruir_resumenes():
+    """Borra y vuelve a generar los resúmenes a partir de IngresoMensual."""
+    anuales, categorias = calcular_resumenes(IngresoMensual.objects.all().iterator(chunk_size=2000))
+    with transaction.atomic():
+        ResumenAnual.objects.all().delete()
+        ResumenAnualCategoria.objects.all().delete()
+        ResumenAnual.objects.bulk_create(
+            [ResumenAnual(anio=anio, **metricas) for anio, metricas in anuales.items()]
+        )
+        ResumenAnualCategoria.objects.bulk_create(
+            [ResumenAnualCategoria(anio=anio, columna=columna, total=total)
+             for (anio, columna), total in categorias.items()]
+        )
+    return len(anuales), len(categorias)
+
+
+def diferencias_resumenes():
+    """Compara los resúmenes guardados contra IngresoMensual; devuelve una lista de discrepancias."""
+    anuales, categorias = calcular_resumenes(IngresoMensual.objects.all().iterator(chunk_size=2000))
+    errores = []
+
+    guardados = {r.anio: r for r in ResumenAnual.objects.all()}
+    for anio in sorted(set(anuales) | set(guardados)):
+        esperado = anuales.get(anio)
+        guardado = guardados.get(anio)
+        for campo in METRICAS_ANUALES + list(HISTORICOS.values()):
+            valor_esperado = esperado[campo] if esperado else 0
+            valor_guardado = getattr(guardado, campo) if guardado else 0
+            if valor_esperado != valor_guardado:
+                errores.append(f"{anio} {campo}: esperado {valor_esperado}, guardado {valor_guardado}")
+
+    guardadas = {
+        (c.anio, c.columna): c.total for c in ResumenAnualCategoria.objects.all()
+    }
+    for clave in sorted(set(categorias) | set(guardadas)):
+        valor_esperado = categorias.get(clave, 0)
+        valor_guardado = guardadas.get(clave, 0)
+        if valor_esperado != valor_guardado:
+            errores.append(f"{clave[0]} {clave[1]}: esperado {valor_esperado}, guardado {valor_guardado}")
+    return errores
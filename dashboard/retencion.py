@@ -0,0 +1,392 @@
+"""
+Retención de los logs de auditoría (SystemLog y MovimientoLog).
+
+Las filas con más de RETENCION["DIAS"] días salen de la base a archivos
+JSONL comprimidos con gzip, uno por modelo, mes y ejecución:
+
+    RETENCION["DIRECTORIO"]/2024-03/systemlog-20250401T020000.jsonl.gz
+
+Cada archivo se relee antes de borrar nada: su sha256 y su número de filas
+tienen que coincidir con lo escrito, y solo se borran los ids que contiene.
+Luego se anota en `manifiesto.jsonl` (archivo, sha256, filas y rango de
+fechas), que es lo que usa la búsqueda para saber qué archivos abrir.
+
+El borrado va en lotes de RETENCION["LOTE"] filas, cada uno en su propia
+transacción corta para no bloquear las escrituras del tablero, y después de
+cada lote se devuelven hasta RETENCION["PAGINAS_VACUUM"] páginas libres al
+sistema con `PRAGMA incremental_vacuum` (requiere auto_vacuum=INCREMENTAL,
+ver `activar_vacuum_incremental`).
+
+Los movimientos son la historia del tablero (dashboard/historico.py): solo
+se archivan los anteriores a la última instantánea previa al corte (si no
+hay ninguna, el histórico no usa los movimientos anteriores al corte), y las
+instantáneas más viejas que esa se borran, así la historia empieza en ella
+y las consultas "al día" anteriores dan SinHistoria en vez de un estado
+incompleto.
+"""
+import gzip
+import hashlib
+import heapq
+import io
+import json
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.utils import timezone
+from .models import Instantanea, MovimientoLog, SystemLog
+from .sqlite_produccion import transaccion_escritura
+from . import cache_tablero
+
+CONFIGURACION = {
+    "DIAS": 365,
+    "DIRECTORIO": Path(settings.BASE_DIR) / "archivo_logs",
+    "LOTE": 500,
+    "PAGINAS_VACUUM": 2000,
+}
+
+MODELOS = {
+    "systemlog": SystemLog,
+    "movimientolog": MovimientoLog,
+}
+
+MANIFIESTO = "manifiesto.jsonl"
+
+# Campos de texto donde busca `buscar` (los que existan en cada modelo)
+CAMPOS_TEXTO = ["accion", "detalle", "tipo", "periodo", "columna", "observaciones"]
+
+
+def configuracion():
+    return CONFIGURACION | getattr(settings, "RETENCION", {})
+
+
+class ArchivoCorrupto(Exception):
+    """El contenido de un archivo no coincide con su sha256 o con sus filas."""
+
+
+def directorio():
+    ruta = Path(configuracion()["DIRECTORIO"])
+    ruta.mkdir(parents=True, exist_ok=True)
+    return ruta
+
+
+def limite_caliente(dias=None):
+    """Fecha desde la que los logs siguen en la base."""
+    return timezone.now() - timedelta(days=configuracion()["DIAS"] if dias is None else dias)
+
+
+def _inicio_mes(momento):
+    local = timezone.localtime(momento)
+    return timezone.make_aware(datetime(local.year, local.month, 1))
+
+
+def _mes_siguiente(inicio):
+    return timezone.make_aware(datetime(inicio.year + inicio.month // 12, inicio.month % 12 + 1, 1))
+
+
+# --- MANIFIESTO ---
+def leer_manifiesto():
+    ruta = directorio() / MANIFIESTO
+    if not ruta.exists():
+        return []
+    with open(ruta, encoding="utf-8") as f:
+        return [json.loads(linea) for linea in f if linea.strip()]
+
+
+def _anotar(entrada):
+    with open(directorio() / MANIFIESTO, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entrada, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+# --- ESCRITURA Y VERIFICACIÓN ---
+def _sha256(ruta):
+    digest = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(bloque)
+    return digest.hexdigest()
+
+
+class _Codificador(DjangoJSONEncoder):
+    """Como DjangoJSONEncoder pero sin recortar las fechas a milisegundos."""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _filas(modelo, desde, hasta):
+    campos = [campo.attname for campo in modelo._meta.concrete_fields]
+    consulta = (
+        modelo.objects.filter(fecha__gte=desde, fecha__lt=hasta)
+        .order_by("fecha", "id")
+        .values(*campos, "usuario__username")
+    )
+    for fila in consulta.iterator(chunk_size=configuracion()["LOTE"]):
+        fila["usuario"] = fila.pop("usuario__username")
+        yield fila
+
+
+def _escribir(ruta, filas):
+    """Escribe las filas en JSONL comprimido; devuelve (número de filas, primera fecha, última fecha)."""
+    escritas, primera, ultima = 0, None, None
+    with open(ruta, "wb") as crudo:
+        with gzip.GzipFile(fileobj=crudo, mode="wb", mtime=0) as comprimido:
+            for fila in filas:
+                comprimido.write(json.dumps(fila, cls=_Codificador, ensure_ascii=False).encode() + b"\n")
+                primera = primera or fila["fecha"]
+                ultima = fila["fecha"]
+                escritas += 1
+        crudo.flush()
+        os.fsync(crudo.fileno())
+    return escritas, primera, ultima
+
+
+def verificar_archivo(ruta, sha256, filas):
+    """Relee el archivo; devuelve los ids que contiene o lanza ArchivoCorrupto."""
+    if _sha256(ruta) != sha256:
+        raise ArchivoCorrupto(f"{ruta}: el sha256 no coincide")
+    try:
+        with gzip.open(ruta, "rt", encoding="utf-8") as f:
+            ids = [json.loads(linea)["id"] for linea in f]
+    except (OSError, EOFError, ValueError, KeyError) as error:
+        raise ArchivoCorrupto(f"{ruta}: {error}")
+    if len(ids) != filas:
+        raise ArchivoCorrupto(f"{ruta}: tiene {len(ids)} filas, se esperaban {filas}")
+    return ids
+
+
+def verificar_todo():
+    """Verifica cada archivo del manifiesto; devuelve la lista de errores en texto."""
+    errores = []
+    for entrada in leer_manifiesto():
+        ruta = directorio() / entrada["archivo"]
+        if not ruta.exists():
+            errores.append(f"{ruta}: no existe")
+            continue
+        try:
+            verificar_archivo(ruta, entrada["sha256"], entrada["filas"])
+        except ArchivoCorrupto as error:
+            errores.append(str(error))
+    return errores
+
+
+# --- BORRADO Y VACUUM ---
+def _es_sqlite():
+    return connection.vendor == "sqlite"
+
+
+def modo_vacuum():
+    """"none", "full" o "incremental" (PRAGMA auto_vacuum); None si la base no es SQLite."""
+    if not _es_sqlite():
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA auto_vacuum")
+        return {0: "none", 1: "full", 2: "incremental"}[cursor.fetchone()[0]]
+
+
+def activar_vacuum_incremental():
+    """Pasa la base a auto_vacuum=INCREMENTAL. Hace un VACUUM completo: bloquea la base mientras dura."""
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        cursor.execute("VACUUM")
+
+
+def vacuum_incremental(paginas=None):
+    """Devuelve al sistema hasta `paginas` páginas libres; devuelve cuántas quedaban libres."""
+    if modo_vacuum() != "incremental":
+        return 0
+    paginas = configuracion()["PAGINAS_VACUUM"] if paginas is None else paginas
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA freelist_count")
+        libres = cursor.fetchone()[0]
+        # El PRAGMA libera una página por paso: hay que consumir todo el resultado
+        cursor.execute(f"PRAGMA incremental_vacuum({int(paginas)})")
+        cursor.fetchall()
+    return libres
+
+
+def borrar_en_lotes(modelo, ids, lote=None):
+    """Borra las filas por id en transacciones cortas, con vacuum incremental entre lotes."""
+    lote = lote or configuracion()["LOTE"]
+    tabla = connection.ops.quote_name(modelo._meta.db_table)
+    borradas = 0
+    for i in range(0, len(ids), lote):
+        parte = ids[i:i + lote]
+        # DELETE directo: queryset.delete() cargaría cada fila para mandar post_delete
+        with transaccion_escritura():
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {tabla} WHERE id IN ({', '.join(['%s'] * len(parte))})", parte)
+                borradas += cursor.rowcount
+        vacuum_incremental()
+    return borradas
+
+
+# --- ARCHIVO ---
+def corte_movimientos(corte):
+    """
+    Hasta dónde se pueden archivar movimientos sin romper el histórico: la
+    fecha de la última instantánea anterior al corte. Si no hay ninguna, los
+    movimientos anteriores al corte también lo son a la primera instantánea
+    y el histórico no los usa.
+    """
+    ultima = Instantanea.objects.filter(fecha__lte=corte).order_by("-fecha").values_list("fecha", flat=True).first()
+    return ultima or corte
+
+
+def archivar_modelo(nombre, corte, simular=False, informar=print):
+    """Archiva y borra las filas de MODELOS[nombre] anteriores a `corte`; devuelve las filas archivadas."""
+    modelo = MODELOS[nombre]
+    primera = modelo.objects.filter(fecha__lt=corte).order_by("fecha").values_list("fecha", flat=True).first()
+    if primera is None:
+        return 0
+
+    ejecucion = timezone.now().strftime("%Y%m%dT%H%M%S")
+    total = 0
+    inicio = _inicio_mes(primera)
+    while inicio < corte:
+        fin = min(_mes_siguiente(inicio), corte)
+        mes = f"{inicio:%Y-%m}"
+        if simular:
+            filas = modelo.objects.filter(fecha__gte=inicio, fecha__lt=fin).count()
+            if filas:
+                informar(f"{nombre} {mes}: {filas} filas (simulado)")
+            total += filas
+            inicio = _mes_siguiente(inicio)
+            continue
+
+        carpeta = directorio() / mes
+        carpeta.mkdir(exist_ok=True)
+        relativa = f"{mes}/{nombre}-{ejecucion}.jsonl.gz"
+        parcial = directorio() / (relativa + ".parcial")
+        filas, desde, hasta = _escribir(parcial, _filas(modelo, inicio, fin))
+        if not filas:
+            parcial.unlink()
+            inicio = _mes_siguiente(inicio)
+            continue
+
+        sha256 = _sha256(parcial)
+        ids = verificar_archivo(parcial, sha256, filas)
+        os.replace(parcial, directorio() / relativa)
+        _anotar({
+            "archivo": relativa,
+            "modelo": nombre,
+            "mes": mes,
+            "filas": filas,
+            "sha256": sha256,
+            "desde": desde.isoformat(),
+            "hasta": hasta.isoformat(),
+            "creado": timezone.now().isoformat(),
+        })
+        borradas = borrar_en_lotes(modelo, ids)
+        informar(f"{nombre} {mes}: {filas} filas archivadas en {relativa}, {borradas} borradas")
+        total += filas
+        inicio = _mes_siguiente(inicio)
+    return total
+
+
+def archivar(dias=None, simular=False, informar=print):
+    """Archiva SystemLog y MovimientoLog con más de `dias` días; devuelve {modelo: filas}."""
+    corte = limite_caliente(dias)
+    resultado = {"systemlog": archivar_modelo("systemlog", corte, simular, informar)}
+
+    corte_mov = corte_movimientos(corte)
+    if not simular:
+        # Primero las instantáneas: sin sus movimientos reconstruirían estados incompletos
+        viejas = Instantanea.objects.filter(fecha__lt=corte_mov)
+        borradas = viejas.count()
+        if borradas:
+            with transaccion_escritura():
+                viejas.delete()
+            informar(f"{borradas} instantáneas anteriores a {timezone.localtime(corte_mov):%Y-%m-%d %H:%M} borradas")
+    resultado["movimientolog"] = archivar_modelo("movimientolog", corte_mov, simular, informar)
+
+    if not simular and any(resultado.values()):
+        cache_tablero.invalidar()
+    return resultado
+
+
+# --- BÚSQUEDA ---
+class _LectorConHash(io.RawIOBase):
+    """Archivo de solo lectura que va calculando el sha256 de lo que se lee."""
+
+    def __init__(self, archivo):
+        self.archivo = archivo
+        self.digest = hashlib.sha256()
+
+    def readable(self):
+        return True
+
+    def readinto(self, destino):
+        datos = self.archivo.read(len(destino))
+        self.digest.update(datos)
+        destino[:len(datos)] = datos
+        return len(datos)
+
+
+def _coincide(fila, texto, usuario, tipo):
+    if usuario and usuario not in (fila.get("usuario") or "").lower():
+        return False
+    if tipo and fila.get("tipo", fila.get("accion")) != tipo:
+        return False
+    if texto:
+        return any(texto in str(fila.get(campo) or "").lower() for campo in CAMPOS_TEXTO)
+    return True
+
+
+def _leer(entrada, hasta):
+    """Filas de un archivo hasta `hasta`; si se lee completo comprueba su sha256."""
+    try:
+        with open(directorio() / entrada["archivo"], "rb") as crudo:
+            lector = _LectorConHash(crudo)
+            with gzip.open(io.BufferedReader(lector), "rt", encoding="utf-8") as f:
+                for linea in f:
+                    fila = json.loads(linea)
+                    fila["fecha"] = datetime.fromisoformat(fila["fecha"])
+                    if hasta is not None and fila["fecha"] > hasta:
+                        return
+                    fila["modelo"] = entrada["modelo"]
+                    yield fila
+    except (OSError, EOFError, ValueError, KeyError) as error:
+        raise ArchivoCorrupto(f"{entrada['archivo']}: {error}")
+    if lector.digest.hexdigest() != entrada["sha256"]:
+        raise ArchivoCorrupto(f"{entrada['archivo']}: el sha256 no coincide")
+
+
+def buscar(desde=None, hasta=None, texto="", usuario="", tipo="", limite=200):
+    """
+    Recorre los archivos cuyo rango se cruza con [desde, hasta] y produce las
+    filas que contienen `texto`, cuyo usuario contiene `usuario` y cuyo tipo
+    (o acción, en SystemLog) es `tipo`: dicts con "modelo" y "fecha" como
+    datetime, en orden cronológico y hasta `limite`.
+    """
+    texto, usuario = texto.lower(), usuario.lower()
+    meses = defaultdict(list)
+    for entrada in leer_manifiesto():
+        if (desde is None or datetime.fromisoformat(entrada["hasta"]) >= desde) and (
+            hasta is None or datetime.fromisoformat(entrada["desde"]) <= hasta
+        ):
+            meses[entrada["mes"]].append(entrada)
+
+    encontradas = 0
+    vistas = set()  # un corte interrumpido entre archivar y borrar puede duplicar filas
+    for mes in sorted(meses):
+        # Dentro del mes se intercalan los archivos de ambos modelos (y de varias ejecuciones)
+        filas = heapq.merge(*[_leer(e, hasta) for e in meses[mes]], key=lambda fila: fila["fecha"])
+        for fila in filas:
+            clave = (fila["modelo"], fila["id"])
+            if (desde is not None and fila["fecha"] < desde) or clave in vistas:
+                continue
+            if not _coincide(fila, texto, usuario, tipo):
+                continue
+            vistas.add(clave)
+            yield fila
+            encontradas += 1
+            if encontradas >= limite:
+                return
@@ -0,0 +1,151 @@
+"""
+Reversión en lote de movimientos desde el historial.
+
+Revertir uno por uno (un POST por movimiento, cada uno con su UPDATE, sus
+resúmenes y su log) no escala para deshacer una importación de miles de
+filas. Aquí los movimientos se eligen por rango de fechas, usuario y/o
+periodo y se revierten juntos en una transacción:
+
+- los montos de los "añadir" se suman por (periodo, columna) en un solo
+  GROUP BY, y cada celda afectada recibe el neto con un único bulk_update
+  (con los derivados recalculados una vez por fila);
+- como en la reversión individual, ninguna columna queda por debajo de 0
+  (el límite se aplica al neto de la celda, no a cada movimiento);
+- se registra un MovimientoLog "revertir" por celda (el histórico se
+  reconstruye con sus valores), todos los movimientos elegidos se marcan
+  como eliminados con un UPDATE y queda un solo SystemLog de resumen.
+
+Los movimientos que no son "añadir" solo se quitan del historial, igual que
+con el botón Eliminar.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.db.models import Q, Sum
+from django.utils import timezone
+from .auditoria import registrar as registrar_auditoria
+from .models import CAMPOS_DERIVADOS, MESES, IngresoMensual, MovimientoLog, SystemLog, fecha_de_periodo
+from .movimientos import COLUMNAS_MOVIMIENTO
+from .resumenes import aplicar_cambios, contribucion
+from .historico import programar_instantanea
+from .sqlite_produccion import transaccion_escritura
+from . import cache_tablero
+
+
+def _mismo_periodo(periodo):
+    """
+    Q de los movimientos de `periodo` con cualquier grafía: el log guarda el
+    periodo como se escribió ("Oct-25", "oct-25"), y en español ("Ene-25").
+    """
+    fecha = fecha_de_periodo(periodo)
+    if fecha is None:
+        return Q(periodo__iexact=periodo.strip())
+    condicion = Q()
+    for mes, numero in MESES.items():
+        if numero == fecha.month:
+            condicion |= Q(periodo__iexact=f"{mes}-{fecha:%y}")
+    return condicion
+
+
+def seleccionar(desde=None, hasta=None, usuario=None, periodo=None):
+    """Movimientos vigentes (no eliminados) que cumplen los filtros indicados."""
+    movimientos = MovimientoLog.objects.filter(eliminado__isnull=True)
+    if desde:
+        movimientos = movimientos.filter(fecha__gte=desde)
+    if hasta:
+        movimientos = movimientos.filter(fecha__lte=hasta)
+    if usuario:
+        movimientos = movimientos.filter(usuario__username=usuario)
+    if periodo:
+        movimientos = movimientos.filter(_mismo_periodo(periodo))
+    return movimientos
+
+
+def describir_filtros(desde=None, hasta=None, usuario=None, periodo=None):
+    partes = []
+    if desde:
+        partes.append(f"desde {timezone.localtime(desde):%Y-%m-%d}")
+    if hasta:
+        partes.append(f"hasta {timezone.localtime(hasta):%Y-%m-%d}")
+    if usuario:
+        partes.append(f"usuario {usuario}")
+    if periodo:
+        partes.append(f"periodo {periodo}")
+    return ", ".join(partes)
+
+
+def revertir_movimientos(desde=None, hasta=None, usuario=None, periodo=None, ejecuta=None):
+    """
+    Revierte los movimientos que cumplen los filtros (al menos uno es
+    obligatorio). Devuelve un dict con movimientos, celdas y periodos
+    afectados. Lanza ValidationError si no hay filtros o nada que revertir.
+    """
+    if not any((desde, hasta, usuario, periodo)):
+        raise ValidationError("Indica al menos un filtro (fechas, usuario o periodo) para revertir en lote.")
+    filtros = describir_filtros(desde, hasta, usuario, periodo)
+
+    # BEGIN IMMEDIATE: nadie agrega movimientos entre la selección y el UPDATE que los marca
+    with transaccion_escritura():
+        movimientos = seleccionar(desde, hasta, usuario, periodo)
+        cantidad = movimientos.count()
+        if not cantidad:
+            raise ValidationError(f"No hay movimientos que revertir ({filtros}).")
+
+        deltas = defaultdict(dict)
+        for fila in (
+            movimientos.filter(tipo="añadir", columna__in=COLUMNAS_MOVIMIENTO)
+            .exclude(monto__isnull=True)
+            .order_by().values("periodo", "columna").annotate(total=Sum("monto"))
+        ):
+            fecha = fecha_de_periodo(fila["periodo"])
+            if fecha is not None and fila["total"]:
+                # Varias grafías del mismo periodo son grupos distintos: se acumulan
+                deltas[fecha][fila["columna"]] = deltas[fecha].get(fila["columna"], 0) - fila["total"]
+
+        # Los periodos que ya no existen se omiten, como en la reversión individual
+        ingresos = IngresoMensual.objects.select_for_update().in_bulk(list(deltas), field_name="fecha_periodo")
+        antes = {fecha: contribucion(ingreso) for fecha, ingreso in ingresos.items()}
+        logs, columnas, modificados = [], set(), {}
+        for fecha, ingreso in ingresos.items():
+            for columna, delta in deltas[fecha].items():
+                anterior = getattr(ingreso, columna) or Decimal(0)
+                nuevo = max(anterior + delta, Decimal(0))
+                if nuevo == anterior:
+                    continue
+                setattr(ingreso, columna, nuevo)
+                columnas.add(columna)
+                modificados[fecha] = ingreso
+                logs.append(MovimientoLog(
+                    usuario=ejecuta,
+                    tipo="revertir",
+                    periodo=ingreso.periodo,
+                    columna=columna,
+                    monto=nuevo - anterior,
+                    valor_anterior=anterior,
+                    valor_nuevo=nuevo,
+                    observaciones=f"Reversión en lote de '{columna}' en {ingreso.periodo} ({filtros})",
+                ))
+        for ingreso in modificados.values():
+            ingreso.calcular_derivados()
+        if modificados:
+            IngresoMensual.objects.bulk_update(
+                list(modificados.values()), sorted(columnas) + CAMPOS_DERIVADOS, batch_size=500
+            )
+            aplicar_cambios((antes[fecha], contribucion(ingreso)) for fecha, ingreso in modificados.items())
+
+        # Se marcan antes de crear los "revertir", que no forman parte de la selección
+        movimientos.update(eliminado=timezone.now())
+        MovimientoLog.objects.bulk_create(logs, batch_size=1000)
+        registrar_auditoria(SystemLog(
+            usuario=ejecuta,
+            accion="revertir_movimientos",
+            detalle=(
+                f"El usuario {ejecuta.username if ejecuta else 'Sistema'} revirtió {cantidad} movimientos "
+                f"({filtros}): {len(logs)} celdas en {len(modificados)} periodos."
+            ),
+        ))
+        # bulk_create/bulk_update/update() no disparan señales
+        cache_tablero.invalidar()
+        programar_instantanea()
+
+    return {"movimientos": cantidad, "celdas": len(logs), "periodos": len(modificados)}
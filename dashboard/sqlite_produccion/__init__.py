@@ -0,0 +1,33 @@
+"""
+Backend SQLite para producción (ENGINE "dashboard.sqlite_produccion").
+
+Igual que django.db.backends.sqlite3, más:
+- OPTIONS["pragmas"]: PRAGMAs que se ejecutan en cada conexión nueva
+  (busy_timeout, synchronous, mmap_size, cache_size...). Los que se guardan
+  en el archivo (journal_mode, auto_vacuum, page_size) no se aceptan aquí:
+  abrir una conexión, incluso para `manage.py check`, no debe modificar la
+  base. WAL se activa una vez con `configurar_sqlite`.
+- `transaccion_escritura()`: transacción que empieza con BEGIN IMMEDIATE, así
+  el bloqueo de escritura se toma al inicio (esperando busy_timeout si está
+  ocupado) en lugar de fallar con "database is locked" al pasar de lectura a
+  escritura a mitad de la transacción.
+"""
+from contextlib import contextmanager
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+@contextmanager
+def transaccion_escritura(using=DEFAULT_DB_ALIAS):
+    """transaction.atomic() que en este backend abre la transacción con BEGIN IMMEDIATE."""
+    conexion = connections[using]
+    exterior = not conexion.in_atomic_block and hasattr(conexion, "inicio_inmediato")
+    if exterior:
+        conexion.inicio_inmediato = True
+    try:
+        with transaction.atomic(using=using):
+            if exterior:
+                conexion.inicio_inmediato = False
+            yield
+    finally:
+        if exterior:
+            conexion.inicio_inmediato = False
@@ -0,0 +1,32 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+# Se guardan en el archivo: se configuran una vez (configurar_sqlite, archivar_logs --activar-vacuum)
+PRAGMAS_PERSISTENTES = {"journal_mode", "auto_vacuum", "page_size"}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        persistentes = PRAGMAS_PERSISTENTES & set(self.settings_dict["OPTIONS"].get("pragmas", {}))
+        if persistentes:
+            raise ImproperlyConfigured(
+                f"OPTIONS['pragmas'] solo admite PRAGMAs por conexión; {', '.join(sorted(persistentes))} "
+                "se guarda en el archivo y se configura una vez (ver configurar_sqlite)."
+            )
+        # Lo activa transaccion_escritura() solo para el BEGIN de su transacción
+        self.inicio_inmediato = False
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop("pragmas", None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for nombre, valor in self.settings_dict["OPTIONS"].get("pragmas", {}).items():
+            conn.execute(f"PRAGMA {nombre} = {valor}")
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute("BEGIN IMMEDIATE" if self.inicio_inmediato else "BEGIN")
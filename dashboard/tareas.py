@@ -0,0 +1,11 @@
+"""
+Tareas de Celery. Solo se importa con REPORTES["BACKEND"] = "celery"
+(ver dashboard/trabajos.py), así que celery no es necesario en otro caso.
+"""
+from celery import shared_task
+from .trabajos import ejecutar_trabajo
+
+
+@shared_task(ignore_result=True)
+def generar_reporte(trabajo_id):
+    ejecutar_trabajo(trabajo_id)
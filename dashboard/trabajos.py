@@ -0,0 +1,233 @@
+"""
+Generación del reporte Excel en segundo plano.
+
+La vista solo crea un TrabajoReporte y lo encola; un backend lo ejecuta
+fuera de la petición, va guardando el progreso y deja el archivo en
+REPORTES["DIRECTORIO"]. El navegador consulta el estado por JSON y descarga
+el archivo al terminar. Los archivos vencen a las REPORTES["CADUCIDAD_HORAS"];
+los trabajos con error también, y los que siguen pendientes o "en proceso"
+sin avanzar durante REPORTES["ABANDONO_MINUTOS"] pasan a error: el worker
+se cayó, o con el backend "hilos" el servidor se reinició y la cola en
+memoria se perdió.
+
+Backends (REPORTES["BACKEND"]):
+- "hilos": ThreadPoolExecutor dentro del mismo proceso (un solo servidor, pruebas).
+- "base_datos": el trabajo queda pendiente en la tabla y lo toma
+  `python manage.py procesar_reportes`.
+- "celery": se envía la tarea `dashboard.tareas.generar_reporte`; requiere
+  celery instalado y una app configurada con un broker (ej. redis).
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .historico import estado_en
+from .models import IngresoMensual, TrabajoReporte
+
+logger = logging.getLogger(__name__)
+
+CONFIGURACION = {
+    "BACKEND": "hilos",
+    "HILOS": 2,
+    "DIRECTORIO": Path(settings.BASE_DIR) / "reportes_generados",
+    "CADUCIDAD_HORAS": 24,
+    "ABANDONO_MINUTOS": 30,
+}
+
+
+def configuracion():
+    return CONFIGURACION | getattr(settings, "REPORTES", {})
+
+
+def directorio():
+    ruta = Path(configuracion()["DIRECTORIO"])
+    ruta.mkdir(parents=True, exist_ok=True)
+    return ruta
+
+
+def ruta_archivo(trabajo):
+    return directorio() / trabajo.archivo
+
+
+def nombre_archivo(trabajo):
+    sufijo = f"_al_{trabajo.al:%Y%m%d%H%M}" if trabajo.al else ""
+    return f"reporte_{trabajo.id}_{trabajo.inicio}_{trabajo.fin}{sufijo}.xlsx"
+
+
+def _expira(desde):
+    return desde + timedelta(hours=configuracion()["CADUCIDAD_HORAS"])
+
+
+# --- EJECUCIÓN ---
+def _tomar(trabajo_id):
+    """Marca el trabajo como en proceso si sigue pendiente; evita que dos workers lo ejecuten."""
+    return TrabajoReporte.objects.filter(
+        id=trabajo_id, estado=TrabajoReporte.PENDIENTE
+    ).update(estado=TrabajoReporte.EN_PROCESO, progreso=0, actualizado=timezone.now())
+
+
+def ejecutar_trabajo(trabajo_id):
+    """Genera el archivo de un trabajo pendiente. La usan todos los backends."""
+    from .reportes import escribir_reporte
+
+    if not _tomar(trabajo_id):
+        return
+    trabajo = TrabajoReporte.objects.get(id=trabajo_id)
+    pendientes = TrabajoReporte.objects.filter(id=trabajo_id)
+    nombre = nombre_archivo(trabajo)
+    destino = directorio() / nombre
+    temporal = destino.with_suffix(".tmp")
+    try:
+        if trabajo.al:
+            data = estado_en(trabajo.al, trabajo.inicio, trabajo.fin)
+            total = len(data)
+        else:
+            data = IngresoMensual.objects.entre_periodos(trabajo.inicio, trabajo.fin)
+            total = data.count()
+        pendientes.update(total_registros=total)
+
+        def al_avanzar(escritos):
+            pendientes.update(progreso=min(99, escritos * 100 // max(total, 1)), actualizado=timezone.now())
+
+        with open(temporal, "wb") as archivo:
+            escribir_reporte(data, archivo, al_avanzar=al_avanzar)
+        os.replace(temporal, destino)
+    except Exception as e:
+        logger.exception("Falló el reporte %s", trabajo_id)
+        temporal.unlink(missing_ok=True)
+        ahora = timezone.now()
+        pendientes.update(estado=TrabajoReporte.ERROR, error=str(e), terminado=ahora, expira=_expira(ahora))
+        return
+
+    ahora = timezone.now()
+    pendientes.update(
+        estado=TrabajoReporte.TERMINADO,
+        progreso=100,
+        archivo=nombre,
+        terminado=ahora,
+        expira=_expira(ahora),
+    )
+
+
+def _limite_abandono(ahora):
+    return ahora - timedelta(minutes=configuracion()["ABANDONO_MINUTOS"])
+
+
+def _marcar_abandonados(trabajos, ahora):
+    """Pasa a error los trabajos pendientes o en proceso que no avanzan desde antes del límite."""
+    limite = _limite_abandono(ahora)
+    return trabajos.filter(estado__in=[TrabajoReporte.PENDIENTE, TrabajoReporte.EN_PROCESO]).filter(
+        Q(actualizado__lt=limite) | Q(actualizado__isnull=True, creado__lt=limite)
+    ).update(
+        estado=TrabajoReporte.ERROR,
+        error="El reporte dejó de avanzar: el proceso que lo generaba se detuvo o se reinició.",
+        terminado=ahora,
+        expira=_expira(ahora),
+    )
+
+
+def revisar_abandono(trabajo):
+    """
+    Para la página que consulta el progreso: si `trabajo` no avanza desde
+    hace ABANDONO_MINUTOS lo marca como error. Solo escribe en ese caso.
+    """
+    ahora = timezone.now()
+    if trabajo.estado in (TrabajoReporte.PENDIENTE, TrabajoReporte.EN_PROCESO) \
+            and (trabajo.actualizado or trabajo.creado) < _limite_abandono(ahora):
+        _marcar_abandonados(TrabajoReporte.objects.filter(id=trabajo.id), ahora)
+        trabajo.refresh_from_db()
+    return trabajo
+
+
+def limpiar_expirados():
+    """
+    Borra los trabajos vencidos (terminados o con error) con sus archivos,
+    marca como error los que quedaron pendientes o "en proceso" sin avanzar
+    y borra los .tmp que ya no pertenecen a ningún trabajo en proceso.
+    Devuelve cuántos trabajos se eliminaron.
+    """
+    ahora = timezone.now()
+    limite = _limite_abandono(ahora)
+    _marcar_abandonados(TrabajoReporte.objects.all(), ahora)
+    # Con error y sin vencimiento: trabajos anteriores a que los errores vencieran
+    TrabajoReporte.objects.filter(estado=TrabajoReporte.ERROR, expira__isnull=True).update(expira=_expira(ahora))
+
+    vencidos = list(TrabajoReporte.objects.filter(expira__lt=ahora))
+    for trabajo in vencidos:
+        if trabajo.archivo:
+            ruta_archivo(trabajo).unlink(missing_ok=True)
+    TrabajoReporte.objects.filter(id__in=[t.id for t in vencidos]).delete()
+
+    en_proceso = {
+        Path(nombre_archivo(trabajo)).with_suffix(".tmp").name
+        for trabajo in TrabajoReporte.objects.filter(estado=TrabajoReporte.EN_PROCESO)
+    }
+    for temporal in directorio().glob("*.tmp"):
+        # Por antigüedad también: un trabajo que empieza ahora puede no estar en `en_proceso`
+        if temporal.name not in en_proceso and temporal.stat().st_mtime < limite.timestamp():
+            temporal.unlink(missing_ok=True)
+    return len(vencidos)
+
+
+# --- BACKENDS ---
+class BackendHilos:
+    def __init__(self, hilos):
+        self._executor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="reportes")
+
+    def encolar(self, trabajo_id):
+        self._executor.submit(self._ejecutar, trabajo_id)
+
+    @staticmethod
+    def _ejecutar(trabajo_id):
+        try:
+            ejecutar_trabajo(trabajo_id)
+        finally:
+            close_old_connections()
+
+
+class BackendBaseDatos:
+    """El trabajo ya está guardado como pendiente; `procesar_reportes` lo ejecuta."""
+
+    def encolar(self, trabajo_id):
+        pass
+
+
+class BackendCelery:
+    def encolar(self, trabajo_id):
+        from .tareas import generar_reporte
+
+        generar_reporte.delay(trabajo_id)
+
+
+_backend = None
+
+
+def obtener_backend():
+    global _backend
+    if _backend is None:
+        conf = configuracion()
+        if conf["BACKEND"] == "hilos":
+            _backend = BackendHilos(conf["HILOS"])
+        elif conf["BACKEND"] == "base_datos":
+            _backend = BackendBaseDatos()
+        elif conf["BACKEND"] == "celery":
+            _backend = BackendCelery()
+        else:
+            raise ValueError(f"Backend de reportes desconocido: {conf['BACKEND']!r}")
+    return _backend
+
+
+def encolar_reporte(usuario, inicio, fin, al=None):
+    """
+    Crea el trabajo y lo envía al backend cuando la transacción se confirma.
+    Con `al` el reporte sale con los valores de ese momento (ver dashboard/historico.py).
+    """
+    limpiar_expirados()
+    trabajo = TrabajoReporte.objects.create(usuario=usuario, inicio=inicio, fin=fin, al=al)
+    transaction.on_commit(lambda: obtener_backend().encolar(trabajo.id))
+    return trabajo
@@ -5,10 +5,20 @@ urlpatterns = [
     path("", views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
     path("index", views.index, name="index"),
+    path("index/datos", views.datos_graficas, name="datos_graficas"),
+    path("index/analitica", views.datos_analitica, name="datos_analitica"),
+    path("index/editar", views.editar_celdas, name="editar_celdas"),
+    path("index/ranking", views.ranking_totales, name="ranking_totales"),
     path("historial/", views.historial_movimientos, name="historial_movimientos"),
+    path("api/cambios", views.feed_cambios, name="feed_cambios"),
+    path("reportes/<int:trabajo_id>/", views.reporte_trabajo, name="reporte_trabajo"),
+    path("reportes/<int:trabajo_id>/estado", views.estado_reporte, name="estado_reporte"),
+    path("reportes/<int:trabajo_id>/descargar", views.descargar_reporte, name="descargar_reporte"),
+    path("importar/", views.importar_movimientos, name="importar_movimientos"),
     path('profile/', views.profile, name='profile'),
     # ---- Solo para staff ----
     path("usuarios/", views.admin_users, name="admin_users"),
     path("configuracion/", views.admin_config, name="admin_config"),
     path("logs/", views.admin_logs, name="admin_logs"),
+    path("rendimiento/", views.admin_rendimiento, name="admin_rendimiento"),
 ]
@@ -1,28 +1,49 @@
+import hashlib
 import json
-import pandas as pd
-from io import BytesIO
+from urllib.parse import urlencode
 from decimal import Decimal
-from openpyxl import Workbook
 from datetime import datetime
 from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.core.exceptions import ValidationError
 from .forms import MovimientoForm
 from django.contrib import messages
-from django.http import HttpResponse
-from django.core.mail import send_mail
+from django.db.models import Q
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib.auth.models import User
-from django.forms.models import model_to_dict
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib.auth import update_session_auth_hash
 from django.contrib.auth import authenticate, login, logout
-from .models import IngresoMensual, MovimientoLog, SystemLog
+from .models import (
+    CAMPOS_GRAFICA, CAMPOS_RESUMEN, IngresoMensual, MovimientoLog, SystemLog, TrabajoReporte, fecha_de_periodo,
+)
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST
+from .paginacion import TAMANO_MAXIMO, paginar_por_cursor, tamano_pagina
+from .resumenes import actualizar_resumenes
+from .movimientos import aplicar_movimiento, fijar_valor
+from .auditoria import registrar as registrar_auditoria, vaciar_antes
+from .importacion import importar_movimientos as importar_archivo
+from .edicion import aplicar_ediciones, validar_cambios
+from .cambios import interpretar_parametros as interpretar_cambios, lineas as lineas_cambios
+from .reversion import revertir_movimientos, seleccionar as seleccionar_movimientos
+from .correos import encolar_correo
+from .sqlite_produccion import transaccion_escritura
+from .instrumentacion import LIMITES_HISTOGRAMA, configuracion as configuracion_instrumentacion, obtener_estadisticas
+from .analitica import analizar, cargar as cargar_frame
+from .cache_tablero import contexto_index, estado_datos, estadisticas as estadisticas_cache
+from .historico import (
+    contexto_en as contexto_historico, estado_en, interpretar_momento, kpis as kpis_historicos, programar_instantanea,
+)
+from .busqueda import buscar as buscar_texto, disponible as busqueda_disponible
+from .retencion import ArchivoCorrupto, buscar as buscar_en_archivo, limite_caliente
+from .trabajos import encolar_reporte, limpiar_expirados, revisar_abandono, ruta_archivo
 from django.shortcuts import render, redirect, get_object_or_404
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required, user_passes_test
-from .forms import CustomUserCreationForm, CustomLoginForm, ProfileUpdateForm
-
-# --- CONSULTAR REGISTROS Y ORDENAR CORRECTAMENTE ---
-registros = list(IngresoMensual.objects.all().values())
+from .forms import CustomUserCreationForm, CustomLoginForm, ImportarMovimientosForm, ProfileUpdateForm
 
 # --- LOGIN ---
 def login_view(request):
@@ -44,7 +65,8 @@ def logout_view(request):
     return redirect('login')
 
 def index(request):
-    form = MovimientoForm(request.POST or None)
+    # Solo se valida el formulario en el POST de "añadir"; editar/eliminar/reporte no lo usan
+    form = MovimientoForm(request.POST if "añadir" in request.POST else None)
     mensaje = ""
 
     # --- AÑADIR MOVIMIENTO ---
@@ -55,56 +77,70 @@ def index(request):
         monto = Decimal(form.cleaned_data["monto"])
 
         periodo_final = nuevo_periodo.strip() if nuevo_periodo else periodo_existente
-        ingreso, _ = IngresoMensual.objects.get_or_create(periodo=periodo_final)
-        valor_actual = getattr(ingreso, columna, 0) or 0
-        setattr(ingreso, columna, valor_actual + monto)
-        ingreso.save()
-
-        # --- Registrar log ---
-        MovimientoLog.objects.create(
-            usuario=request.user,
-            tipo="añadir",
-            periodo=periodo_final,
-            columna=columna,
-            monto=monto,
-            observaciones=f"Añadido {monto} a '{columna}' en {periodo_final}"
-        )
+        with transaccion_escritura():
+            # UPDATE atómico con F(): no se pierden sumas concurrentes
+            ingreso, aplicado = aplicar_movimiento(periodo_final, columna, monto)
+
+            # --- Registrar log ---
+            registrar_auditoria(MovimientoLog(
+                usuario=request.user,
+                tipo="añadir",
+                periodo=periodo_final,
+                columna=columna,
+                monto=monto,
+                valor_anterior=getattr(ingreso, columna) - aplicado,
+                valor_nuevo=getattr(ingreso, columna),
+                observaciones=f"Añadido {monto} a '{columna}' en {periodo_final}"
+            ))
 
         mensaje = f"✅ Se añadió {monto:,.2f} a '{columna}' en {periodo_final}"
 
     # --- ELIMINAR REGISTRO ---
     if request.method == "POST" and "eliminar" in request.POST:
         id_registro = request.POST.get("id_registro")
-        ingreso = get_object_or_404(IngresoMensual, id=id_registro)
-        MovimientoLog.objects.create(
-            usuario=request.user,
-            tipo="eliminar",
-            periodo=ingreso.periodo,
-            columna="N/A",
-            monto=0,
-            observaciones=f"Eliminado registro ID {id_registro} ({ingreso.periodo})"
-        )
-        ingreso.delete()
+        with transaccion_escritura():
+            # Leída bajo el bloqueo de escritura: los resúmenes restan su valor vigente
+            ingreso = get_object_or_404(IngresoMensual, id=id_registro)
+            registrar_auditoria(MovimientoLog(
+                usuario=request.user,
+                tipo="eliminar",
+                periodo=ingreso.periodo,
+                columna="N/A",
+                monto=0,
+                observaciones=f"Eliminado registro ID {id_registro} ({ingreso.periodo})"
+            ))
+            with actualizar_resumenes(ingreso):
+                ingreso.delete()
+            programar_instantanea()
         mensaje = f"Registro {id_registro} eliminado correctamente."
 
     # --- EDITAR REGISTRO ---
-    if request.method == "POST" and "editar" in request.POST:
+    if request.method == "POST" and "editar" in request.POST and request.POST.get("columna") not in CAMPOS_RESUMEN:
+        mensaje = "Columna no válida."
+    elif request.method == "POST" and "editar" in request.POST:
         id_registro = request.POST.get("id_registro")
         columna = request.POST.get("columna")
         nuevo_valor = Decimal(request.POST.get("nuevo_valor", 0))
-        ingreso = get_object_or_404(IngresoMensual, id=id_registro)
-        setattr(ingreso, columna, nuevo_valor)
-        ingreso.save()
-
-        # --- Registrar log ---
-        MovimientoLog.objects.create(
-            usuario=request.user,
-            tipo="editar",
-            periodo=ingreso.periodo,
-            columna=columna,
-            monto=nuevo_valor,
-            observaciones=f"Editado '{columna}' en {ingreso.periodo}"
-        )
+        with transaccion_escritura():
+            # Lectura y UPDATE de la columna bajo el bloqueo de escritura (ver movimientos.fijar_valor)
+            try:
+                ingreso, anterior = fijar_valor(id_registro, columna, nuevo_valor)
+            except IngresoMensual.DoesNotExist:
+                raise Http404("No existe el registro.")
+            # Las columnas derivadas quedan recalculadas
+            nuevo_valor = getattr(ingreso, columna)
+
+            # --- Registrar log (monto = diferencia, como en "añadir") ---
+            registrar_auditoria(MovimientoLog(
+                usuario=request.user,
+                tipo="editar",
+                periodo=ingreso.periodo,
+                columna=columna,
+                monto=nuevo_valor - anterior,
+                valor_anterior=anterior,
+                valor_nuevo=nuevo_valor,
+                observaciones=f"Editado '{columna}' en {ingreso.periodo}: {anterior} → {nuevo_valor}"
+            ))
 
         mensaje = f"Registro {id_registro} actualizado correctamente."
 
@@ -112,186 +148,338 @@ def index(request):
     if request.method == "POST" and "generar_reporte" in request.POST:
         inicio = request.POST.get("inicio")
         fin = request.POST.get("fin")
-        try:
-            inicio_obj = IngresoMensual.objects.get(periodo=inicio)
-            fin_obj = IngresoMensual.objects.get(periodo=fin)
-        except IngresoMensual.DoesNotExist:
+        if fecha_de_periodo(inicio) is None or fecha_de_periodo(fin) is None:
             return HttpResponse("Alguno de los periodos no existe.")
 
-        data = IngresoMensual.objects.filter(
-            id__gte=inicio_obj.id,
-            id__lte=fin_obj.id
-        ).order_by("id")
-        if not data.exists():
+        try:
+            al = interpretar_momento(request.POST.get("al"))
+            hay_datos = (
+                bool(estado_en(al, inicio, fin)) if al
+                else IngresoMensual.objects.entre_periodos(inicio, fin).exists()
+            )
+        except ValueError as e:
+            return HttpResponse(str(e))
+        if not hay_datos:
             return HttpResponse("No hay datos para ese rango.")
 
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Reporte Financiero"
-        headers = [
-            "Periodo", "Ingresos x  Mantenimiento", "DPPP", "Ingresos Netos por Mantenimiento", "Ingreso x Cuota Extraordinaria",
-            "Cuota ordinaria retroactiva", "Revision CSAU", "Depósitos en garantia de obra", "Ingresos x Intereses de Cuotas",
-            "Ingresos por Rendimiento de Inversiones", "Sanciones", "Recuperación de Seguro/daños", "Recuperación de gastos por Cobranza via legal", "Depositos no identificados",
-            "Total", "Ingresos reales vs fact", "Diferencia de ingresos fac vs cobrados", "Observaciones"
-        ]
-        ws.append(headers)
-        header_fill = PatternFill("solid", fgColor="1e3a8a")
-        header_font = Font(color="FFFFFF", bold=True)
-        for col in range(1, len(headers) + 1):
-            cell = ws.cell(row=1, column=col)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-
-        for r in data:
-            ws.append([
-                r.periodo, r.ingresos_mantenimiento, r.dppp, r.ingresos_netos_mantenimiento,
-                r.ingresos_cuota_extraordinaria, r.cuota_ordinaria_retroactiva,
-                r.revision_csau, r.depositos_garantia_obra,
-                r.ingresos_intereses_cuotas, r.ingresos_rendimiento_inversiones,
-                r.sanciones, r.recuperacion_seguro_danios,
-                r.recuperacion_gastos_cobranza, r.depositos_no_identificados,
-                r.total, r.ingresos_reales_vs_fact, r.diferencia_ingresos_fac_vs_cobrados
-            ])
-
-        # Fila de totales
-        total_row = ["TOTAL"]
-        for col in range(2, len(headers) + 1):
-            col_letter = ws.cell(row=1, column=col).column_letter
-            total_row.append(f"=SUM({col_letter}2:{col_letter}{len(data) + 1})")
-        ws.append(total_row)
-        for cell in ws[ws.max_row]:
-            cell.font = Font(bold=True)
-            cell.fill = PatternFill("solid", fgColor="eab308")
-
-        border = Border(
-            left=Side(style="thin", color="CCCCCC"),
-            right=Side(style="thin", color="CCCCCC"),
-            top=Side(style="thin", color="CCCCCC"),
-            bottom=Side(style="thin", color="CCCCCC")
-        )
-        for row in ws.iter_rows():
-            for cell in row:
-                cell.border = border
-
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
-        response = HttpResponse(
-            output,
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
-        response["Content-Disposition"] = 'attachment; filename=\"reporte_finanzas.xlsx\"'
-        return response
-
-    # --- CONSULTA FINAL ---
-    registros = IngresoMensual.objects.all().order_by("id")
-    periodos = IngresoMensual.objects.values_list("periodo", flat=True).distinct().order_by("id")
+        # El archivo se genera en segundo plano (ver dashboard/trabajos.py)
+        trabajo = encolar_reporte(request.user, inicio, fin, al=al)
+        return redirect("reporte_trabajo", trabajo_id=trabajo.id)
+
+    # --- CONSULTA FINAL (registros, periodos y KPIs desde la caché por versión de datos) ---
+    inicio, fin = request.GET.get("inicio"), request.GET.get("fin")
+    try:
+        # Con ?al=fecha y hora se reconstruye el estado en ese momento; no se cachea
+        # porque los logs en lote pueden llegar después (ver dashboard/historico.py)
+        al = interpretar_momento(request.GET.get("al"))
+        context = contexto_historico(al, inicio, fin) if al else contexto_index(inicio, fin)
+    except ValueError as e:  # fecha mal escrita o anterior al histórico
+        mensaje = mensaje or str(e)
+        al = None
+        context = contexto_index(inicio, fin)
+    if not form.is_bound:
+        # Las opciones del select salen de la caché en vez de consultar el queryset del campo
+        campo = form.fields["periodo"]
+        campo.choices = [("", campo.empty_label)] + [(p, p) for p in context["periodos"]]
+
+    # Las gráficas se cargan aparte desde datos_graficas (cacheable en el navegador)
+    return render(request, "finanzas/index.html", context | {
+    "form": form,
+    "mensaje": mensaje,
+    "al": al,
+    })
 
-    # --- FILTRO POR PERIODO ---
-    inicio = request.GET.get("inicio")
-    fin = request.GET.get("fin")
-    registros_qs = IngresoMensual.objects.all().order_by("id")
+# --- DATOS PARA GRÁFICAS (JSON) ---
+def _version_datos(request):
+    """
+    (versión, último cambio) de VersionDatos, la fila que sube cada escritura
+    (también las que no registran un movimiento: recalcular_totales, el
+    archivado). Una consulta por petición, aunque la respuesta sea 304.
+    """
+    if not hasattr(request, "_version_datos"):
+        request._version_datos = estado_datos()
+    return request._version_datos
+
+def _etag_datos(request):
+    version, _ = _version_datos(request)
+    clave = "|".join([
+        str(version), request.GET.get("inicio", ""), request.GET.get("fin", ""), request.GET.get("al", ""),
+    ])
+    return hashlib.md5(clave.encode()).hexdigest()
+
+def _ultima_modificacion_datos(request):
+    return _version_datos(request)[1]
 
-    if inicio and fin:
-        try:
-            inicio_obj = IngresoMensual.objects.get(periodo=inicio)
-            fin_obj = IngresoMensual.objects.get(periodo=fin)
-            registros_qs = registros_qs.filter(id__gte=inicio_obj.id, id__lte=fin_obj.id)
-        except IngresoMensual.DoesNotExist:
-            registros_qs = IngresoMensual.objects.none()  # No existe alguno de los periodos
-    elif inicio:  # solo inicio
-        try:
-            inicio_obj = IngresoMensual.objects.get(periodo=inicio)
-            registros_qs = registros_qs.filter(id__gte=inicio_obj.id)
-        except IngresoMensual.DoesNotExist:
-            registros_qs = IngresoMensual.objects.none()
-    elif fin:  # solo fin
-        try:
-            fin_obj = IngresoMensual.objects.get(periodo=fin)
-            registros_qs = registros_qs.filter(id__lte=fin_obj.id)
-        except IngresoMensual.DoesNotExist:
-            registros_qs = IngresoMensual.objects.none()
-
-    registros = list(registros_qs)
-
-    # --- CÁLCULOS PARA TARJETAS KPI ---
-    total_diferencia = sum((r.diferencia_ingresos_fac_vs_cobrados or Decimal(0)) for r in registros)
-    promedio_diferencia = (
-        total_diferencia / len(registros)
-        if registros else Decimal(0)
-    )
-
-    # --- KPI NUEVOS ---
-    # 1 Porcentaje de periodos con diferencia negativa
-    periodos_con_deficit = len([r for r in registros if (r.diferencia_ingresos_fac_vs_cobrados or 0) < 0])
-    porcentaje_deficit = (periodos_con_deficit / len(registros) * 100) if registros else 0
+@login_required
+@cache_control(private=True, no_store=True)
+def feed_cambios(request):
+    """MovimientoLog posteriores a ?cursor= en NDJSON, por páginas de ?limite= (ver dashboard/cambios.py)."""
+    try:
+        cursor, limite, tipos = interpretar_cambios(request.GET)
+    except ValueError as error:
+        return JsonResponse({"error": str(error)}, status=400)
+    return StreamingHttpResponse(lineas_cambios(cursor, limite, tipos), content_type="application/x-ndjson")
 
-    # 2 Déficit acumulado total (solo periodos negativos)
-    deficit_acumulado = sum(
-        (r.diferencia_ingresos_fac_vs_cobrados or Decimal(0))
-        for r in registros
-        if (r.diferencia_ingresos_fac_vs_cobrados or 0) < 0
-    )
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_etag_datos, last_modified_func=_ultima_modificacion_datos)
+def datos_graficas(request):
+    """Totales por categoría y diferencia por periodo, en formato columnar."""
+    inicio, fin = request.GET.get("inicio"), request.GET.get("fin")
+    try:
+        al = interpretar_momento(request.GET.get("al"))
+        registros = estado_en(al, inicio, fin) if al else None
+    except ValueError:
+        al = None
+    if al:
+        kpis = kpis_historicos(registros)
+        filas = [(r.periodo, r.diferencia_ingresos_fac_vs_cobrados) for r in registros]
+    else:
+        registros_qs = IngresoMensual.objects.entre_periodos(inicio, fin)
+        kpis = registros_qs.kpis()
+        filas = registros_qs.values_list("periodo", "diferencia_ingresos_fac_vs_cobrados")
+    periodos, diferencias = [], []
+    for periodo, diferencia in filas:
+        periodos.append(periodo)
+        diferencias.append(float(diferencia or 0))
+
+    return JsonResponse({
+        "campos": CAMPOS_GRAFICA,
+        "totales": [float(t) for t in kpis["totales_categoria"]],
+        "periodos": periodos,
+        "diferencias": diferencias,
+    }, json_dumps_params={"separators": (",", ":")})
 
-    context = {
-        "registros": registros,
-        "promedio_diferencia": promedio_diferencia,
-        "porcentaje_deficit": porcentaje_deficit,
-        "deficit_acumulado": deficit_acumulado,
-    }
-    
-    # Convierte registros en lista de diccionarios para el JS
-    registros_serializados = [model_to_dict(r) for r in registros]
-    registros_json = json.dumps(registros_serializados, default=str)
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_etag_datos, last_modified_func=_ultima_modificacion_datos)
+def datos_analitica(request):
+    """Promedios móviles, variación anual, participación y rachas de déficit (ver dashboard/analitica.py)."""
+    inicio, fin = request.GET.get("inicio"), request.GET.get("fin")
+    try:
+        al = interpretar_momento(request.GET.get("al"))
+        registros = estado_en(al, inicio, fin) if al else IngresoMensual.objects.entre_periodos(inicio, fin)
+    except ValueError:
+        registros = IngresoMensual.objects.entre_periodos(inicio, fin)
+    return JsonResponse(analizar(cargar_frame(registros)), json_dumps_params={"separators": (",", ":")})
 
-    return render(request, "finanzas/index.html", context | {
-    "form": form,
-    "mensaje": mensaje,
-    "registros_json": registros_json,
-    "periodos": periodos,
+@login_required
+@require_POST
+def editar_celdas(request):
+    """
+    Edición en lote: recibe {"cambios": [{"id", "columna", "nuevo_valor"}, ...]}
+    y devuelve solo las filas que cambiaron, para actualizar la tabla sin recargar.
+    """
+    try:
+        datos = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"errores": ["El cuerpo no es JSON válido."]}, status=400)
+    try:
+        cambios = validar_cambios(datos.get("cambios") if isinstance(datos, dict) else None)
+        filas = aplicar_ediciones(cambios, usuario=request.user)
+    except ValidationError as e:
+        return JsonResponse({"errores": e.messages}, status=400)
+
+    campos = CAMPOS_RESUMEN + ["diferencia_ingresos_fac_vs_cobrados"]
+    return JsonResponse({
+        "cambios": len(cambios),
+        "filas": [
+            {"id": r.id, "periodo": r.periodo, **{c: str(getattr(r, c)) for c in campos}, "total": str(r.total)}
+            for r in filas
+        ],
     })
 
 @login_required
 def historial_movimientos(request):
-    movimientos = MovimientoLog.objects.select_related("usuario").all().order_by("-fecha")
 
     if request.method == "POST" and "eliminar_mov" in request.POST:
         mov_id = request.POST.get("id_mov")
-        movimiento = get_object_or_404(MovimientoLog, id=mov_id)
-
-        # --- Ajustar el IngresoMensual solo si es tipo "añadir" ---
-        if movimiento.tipo == "añadir" and movimiento.columna and movimiento.monto:
-            try:
-                ingreso = IngresoMensual.objects.get(periodo=movimiento.periodo)
-                valor_actual = getattr(ingreso, movimiento.columna, 0) or 0
-                setattr(ingreso, movimiento.columna, max(valor_actual - movimiento.monto, 0))
-                
-                # Recalcular diferencia automáticamente
-                ingreso.ingresos_netos_mantenimiento = (
-                    (ingreso.ingresos_mantenimiento or 0) - (ingreso.dppp or 0)
-                )
-                ingreso.save()
-            except IngresoMensual.DoesNotExist:
-                pass  # No hay ingreso para ese periodo, no hacemos nada
-
-        # --- Registrar log en SystemLog ---
-        SystemLog.objects.create(
-            usuario=request.user,
-            accion="eliminar_movimiento",
-            detalle=f"El usuario {request.user.username} eliminó movimiento ID {mov_id} (Tipo: {movimiento.tipo}, Periodo: {movimiento.periodo})"
-        )
-
-        # --- Eliminar movimiento ---
-        movimiento.delete()
+        movimiento = get_object_or_404(MovimientoLog, id=mov_id, eliminado__isnull=True)
+
+        with transaccion_escritura():
+            # --- Ajustar el IngresoMensual solo si es tipo "añadir" ---
+            if movimiento.tipo == "añadir" and movimiento.columna and movimiento.monto:
+                try:
+                    # Resta atómica sin bajar de 0; si no hay ingreso para ese periodo no hace nada
+                    ingreso, aplicado = aplicar_movimiento(
+                        movimiento.periodo, movimiento.columna, -movimiento.monto,
+                        crear=False, no_negativo=True,
+                    )
+                except ValueError:
+                    ingreso = None  # Periodo o columna que ya no se reconocen
+                if ingreso is not None:
+                    # El movimiento original se borra; la reversión queda en el log para el histórico
+                    registrar_auditoria(MovimientoLog(
+                        usuario=request.user,
+                        tipo="revertir",
+                        periodo=ingreso.periodo,
+                        columna=movimiento.columna,
+                        monto=aplicado,
+                        valor_anterior=getattr(ingreso, movimiento.columna) - aplicado,
+                        valor_nuevo=getattr(ingreso, movimiento.columna),
+                        observaciones=f"Reversión del movimiento ID {mov_id} ({movimiento.observaciones})",
+                    ))
+
+            # --- Registrar log en SystemLog ---
+            registrar_auditoria(SystemLog(
+                usuario=request.user,
+                accion="eliminar_movimiento",
+                detalle=f"El usuario {request.user.username} eliminó movimiento ID {mov_id} (Tipo: {movimiento.tipo}, Periodo: {movimiento.periodo})"
+            ))
+
+            # --- Quitar del historial (se conserva para las consultas históricas) ---
+            movimiento.eliminado = timezone.now()
+            movimiento.save(update_fields=["eliminado"])
         messages.success(request, "Movimiento eliminado correctamente.")
         return redirect("historial_movimientos")
 
+    # --- Reversión en lote de los movimientos filtrados (ver dashboard/reversion.py) ---
+    if request.method == "POST" and "revertir_lote" in request.POST:
+        filtros = _filtros_historial(request.POST)
+        try:
+            resultado = revertir_movimientos(**filtros, ejecuta=request.user)
+        except ValidationError as e:
+            for error in e.messages:
+                messages.error(request, error)
+        else:
+            messages.success(
+                request,
+                f"Se revirtieron {resultado['movimientos']} movimientos: {resultado['celdas']} celdas "
+                f"en {resultado['periodos']} periodos.",
+            )
+        return redirect(reverse("historial_movimientos") + "?" + _parametros_historial(request.POST))
+
+    filtros = _filtros_historial(request.GET)
+    parametros = _parametros_historial(request.GET)
+    seleccion = seleccionar_movimientos(**filtros)
+    movimientos, siguiente = paginar_por_cursor(
+        seleccion.select_related("usuario"),
+        cursor=request.GET.get("cursor"),
+        tamano=tamano_pagina(request.GET.get("n")),
+    )
+
     return render(request, "finanzas/historial_movimientos.html", {
-        "movimientos": movimientos
+        "movimientos": movimientos,
+        "siguiente": siguiente,
+        "primera_pagina": not request.GET.get("cursor"),
+        "filtros": parametros,
+        "filtros_activos": [(campo, request.GET[campo]) for campo in FILTROS_HISTORIAL if request.GET.get(campo, "").strip()],
+        # Cuántos se revertirían con el botón (solo si hay algún filtro)
+        "seleccionados": seleccion.count() if parametros and not request.GET.get("cursor") else None,
     })
 
 
+FILTROS_HISTORIAL = ["desde", "hasta", "usuario", "periodo"]
+
+
+def _filtros_historial(datos):
+    """Filtros del historial (desde/hasta de un input date, usuario y periodo) para reversion.seleccionar."""
+    return {
+        "desde": _fecha_filtro(datos.get("desde")),
+        "hasta": _fecha_filtro(datos.get("hasta"), fin_del_dia=True),
+        "usuario": datos.get("usuario", "").strip() or None,
+        "periodo": datos.get("periodo", "").strip() or None,
+    }
+
+
+def _parametros_historial(datos):
+    return urlencode({campo: datos[campo] for campo in FILTROS_HISTORIAL if datos.get(campo, "").strip()})
+
+
+# --- REPORTES EN SEGUNDO PLANO ---
+def _datos_trabajo(trabajo):
+    datos = {
+        "estado": trabajo.estado,
+        "progreso": trabajo.progreso,
+        "total_registros": trabajo.total_registros,
+        "error": trabajo.error,
+    }
+    if trabajo.estado == TrabajoReporte.TERMINADO:
+        datos["descarga"] = reverse("descargar_reporte", args=[trabajo.id])
+    return datos
+
+
+@login_required
+def reporte_trabajo(request, trabajo_id):
+    trabajo = get_object_or_404(TrabajoReporte, id=trabajo_id, usuario=request.user)
+    return render(request, "finanzas/reporte.html", {"trabajo": trabajo, "datos": _datos_trabajo(trabajo)})
+
+
+@login_required
+@cache_control(private=True, no_store=True)
+def estado_reporte(request, trabajo_id):
+    """Estado del trabajo en JSON para que la página consulte el progreso."""
+    trabajo = get_object_or_404(TrabajoReporte, id=trabajo_id, usuario=request.user)
+    # Un trabajo perdido en un reinicio no se quedaría "pendiente" para siempre
+    return JsonResponse(_datos_trabajo(revisar_abandono(trabajo)))
+
+
+@login_required
+def descargar_reporte(request, trabajo_id):
+    limpiar_expirados()
+    trabajo = get_object_or_404(TrabajoReporte, id=trabajo_id, usuario=request.user)
+    if trabajo.estado != TrabajoReporte.TERMINADO:
+        raise Http404("El reporte todavía no está listo.")
+    try:
+        archivo = open(ruta_archivo(trabajo), "rb")
+    except FileNotFoundError:
+        raise Http404("El archivo del reporte ya no existe.")
+    from .reportes import CONTENT_TYPE_XLSX, NOMBRE_ARCHIVO
+    return FileResponse(archivo, as_attachment=True, filename=NOMBRE_ARCHIVO, content_type=CONTENT_TYPE_XLSX)
+
+
+# --- IMPORTAR MOVIMIENTOS (CSV/XLSX) ---
+@login_required
+def importar_movimientos(request):
+    form = ImportarMovimientosForm(request.POST or None, request.FILES or None)
+    resultado = None
+
+    if request.method == "POST" and form.is_valid():
+        archivo = form.cleaned_data["archivo"]
+        try:
+            resultado = importar_archivo(archivo, archivo.name, usuario=request.user)
+        except ValidationError as e:
+            for error in e.messages:
+                messages.error(request, error)
+        else:
+            registrar_log(
+                request.user, "Importación de movimientos",
+                f"{resultado['filas']} movimientos de '{archivo.name}' en {resultado['periodos']} periodos.",
+            )
+            messages.success(
+                request,
+                f"Se importaron {resultado['filas']} movimientos en {resultado['periodos']} periodos "
+                f"({resultado['filas_por_segundo']:,.0f} filas/s).",
+            )
+
+    return render(request, "finanzas/importar.html", {"form": form, "resultado": resultado})
+
+
+# --- PERIODOS CON MAYOR Y MENOR TOTAL ---
+RANKING_POR_DEFECTO = 10
+RANKING_MAXIMO = 100
+
+
+@login_required
+def ranking_totales(request):
+    """Los N periodos con mayor y con menor total en un rango; ordena en SQL con el índice de `total`."""
+    inicio, fin = request.GET.get("inicio"), request.GET.get("fin")
+    try:
+        n = min(max(int(request.GET.get("n", RANKING_POR_DEFECTO)), 1), RANKING_MAXIMO)
+    except ValueError:
+        n = RANKING_POR_DEFECTO
+    qs = IngresoMensual.objects.entre_periodos(inicio, fin).only(
+        "periodo", "fecha_periodo", "total", "ingresos_reales_vs_fact", "diferencia_ingresos_fac_vs_cobrados"
+    )
+    return render(request, "finanzas/ranking.html", {
+        "mayores": list(qs.order_by("-total", "fecha_periodo")[:n]),
+        "menores": list(qs.order_by("total", "fecha_periodo")[:n]),
+        "periodos": IngresoMensual.objects.order_by("fecha_periodo").values_list("periodo", flat=True),
+        "inicio": inicio,
+        "fin": fin,
+        "n": n,
+    })
+
 @login_required
 def profile(request):
     user = request.user
@@ -334,18 +522,18 @@ def admin_users(request):
     if request.method == "POST":
         form = CustomUserCreationForm(request.POST)
         if form.is_valid():
-            # Crear usuario
-            user = form.save(commit=False)
-            user.save()
-
-            # Registrar log de creación
-            registrar_log(request.user, "Creación de usuario", f"Se creó el usuario '{user.username}'.")
-
-            # Intentar enviar correo
-            try:
-                send_mail(
-                    subject="Datos de acceso - Panel Financiero",
-                    message=(
+            # Crear usuario y encolar el correo en la misma transacción
+            with transaction.atomic():
+                user = form.save(commit=False)
+                user.save()
+
+                # Registrar log de creación
+                registrar_log(request.user, "Creación de usuario", f"Se creó el usuario '{user.username}'.")
+
+                # El correo se envía en segundo plano (ver dashboard/correos.py)
+                encolar_correo(
+                    asunto="Datos de acceso - Panel Financiero",
+                    mensaje=(
                         f"Hola {user.username},\n\n"
                         f"Tu cuenta ha sido creada exitosamente.\n\n"
                         f"Usuario: {user.username}\n"
@@ -353,13 +541,12 @@ def admin_users(request):
                         f"Contraseña: (la que elegiste)\n\n"
                         f"Por favor, cambia tu contraseña al ingresar."
                     ),
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[user.email],
-                    fail_silently=False,
+                    destinatario=user.email,
+                    creado_por=request.user,
                 )
-                messages.success(request, f"Usuario '{user.username}' creado y correo enviado correctamente.")
-            except Exception as e:
-                messages.warning(request, f"Usuario '{user.username}' creado, pero no se pudo enviar el correo. ({e})")
+            messages.success(
+                request, f"Usuario '{user.username}' creado. El correo de acceso se enviará en segundo plano."
+            )
 
             # Limpiar formulario
             form = CustomUserCreationForm()
@@ -389,7 +576,8 @@ def admin_config(request):
         message = f"✅ Configuración actualizada: {nombre_sistema}, moneda {moneda}, soporte {email_soporte}"
 
     context = {
-        "message": message
+        "message": message,
+        "cache_tablero": estadisticas_cache(),
     }
     return render(request, "finanzas/admin_config.html", context)
 
@@ -397,21 +585,100 @@ def admin_config(request):
 # --- ADMIN LOGS ---
 @login_required
 @user_passes_test(lambda u: u.is_staff)
+@vaciar_antes
 def admin_logs(request):
-    movimientos = MovimientoLog.objects.select_related("usuario").all().order_by("-fecha")
-    logs = SystemLog.objects.select_related("usuario").all()
+    logs = SystemLog.objects.select_related("usuario")
+    movimientos = MovimientoLog.objects.select_related("usuario")
 
-    # Filtro opcional por usuario
+    # Filtro opcional por usuario (se combina con el cursor)
     usuario_filtro = request.GET.get("usuario")
     if usuario_filtro:
         logs = logs.filter(usuario__username__icontains=usuario_filtro)
 
+    # Búsqueda por rango de fechas, tipo y texto; lo anterior a la ventana de
+    # retención se busca además en los archivos (dashboard/retencion.py)
+    texto = request.GET.get("texto", "").strip()
+    tipo = request.GET.get("tipo", "").strip()
+    desde = _fecha_filtro(request.GET.get("desde"))
+    hasta = _fecha_filtro(request.GET.get("hasta"), fin_del_dia=True)
+    if desde:
+        logs, movimientos = logs.filter(fecha__gte=desde), movimientos.filter(fecha__gte=desde)
+    if hasta:
+        logs, movimientos = logs.filter(fecha__lte=hasta), movimientos.filter(fecha__lte=hasta)
+    if tipo:
+        logs, movimientos = logs.filter(accion=tipo), movimientos.filter(tipo=tipo)
+
+    tamano = tamano_pagina(request.GET.get("n"))
+    resultados = None
+    if texto and busqueda_disponible():
+        # Con índice FTS5 el texto se busca por relevancia en lugar de paginar por fecha
+        try:
+            resultados = buscar_texto(texto, usuario_filtro, tipo, desde, hasta, limite=tamano)
+        except ValueError as error:
+            messages.error(request, str(error))
+            resultados = []
+    elif texto:
+        logs = logs.filter(Q(accion__icontains=texto) | Q(detalle__icontains=texto))
+        movimientos = movimientos.filter(
+            Q(tipo__icontains=texto) | Q(periodo__icontains=texto)
+            | Q(columna__icontains=texto) | Q(observaciones__icontains=texto)
+        )
+
+    archivados, limite_archivo = None, None
+    if (desde or hasta) and (desde is None or desde < limite_caliente()):
+        limite_archivo = TAMANO_MAXIMO
+        try:
+            archivados = list(buscar_en_archivo(desde, hasta, texto, usuario_filtro or "", tipo, limite_archivo))
+        except ArchivoCorrupto as error:
+            messages.error(request, f"No se pudo leer el archivo de logs: {error}")
+
+    # Cada tabla se pagina con su propio cursor
+    if resultados is None:
+        logs, siguiente_logs = paginar_por_cursor(logs, request.GET.get("cursor_logs"), tamano)
+        movimientos, siguiente_mov = paginar_por_cursor(movimientos, request.GET.get("cursor_mov"), tamano)
+    else:
+        logs, siguiente_logs, movimientos, siguiente_mov = [], None, [], None
+
+    filtros = {
+        campo: request.GET[campo] for campo in ("usuario", "desde", "hasta", "tipo", "texto", "n") if request.GET.get(campo)
+    }
     return render(request, "finanzas/admin_logs.html", {
         "logs": logs, 
         "movimientos": movimientos,
-        "usuario_filtro": usuario_filtro
+        "usuario_filtro": usuario_filtro,
+        "siguiente_logs": siguiente_logs,
+        "siguiente_mov": siguiente_mov,
+        "filtros": urlencode(filtros),
+        "archivados": archivados,
+        "limite_archivo": limite_archivo,
+        "resultados": resultados,
         })
 
+
+def _fecha_filtro(texto, fin_del_dia=False):
+    """"AAAA-MM-DD" de un input date a datetime con zona (None si falta o no es válida)."""
+    try:
+        dia = datetime.strptime(texto or "", "%Y-%m-%d")
+    except ValueError:
+        return None
+    if fin_del_dia:
+        dia = dia.replace(hour=23, minute=59, second=59, microsecond=999999)
+    return timezone.make_aware(dia)
+
+# --- ADMIN RENDIMIENTO ---
+@login_required
+@user_passes_test(lambda u: u.is_staff)
+def admin_rendimiento(request):
+    """Histograma de duración por vista (ventana de las últimas peticiones de este proceso)."""
+    conf = configuracion_instrumentacion()
+    filas = obtener_estadisticas().resumen() if conf["ACTIVA"] else []
+    return render(request, "finanzas/admin_rendimiento.html", {
+        "activa": conf["ACTIVA"],
+        "ventana": conf["VENTANA"],
+        "filas": filas,
+        "limites": LIMITES_HISTOGRAMA,
+    })
+
 def registrar_log(usuario, accion, detalle=""):
     """Guarda una acción administrativa o de usuario en la tabla de logs."""
-    SystemLog.objects.create(usuario=usuario, accion=accion, detalle=detalle)
\ No newline at end of file
+    registrar_auditoria(SystemLog(usuario=usuario, accion=accion, detalle=detalle))
\ No newline at end of file